@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class AdmissionGate:
+    """Bounds concurrent analyses per worker process with a short wait queue in front"""
+
+    def __init__(self, max_active=1, max_queued=4, queue_timeout=20.0, retry_after=5):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Take an analysis slot; returns False when the queue is full or the wait times out"""
+        with self._cond:
+            if self.active < self.max_active:
+                self.active += 1
+                return True
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                return False
+
+            self.queued += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.queued -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'maxActive': self.max_active,
+                'maxQueued': self.max_queued
+            }
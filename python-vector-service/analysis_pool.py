@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from vector_processor import MATERIAL_LIBRARIES, VectorProcessor, warm_up
+from plugins import format_plugins, lazy_import
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+# How pool and lane worker processes are started. Forking a server process that runs request and
+# job threads can copy a lock another thread holds (logging, sqlite, the import lock) into the child,
+# so they are started from a fork server instead: a single-threaded process started once, before
+# the server takes traffic (see start_process_server)
+START_METHOD = os.environ.get('VECTOR_START_METHOD', 'forkserver')
+if START_METHOD not in multiprocessing.get_all_start_methods():
+    START_METHOD = 'spawn'
+
+# Warm processor held by each pool worker process
+_processor = None
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+# In a lane worker: function(indices, tolerance, material, simplify) that has the server process measure
+# the pages of the PDF being analyzed on its pool (see scheduler); None in other processes
+_page_delegate = None
+
+
+def process_context():
+    """The multiprocessing context that starts pool and lane workers"""
+    return multiprocessing.get_context(START_METHOD)
+
+
+def start_process_server():
+    """Start the fork server, if used, with the libraries loaded so far preloaded
+
+    Called once the server has warmed up, so the workers the fork server
+    starts later have the format libraries imported already.
+    """
+    if START_METHOD != 'forkserver':
+        return
+    preload = ['scheduler', 'analysis_pool']
+    preload += [library for plugin in format_plugins() if plugin.loaded for library in plugin.libraries]
+    preload += [library for library in MATERIAL_LIBRARIES if library in sys.modules]
+    context = process_context()
+    context.set_forkserver_preload(preload)
+    from multiprocessing import forkserver
+    forkserver.ensure_running()
+
+
+def _init_worker(start_method):
+    global _processor
+    _processor = VectorProcessor()
+    # Forked workers inherit the parent's warmed libraries; others warm up themselves
+    if start_method != 'fork':
+        warm_up()
+
+
+def _worker_pdf_pages(source, indices, tolerance, material, simplify=None):
+    # Each task opens its own document handle; fitz documents cannot be shared between processes
+    if isinstance(source, (str, os.PathLike)):
+        doc = fitz.open(source)
+    else:
+        doc = fitz.open(stream=source, filetype='pdf')
+    try:
+        return [_processor._measure_pdf_page(doc[i], tolerance, material, simplify) for i in indices]
+    finally:
+        doc.close()
+
+
+def get_pool():
+    """Return the shared process pool, starting it on first use
+
+    It has VECTOR_BATCH_WORKERS processes, by default one per CPU; gunicorn.conf.py
+    divides the CPUs among the gunicorn workers instead.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None:
+            _pool_size = int(os.environ.get('VECTOR_BATCH_WORKERS', 0)) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=_pool_size, mp_context=process_context(),
+                                        initializer=_init_worker, initargs=(START_METHOD,))
+        return _pool
+
+
+def reset_pool(kill=False):
+    """Discard a broken pool so the next batch starts fresh workers; kill stops the tasks still running"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            if kill:
+                for process in list((_pool._processes or {}).values()):
+                    process.kill()
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def pool_pids():
+    """Process ids of the pool's worker processes, if the pool has started"""
+    with _pool_lock:
+        return [] if _pool is None else list(_pool._processes or {})
+
+
+def delegate_pdf_pages(function):
+    """Have measure_pdf_pages in this process, which cannot start a pool, hand its pages to function"""
+    global _page_delegate
+    _page_delegate = function
+
+
+def measure_pdf_pages(source, indices, tolerance, material=False, simplify=None, timeout=None):
+    """Measure PDF pages across the pool in contiguous chunks, one per worker
+
+    Returns one _measure_pdf_page tuple per page in input order, or
+    None when pages should be measured in-process: inside a pool worker (which
+    cannot start its own pool) or when the pool has a single worker. A lane
+    worker hands the pages to its server process instead (delegate_pdf_pages).
+    Raises TimeoutError, after killing the pool's workers, when the pages
+    are not measured within timeout seconds.
+    """
+    if multiprocessing.current_process().daemon:
+        return None if _page_delegate is None else _page_delegate(indices, tolerance, material, simplify)
+    pool = get_pool()
+    chunks = min(_pool_size, len(indices))
+    if chunks < 2:
+        return None
+    if isinstance(source, memoryview):
+        source = source.tobytes()
+    
+    size = -(-len(indices) // chunks)
+    futures = [pool.submit(_worker_pdf_pages, source, indices[i:i + size], tolerance, material, simplify)
+               for i in range(0, len(indices), size)]
+    _, pending = wait(futures, timeout)
+    if pending:
+        # A running task cannot be cancelled, only its worker killed
+        reset_pool(kill=True)
+        raise TimeoutError(f'PDF pages were not measured within {timeout:g} s')
+    try:
+        return [page for future in futures for page in future.result()]
+    except BrokenProcessPool:
+        reset_pool()
+        raise
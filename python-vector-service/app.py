@@ -1,18 +1,473 @@
-from flask import Flask, request, jsonify
-from werkzeug.utils import secure_filename
+import time
+
+# When this worker started loading the service, for the cold-start report under /health
+BOOT_STARTED = time.perf_counter()
+
+from flask import Flask, Request, Response, request, jsonify, g
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from io import BytesIO
 import os
-import tempfile
 import json
-from vector_processor import VectorProcessor
+from vector_processor import parse_page_ranges, warm_up as warm_up_formats
+from result_cache import ResultCache, make_cache_key
+from analysis_pool import start_process_server
+from admission import AdmissionGate
+from jobs import CallbackRejected, JobQueue, QueueFull
+from results import AnalysisResult, FORMATS, encode_packed
+from budget import MODES
+from metrics import Metrics, RollingWindow, SIZE_BUCKETS
+from plugins import import_times, format_plugins
+from ingest import UploadStream, UploadRejected
+from scheduler import LaneScheduler, LaneFull, AnalysisTimeout, LANES
+
+class UploadRequest(Request):
+    """Keeps uploaded files in memory instead of spooling large ones to disk
+
+    Each file is sniffed as it streams in (see ingest): a single-file upload that
+    is not what its name claims fails the request before the rest is read, while
+    batches mark the bad file and carry on with the others.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            return BytesIO()
+        expected = filename.rsplit('.', 1)[1].lower() if allowed_file(filename) else None
+        return UploadStream(expected, abort=self.endpoint not in PER_FILE_ENDPOINTS)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
+# Repeat uploads of the same file are answered from the cache
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('VECTOR_CACHE_MAX_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('VECTOR_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    disk_path=os.environ.get('VECTOR_CACHE_PATH') or None,
+    disk_max_entries=int(os.environ.get('VECTOR_CACHE_DISK_MAX_ENTRIES', 10000))
+)
+
+# Requests beyond the active + queued limits are turned away with 503 and Retry-After
+admission = AdmissionGate(
+    max_active=int(os.environ.get('VECTOR_MAX_ACTIVE', 1)),
+    max_queued=int(os.environ.get('VECTOR_MAX_QUEUED', 4)),
+    queue_timeout=float(os.environ.get('VECTOR_QUEUE_TIMEOUT', 20)),
+    retry_after=int(os.environ.get('VECTOR_RETRY_AFTER', 5))
+)
+
+# Prometheus metrics, served at /metrics; VECTOR_METRICS_DIR shares them between gunicorn workers
+metrics = Metrics(os.environ.get('VECTOR_METRICS_DIR') or None,
+                  flush_interval=float(os.environ.get('VECTOR_METRICS_FLUSH_MS', 1000)) / 1000)
+metrics.counter('vector_http_requests_total', 'HTTP requests by endpoint and status code')
+metrics.histogram('vector_http_request_seconds', 'HTTP request duration by endpoint')
+metrics.counter('vector_analyses_total', 'File analyses run (cache misses) by format and outcome')
+metrics.histogram('vector_analysis_seconds', 'Duration of file analyses by format')
+metrics.histogram('vector_analysis_stage_seconds', 'Time spent per analysis stage by format and stage')
+metrics.histogram('vector_analysis_items', 'Paths, segments, entities and pages per analysis', SIZE_BUCKETS)
+metrics.counter('vector_cache_lookups_total', 'Result cache lookups by result')
+metrics.histogram('vector_serialize_seconds', 'Time spent serializing results by output format')
+metrics.histogram('vector_lane_wait_seconds', 'Time analyses waited for a worker by lane')
+metrics.counter('vector_lane_timeouts_total', 'Analyses cancelled at their deadline or CPU limit by lane and reason')
+
+# Durations of this worker's recent analyses per format, for the latency percentiles under /ready
+latency = RollingWindow(int(os.environ.get('VECTOR_LATENCY_WINDOW', 256)))
+
+# Requests slower than VECTOR_PROFILE_SLOW_MS leave a sampled stack profile in VECTOR_PROFILE_DIR
+PROFILE_DIR = os.environ.get('VECTOR_PROFILE_DIR') or None
+PROFILE_SLOW_MS = float(os.environ.get('VECTOR_PROFILE_SLOW_MS', 1000))
+PROFILE_INTERVAL_MS = float(os.environ.get('VECTOR_PROFILE_INTERVAL_MS', 5))
+if PROFILE_DIR:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+# /analyze and jobs run in killable worker processes: a fast lane for small uploads, a heavy lane for the rest
+scheduler = LaneScheduler(
+    fast_workers=int(os.environ.get('VECTOR_FAST_WORKERS', 1)),
+    fast_queued=int(os.environ.get('VECTOR_FAST_MAX_QUEUED', 8)),
+    heavy_workers=int(os.environ.get('VECTOR_HEAVY_WORKERS', 1)),
+    heavy_queued=int(os.environ.get('VECTOR_HEAVY_MAX_QUEUED', 2)),
+    fast_limits={
+        'bytes': int(os.environ.get('VECTOR_FAST_MAX_BYTES', 512 * 1024)),
+        'paths': int(os.environ.get('VECTOR_FAST_MAX_PATHS', 2000)),
+        'entities': int(os.environ.get('VECTOR_FAST_MAX_ENTITIES', 2000)),
+        'pages': int(os.environ.get('VECTOR_FAST_MAX_PAGES', 1))
+    },
+    cpu_seconds=float(os.environ.get('VECTOR_CPU_LIMIT', 0)) or None,
+    profile={'dir': PROFILE_DIR, 'slowMs': PROFILE_SLOW_MS, 'intervalMs': PROFILE_INTERVAL_MS} if PROFILE_DIR else None
+)
+
+# Deadlines when the request sets no deadlineMs: of /analyze from the request's arrival, of a job from its start
+DEFAULT_DEADLINE_MS = float(os.environ.get('VECTOR_DEADLINE_MS', 60000))
+JOB_DEADLINE_MS = float(os.environ.get('VECTOR_JOB_DEADLINE_MS', 600000))
+
+# Cold-start report under /health: boot and warm-up times, and the first analysis response
+startup = {'bootMs': None, 'warmUp': None, 'readyMs': None, 'firstResponse': None}
+ANALYSIS_ENDPOINTS = ('/analyze', '/analyze/batch')
+
+# The /ready document is rebuilt at most this often; responses of these endpoints carry live load headers
+READY_TTL_MS = float(os.environ.get('VECTOR_READY_TTL_MS', 1000))
+LOAD_HINT_ENDPOINTS = ANALYSIS_ENDPOINTS + ('/jobs', '/jobs/<job_id>', '/ready')
+_ready = {'at': None, 'document': None}
+
+def since_boot_ms():
+    return round((time.perf_counter() - BOOT_STARTED) * 1000, 1)
+
+def warm_up():
+    """Load and exercise the format libraries before this worker takes traffic (see gunicorn.conf.py)"""
+    report = warm_up_formats()
+    # Lane and pool workers are started by a fork server that preloads the libraries just warmed up
+    start_process_server()
+    scheduler.start()
+    startup['warmUp'] = report
+    startup['readyMs'] = since_boot_ms()
+    app.logger.info('Warmed up %s in %.0f ms', ', '.join(report['formats']) or 'no formats', report['totalMs'])
+    return report
+
+def capacity_document():
+    """This worker's readiness and load for /ready: (document, milliseconds since it was built)"""
+    now = time.perf_counter()
+    if _ready['document'] is not None and (now - _ready['at']) * 1000 < READY_TTL_MS:
+        return _ready['document'], round((now - _ready['at']) * 1000, 1)
+    lanes = scheduler.get_stats()
+    workers, busy, queued = scheduler.load()
+    gate = admission.get_stats()
+    cache = result_cache.get_stats()
+    document = {
+        'ready': startup['readyMs'] is not None,
+        # Lanes that can take another request: an idle worker or room in the queue
+        'accepting': [name for name, lane in lanes.items()
+                      if lane['active'] < lane['workers'] or lane['queued'] < lane['maxQueued']],
+        'load': round((busy + queued) / workers, 2) if workers else 0.0,
+        'workers': {'busy': busy, 'idle': workers - busy, 'queued': queued},
+        'lanes': {name: {
+            'workers': lane['workers'],
+            'busy': lane['active'],
+            'idle': lane['workers'] - lane['active'],
+            'queued': lane['queued'],
+            'maxQueued': lane['maxQueued'],
+            'waitMs': lane['waitMs']
+        } for name, lane in lanes.items()},
+        'batch': {'busy': gate['active'], 'queued': gate['queued'],
+                  'maxActive': gate['maxActive'], 'maxQueued': gate['maxQueued']},
+        'latencyMs': latency.summary(),
+        'cache': {'hitRate': cache['hitRate'], 'entries': cache['entries']},
+        # Formats whose libraries this worker (and so its lane workers) has loaded; the others load on first use
+        'formats': [plugin.name for plugin in format_plugins() if plugin.loaded],
+        'pid': os.getpid()
+    }
+    _ready['at'], _ready['document'] = now, document
+    return document, 0.0
+
+def load_headers():
+    """Live load hints sent with analysis responses, so clients can back off or route without polling /ready"""
+    workers, busy, queued = scheduler.load()
+    headers = {
+        'X-Vector-Load': f'{(busy + queued) / workers if workers else 0.0:.2f}',
+        'X-Vector-Busy': str(busy),
+        'X-Vector-Idle': str(workers - busy),
+        'X-Vector-Queued': str(queued)
+    }
+    if g.get('lane'):
+        headers['X-Vector-Lane'] = g.lane
+    return headers
+
+def record_analysis(result, fmt):
+    """Take the stage timings off a fresh analysis result and add them to the metrics; returns the timings"""
+    timings, result.timings = result.timings, None
+    metrics.inc('vector_analyses_total', format=fmt, outcome='ok' if result.error is None else 'error')
+    if timings:
+        latency.add(fmt, timings['totalMs'])
+        metrics.observe('vector_analysis_seconds', timings['totalMs'] / 1000, format=fmt)
+        for stage, ms in timings['stages'].items():
+            metrics.observe('vector_analysis_stage_seconds', ms / 1000, format=fmt, stage=stage)
+        for item, count in timings['counts'].items():
+            metrics.observe('vector_analysis_items', count, format=fmt, item=item)
+    return timings
+
+def cache_lookup(cache_key):
+    cached = result_cache.get(cache_key)
+    metrics.inc('vector_cache_lookups_total', result='miss' if cached is None else 'hit')
+    return cached
+
+def run_in_lane(data, filename, options, prescan, deadline_ms, started=None, reject=True):
+    """Analyze in the lane the upload's pre-scan points to; returns (result, lane, seconds waited)
+
+    Raises LaneFull when reject is set and the lane's queue is full, and
+    AnalysisTimeout (counted in the metrics) when the deadline passed.
+    """
+    lane = scheduler.lane_for(prescan, options)
+    try:
+        result, waited, profile_name = scheduler.run(lane, data, filename, options, deadline_ms, started, reject)
+    except AnalysisTimeout as e:
+        metrics.observe('vector_lane_wait_seconds', e.waited_ms / 1000, lane=lane)
+        metrics.inc('vector_lane_timeouts_total', lane=lane, reason=e.reason)
+        metrics.inc('vector_analyses_total', format=options['format'], outcome='timeout')
+        raise
+    metrics.observe('vector_lane_wait_seconds', waited, lane=lane)
+    if profile_name:
+        app.logger.warning('Slow analysis of %s (%.0f ms), profile written to %s',
+                           filename, result.timings['totalMs'], profile_name)
+    return result, lane, waited
+
+def run_batch_in_lanes(items, deadline_ms, started):
+    """run_in_lane for (data, filename, options, prescan) items at once, all within the same deadline
+
+    Items wait for their lane rather than being turned away. Returns an
+    AnalysisResult per item in input order, or the AnalysisTimeout of an item
+    that was cancelled.
+    """
+    def run(item):
+        data, filename, options, prescan = item
+        try:
+            return run_in_lane(data, filename, options, prescan, deadline_ms, started, reject=False)[0]
+        except AnalysisTimeout as e:
+            return e
+        except Exception as e:
+            return AnalysisResult.failed(filename, str(e) or e.__class__.__name__)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=len(items), thread_name_prefix='vector-batch') as executor:
+        return list(executor.map(run, items))
+
+def timeout_document(e, filename, prescan):
+    """The structured answer for an analysis cancelled at its deadline or CPU limit"""
+    return {'fileName': filename, 'error': str(e), 'timeout': e.to_dict(), 'prescan': prescan}
+
+def run_job(data, filename, options):
+    """Analyze a queued upload in its analysis lane, sharing the result cache with /analyze"""
+    # The job's output settings, deadline and upload pre-scan are stored with its options but do not affect the analysis
+    options = dict(options)
+    output = options.pop('output', 'legacy')
+    shapes = options.pop('shapes', 'all') != 'none'
+    prescan = options.pop('prescan', None)
+    deadline_ms = options.pop('deadlineMs', JOB_DEADLINE_MS)
+    cache_key = make_cache_key(data, options)
+    result = cache_lookup(cache_key)
+    if result is not None:
+        result.file_name = filename
+    else:
+        # Jobs wait for their lane rather than being turned away
+        try:
+            result, _, _ = run_in_lane(data, filename, options, prescan, deadline_ms, reject=False)
+        except AnalysisTimeout as e:
+            metrics.flush()
+            return timeout_document(e, filename, prescan)
+        record_analysis(result, options['format'])
+        metrics.flush()
+        if result.error is None:
+            result_cache.put(cache_key, result)
+    result.prescan = prescan
+    return result.serialize(output, shapes)
+
+# Long analyses can be queued with POST /jobs and polled instead of holding a request open
+job_queue = JobQueue(
+    os.environ.get('VECTOR_JOB_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db')),
+    run_job,
+    workers=int(os.environ.get('VECTOR_JOB_WORKERS', 1)),
+    max_queued=int(os.environ.get('VECTOR_JOB_MAX_QUEUED', 100)),
+    ttl=int(os.environ.get('VECTOR_JOB_TTL', 24 * 3600)),
+    callback_hosts=[host.strip() for host in os.environ['VECTOR_CALLBACK_HOSTS'].split(',') if host.strip()]
+    if os.environ.get('VECTOR_CALLBACK_HOSTS') else None
+)
+job_queue.start()
+
 ALLOWED_EXTENSIONS = {'svg', 'dxf', 'eps', 'pdf'}
+MAX_BATCH_FILES = int(os.environ.get('VECTOR_BATCH_MAX_FILES', 20))
+# Endpoints taking several files, which report a rejected upload per file
+PER_FILE_ENDPOINTS = {'analyze_vector_files'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def upload_error(file):
+    """Why a batch upload was rejected while streaming in, or None"""
+    return getattr(file.stream, 'error', None)
+
+def upload_prescan(file):
+    """The pre-scan of an upload: sniffed format, size and estimated paths, entities or pages"""
+    return file.stream.prescan() if isinstance(file.stream, UploadStream) else None
+
+class OptionError(ValueError):
+    """An analysis option in the request is invalid"""
+
+def request_deadline(default=DEFAULT_DEADLINE_MS):
+    """Milliseconds the analysis may take, from ?deadlineMs= or the default; not part of the cache key"""
+    deadline_ms = request.values.get('deadlineMs')
+    if deadline_ms is None:
+        return default
+    try:
+        deadline_ms = float(deadline_ms)
+    except ValueError:
+        raise OptionError('deadlineMs must be a number')
+    if not 1 <= deadline_ms <= 600000:
+        raise OptionError('deadlineMs must be between 1 and 600000')
+    return deadline_ms
+
+def analysis_options(filename):
+    """Options that influence the analysis result and therefore the cache key"""
+    options = {
+        'format': filename.rsplit('.', 1)[1].lower()
+    }
+    
+    # Relative accuracy of curve lengths; larger values are faster
+    tolerance = request.values.get('tolerance')
+    if tolerance is not None:
+        try:
+            tolerance = float(tolerance)
+        except ValueError:
+            raise OptionError('tolerance must be a number')
+        if not 1e-8 <= tolerance <= 0.1:
+            raise OptionError('tolerance must be between 1e-8 and 0.1')
+        options['tolerance'] = tolerance
+    
+    # 'quick' measures coarser curves within a time budget, 'precise' finer curves than 'standard'
+    mode = request.values.get('mode')
+    if mode is not None:
+        if mode not in MODES:
+            raise OptionError(f"mode must be one of: {', '.join(MODES)}")
+        if mode != 'standard':
+            options['mode'] = mode
+    
+    # Stop measuring after this many milliseconds or segments and extrapolate the totals
+    budget_ms = request.values.get('budgetMs')
+    if budget_ms is not None:
+        try:
+            budget_ms = float(budget_ms)
+        except ValueError:
+            raise OptionError('budgetMs must be a number')
+        if not 1 <= budget_ms <= 600000:
+            raise OptionError('budgetMs must be between 1 and 600000')
+        options['budgetMs'] = budget_ms
+    max_segments = request.values.get('maxSegments')
+    if max_segments is not None:
+        try:
+            max_segments = int(max_segments)
+        except ValueError:
+            raise OptionError('maxSegments must be an integer')
+        if max_segments < 1:
+            raise OptionError('maxSegments must be at least 1')
+        options['maxSegments'] = max_segments
+    
+    # 'material' reports the true union area of overlapping and nested outlines (slower)
+    area = request.values.get('area')
+    if area is not None:
+        if area not in ('sum', 'material'):
+            raise OptionError("area must be 'sum' or 'material'")
+        if area == 'material':
+            options['area'] = area
+    
+    # Douglas-Peucker tolerance in mm for the straight segments of the material outlines (default: none)
+    simplify = request.values.get('simplify')
+    if simplify is not None:
+        try:
+            simplify = float(simplify)
+        except ValueError:
+            raise OptionError('simplify must be a number')
+        if not 1e-4 <= simplify <= 10:
+            raise OptionError('simplify must be between 0.0001 and 10')
+        if options.get('area') != 'material':
+            raise OptionError('simplify only applies with area=material')
+        options['simplify'] = simplify
+    
+    # PDF pages to analyze: 'all' or ranges such as '1-3,5' (default: first page only)
+    pages = request.values.get('pages')
+    if pages is not None and options['format'] == 'pdf':
+        try:
+            ranges = parse_page_ranges(pages)
+        except ValueError as e:
+            raise OptionError(str(e))
+        options['pages'] = 'all' if ranges is None else ','.join(
+            f'{first}-{last}' if last != first else str(first) for first, last in ranges)
+    
+    return options
+
+def output_options(packed=True):
+    """(output format, include per-shape detail) requested with ?output= and ?shapes=
+
+    Quick mode leaves the shapes out unless they are asked for.
+    """
+    output = request.values.get('output', 'legacy')
+    allowed = FORMATS if packed else tuple(f for f in FORMATS if f != 'packed')
+    if output not in allowed:
+        raise OptionError(f"output must be one of: {', '.join(allowed)}")
+    shapes = request.values.get('shapes', 'none' if request.values.get('mode') == 'quick' else 'all')
+    if shapes not in ('all', 'none'):
+        raise OptionError("shapes must be 'all' or 'none'")
+    return output, shapes == 'all'
+
+PACKED_MIMETYPE = 'application/vnd.vector-result'
+
+def respond(result, output, shapes, timings=None):
+    """Serialize a result in the requested format; timings (for ?debug=timings) get the serialization time"""
+    started = time.perf_counter()
+    if output == 'packed':
+        body = encode_packed(result, shapes)
+    else:
+        body = app.json.dumps(result.serialize(output, shapes))
+    elapsed = time.perf_counter() - started
+    metrics.observe('vector_serialize_seconds', elapsed, output=output)
+    if timings is not None:
+        timings['stages']['serialize'] = round(elapsed * 1000, 2)
+        timings['totalMs'] = round(timings['totalMs'] + elapsed * 1000, 2)
+        if output == 'packed':
+            body = encode_packed(result, shapes, {'timings': timings})
+        else:
+            document = result.serialize(output, shapes)
+            document['timings'] = timings
+            body = app.json.dumps(document)
+    if output == 'packed':
+        return app.response_class(body, mimetype=PACKED_MIMETYPE)
+    return app.response_class(body + '\n', mimetype=app.json.mimetype)
+
+DEBUG_FLAGS = {'timings'}
+
+def debug_flags():
+    """Debug output requested with ?debug=timings; never part of the cache key"""
+    flags = {flag.strip() for flag in request.values.get('debug', '').split(',') if flag.strip()}
+    unknown = flags - DEBUG_FLAGS
+    if unknown:
+        raise OptionError(f"Unknown debug option: {sorted(unknown)[0]!r} (supported: timings)")
+    return flags
+
+def request_timings(started, timings=None, cache_ms=None):
+    """The request's timings for ?debug=timings: admission or lane wait, cache lookup and analysis stages"""
+    stages = {'admission': round(g.get('admission_wait', 0.0) * 1000, 2)}
+    if cache_ms is not None:
+        stages['cache'] = round(cache_ms, 2)
+    if timings:
+        stages.update(timings['stages'])
+    report = {
+        'totalMs': round((time.perf_counter() - started) * 1000, 2),
+        'analysisMs': timings['totalMs'] if timings else 0.0,
+        'cached': timings is None,
+        'stages': stages,
+        'counts': timings['counts'] if timings else {}
+    }
+    if g.get('lane'):
+        report['lane'] = g.lane
+    return report
+
+def at_capacity(message):
+    """503 with Retry-After, which the Node backend honours before giving up"""
+    response = jsonify({'error': message})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(admission.retry_after)
+    return response
+
+def admitted(view):
+    """Run the view only when the admission gate has a free analysis slot"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        waiting = time.perf_counter()
+        acquired = admission.acquire()
+        g.admission_wait = time.perf_counter() - waiting
+        if not acquired:
+            return at_capacity('Service is at capacity, please retry later')
+        try:
+            return view(*args, **kwargs)
+        finally:
+            admission.release()
+    return wrapper
+
 @app.route('/analyze', methods=['POST'])
 def analyze_vector_file():
     try:
@@ -26,27 +481,238 @@ def analyze_vector_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Unsupported file format'}), 400
         
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        try:
-            # Process the file
-            processor = VectorProcessor()
-            result = processor.analyze_file(temp_path, file.filename)
-            return jsonify(result)
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        started = time.perf_counter()
+        data = file.read()
+        options = analysis_options(file.filename)
+        output, shapes = output_options()
+        debug = debug_flags()
+        deadline_ms = request_deadline()
+        prescan = upload_prescan(file)
+        cache_key = make_cache_key(data, options)
+        lookup_started = time.perf_counter()
+        result = cache_lookup(cache_key)
+        cache_ms = (time.perf_counter() - lookup_started) * 1000
+        timings = None
+        if result is not None:
+            result.file_name = file.filename
+        else:
+            # Analyzed in a lane worker, which is killed when the deadline (counted from the request's start) passes
+            try:
+                result, g.lane, g.admission_wait = run_in_lane(data, file.filename, options, prescan, deadline_ms,
+                                                               g.request_started)
+            except AnalysisTimeout as e:
+                return jsonify(timeout_document(e, file.filename, prescan)), 504
+            timings = record_analysis(result, options['format'])
+            if result.error is None:
+                result_cache.put(cache_key, result)
+        result.prescan = prescan
+        if 'timings' in debug:
+            return respond(result, output, shapes, request_timings(started, timings, cache_ms))
+        return respond(result, output, shapes)
                 
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except LaneFull as e:
+        return at_capacity(str(e))
+    except OptionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analyze/batch', methods=['POST'])
+@admitted
+def analyze_vector_files():
+    try:
+        files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({'error': f'Too many files (max {MAX_BATCH_FILES})'}), 400
+        
+        output, shapes = output_options(packed=False)
+        debug = debug_flags()
+        deadline_ms = request_deadline()
+        results = [None] * len(files)
+        pending = []  # (index, cache_key, data, file, options)
+        for i, file in enumerate(files):
+            if not allowed_file(file.filename):
+                results[i] = {'fileName': file.filename, 'error': 'Unsupported file format'}
+                continue
+            if upload_error(file):
+                results[i] = {'fileName': file.filename, 'error': upload_error(file)}
+                continue
+            
+            data = file.read()
+            options = analysis_options(file.filename)
+            cache_key = make_cache_key(data, options)
+            cached = cache_lookup(cache_key)
+            if cached is not None:
+                cached.file_name = file.filename
+                cached.prescan = upload_prescan(file)
+                results[i] = cached.serialize(output, shapes)
+            else:
+                pending.append((i, cache_key, data, file, options))
+        
+        # Cache misses are analyzed concurrently in the lanes, within the request's deadline; one failing or
+        # cancelled file does not affect the others
+        analyzed = run_batch_in_lanes([(data, file.filename, options, upload_prescan(file))
+                                       for _, _, data, file, options in pending], deadline_ms, g.request_started)
+        for (i, cache_key, _, file, options), result in zip(pending, analyzed):
+            if isinstance(result, AnalysisTimeout):
+                results[i] = dict(timeout_document(result, file.filename, upload_prescan(file)), status=504)
+                continue
+            timings = record_analysis(result, options['format'])
+            if result.error is None:
+                result_cache.put(cache_key, result)
+            result.prescan = upload_prescan(file)
+            results[i] = result.serialize(output, shapes)
+            if 'timings' in debug and timings:
+                results[i]['timings'] = timings
+        
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'failed': sum(1 for r in results if 'error' in r)
+        })
+        
+    except OptionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Unsupported file format'}), 400
+        
+        # Optional URL that receives the finished job document as a JSON POST
+        callback_url = request.values.get('callbackUrl') or None
+        if callback_url is not None:
+            try:
+                job_queue.check_callback(callback_url)
+            except CallbackRejected as e:
+                return jsonify({'error': str(e)}), 400
+        
+        data = file.read()
+        options = analysis_options(file.filename)
+        output, shapes = output_options(packed=False)
+        deadline_ms = request_deadline(JOB_DEADLINE_MS)
+        cached = cache_lookup(make_cache_key(data, options))
+        prescan = upload_prescan(file)
+        if cached is not None:
+            cached.file_name = file.filename
+            cached.prescan = prescan
+            job_id = job_queue.complete(file.filename, options, cached.serialize(output, shapes), callback_url)
+        else:
+            # Non-default output settings travel with the job's options; run_job takes them off again
+            if output != 'legacy':
+                options['output'] = output
+            if not shapes:
+                options['shapes'] = 'none'
+            options['prescan'] = prescan
+            options['deadlineMs'] = deadline_ms
+            job_id = job_queue.submit(data, file.filename, options, callback_url)
+        
+        response = jsonify(job_queue.get(job_id))
+        response.status_code = 202
+        response.headers['Location'] = f'/jobs/{job_id}'
+        return response
+        
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except QueueFull as e:
+        return at_capacity(str(e))
+    except OptionError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'})
+    return jsonify({
+        'status': 'healthy',
+        'cache': result_cache.get_stats(),
+        'admission': admission.get_stats(),
+        'jobs': job_queue.get_stats(),
+        'lanes': scheduler.get_stats(),
+        'startup': dict(startup, importMs=import_times())
+    })
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    document, age_ms = capacity_document()
+    response = jsonify(dict(document, ageMs=age_ms))
+    # Not warmed up yet, or no lane with an idle worker or queue room: send traffic elsewhere
+    if not (document['ready'] and document['accepting']):
+        response.status_code = 503
+        response.headers['Retry-After'] = str(admission.retry_after)
+    return response
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.get_stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    admission_stats = admission.get_stats()
+    cache = result_cache.get_stats()
+    jobs = job_queue.get_stats()
+    lanes = scheduler.get_stats()
+    text = metrics.render([
+        ('vector_admission_active', 'Analyses running in this worker', [({}, admission_stats['active'])]),
+        ('vector_admission_queued', 'Requests waiting for an analysis slot in this worker', [({}, admission_stats['queued'])]),
+        ('vector_lane_active', 'Analyses running in each lane of this worker',
+         [({'lane': lane}, lanes[lane]['active']) for lane in LANES]),
+        ('vector_lane_queued', 'Requests waiting for a worker in each lane of this worker',
+         [({'lane': lane}, lanes[lane]['queued']) for lane in LANES]),
+        ('vector_cache_entries', 'Results held in this worker\'s memory cache', [({}, cache['entries'])]),
+        ('vector_cache_bytes', 'Size of this worker\'s memory cache', [({}, cache['bytes'])]),
+        ('vector_jobs', 'Jobs in the job queue by status',
+         [({'status': status}, jobs[status]) for status in ('queued', 'running', 'done', 'failed')])
+    ])
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.inc('vector_http_requests_total', endpoint=endpoint, status=response.status_code)
+    metrics.observe('vector_http_request_seconds', time.perf_counter() - g.get('request_started', time.perf_counter()),
+                    endpoint=endpoint)
+    metrics.flush()
+    if endpoint in LOAD_HINT_ENDPOINTS:
+        response.headers.update(load_headers())
+    if startup['firstResponse'] is None and endpoint in ANALYSIS_ENDPOINTS:
+        startup['firstResponse'] = {
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'sinceBootMs': since_boot_ms(),
+            'durationMs': round((time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000, 1)
+        }
+    return response
+
+startup['bootMs'] = since_boot_ms()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    warm_up()
+    app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
\ No newline at end of file
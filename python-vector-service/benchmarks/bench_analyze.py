@@ -0,0 +1,343 @@
+"""End-to-end benchmark of VectorProcessor and the /analyze endpoint on synthetic drawings.
+
+Every case runs in a fresh process, so its peak RSS is its own. It is
+measured twice: directly through VectorProcessor.analyze_file and through
+the Flask test client's /analyze, whose peak RSS adds that of the lane and
+pool workers the analysis ran in. Run from the service directory:
+
+    python benchmarks/bench_analyze.py [--suite quick|full] [--repeat 5] --save baseline.json
+    python benchmarks/bench_analyze.py --compare baseline.json [--threshold 0.15]
+    python benchmarks/bench_analyze.py --cold-start [--repeat 3]
+
+--compare exits with status 1 when a case got slower or larger than the
+thresholds allow, or when its results changed. --cold-start instead times
+fresh processes up to their first /analyze response, with and without the
+warm-up workers run before taking traffic, and the import time per library.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import corpus  # noqa: E402
+
+BASELINE_VERSION = 1
+
+# (name, format, generator parameters, analysis options)
+QUICK_CASES = [
+    ('svg-1k', 'svg', {'paths': 1000, 'vertices': 40}, {}),
+    ('svg-1k-lines', 'svg', {'paths': 1000, 'vertices': 40, 'curve_ratio': 0.0}, {}),
+    ('eps-1k', 'eps', {'paths': 1000, 'vertices': 40}, {}),
+    ('pdf-4p', 'pdf', {'pages': 4, 'paths': 1000, 'vertices': 40}, {'pages': 'all'}),
+    ('dxf-1k-inserts', 'dxf', {'paths': 1000, 'vertices': 40, 'inserts': 1000}, {}),
+    ('svg-1k-material', 'svg', {'paths': 1000, 'vertices': 40}, {'area': 'material'}),
+]
+FULL_CASES = QUICK_CASES + [
+    ('svg-10k', 'svg', {'paths': 10000, 'vertices': 40}, {}),
+    ('svg-200-dense', 'svg', {'paths': 200, 'vertices': 2000, 'curve_ratio': 1.0}, {}),
+    ('eps-20k', 'eps', {'paths': 20000, 'vertices': 40}, {}),
+    ('pdf-16p', 'pdf', {'pages': 16, 'paths': 8000, 'vertices': 40}, {'pages': 'all'}),
+    ('dxf-10k-inserts', 'dxf', {'paths': 500, 'vertices': 40, 'inserts': 10000}, {}),
+    ('eps-20k-material', 'eps', {'paths': 20000, 'vertices': 40}, {'area': 'material'}),
+    # Dense straight outlines, like auto-traced bitmaps, united with and without simplifying them first
+    ('eps-200-traced-material', 'eps', {'paths': 200, 'vertices': 2000, 'curve_ratio': 0.0}, {'area': 'material'}),
+    ('eps-200-traced-simplified', 'eps', {'paths': 200, 'vertices': 2000, 'curve_ratio': 0.0},
+     {'area': 'material', 'simplify': 0.1}),
+    # A segment budget instead of quick mode's time budget keeps the sampled result reproducible
+    ('svg-10k-quick', 'svg', {'paths': 10000, 'vertices': 40}, {'mode': 'quick', 'budgetMs': 600000, 'maxSegments': 20000}),
+]
+SUITES = {'quick': QUICK_CASES, 'full': FULL_CASES}
+MODES = ('direct', 'http')
+
+# Small drawings whose first analysis in a fresh process is dominated by start-up costs
+COLD_START_CASES = [
+    ('svg', {'paths': 100, 'vertices': 40}),
+    ('dxf', {'paths': 100, 'vertices': 40, 'inserts': 100}),
+    ('pdf', {'pages': 1, 'paths': 100, 'vertices': 40}),
+    ('eps', {'paths': 100, 'vertices': 40}),
+]
+
+
+def _peak_rss_mb(pids=()):
+    """Peak RSS of this process plus the peaks of the worker processes pids (Linux only)"""
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                peak += next((int(line.split()[1]) / 1024 for line in status if line.startswith('VmHWM:')), 0)
+        except OSError:
+            pass
+    return peak
+
+
+def _run_case(mode, fmt, data, options, repeat):
+    """Run one case in this (fresh) process: the service warm-up, one warm-up run, then repeat timed analyses"""
+    filename = f'synthetic.{fmt}'
+    if mode == 'direct':
+        from vector_processor import VectorProcessor, warm_up
+
+        processor = VectorProcessor()
+        warm_up([fmt])
+
+        def worker_pids():
+            return []
+
+        def analyze():
+            return processor.analyze_file(data, filename, options)
+    else:
+        os.environ.pop('VECTOR_CACHE_PATH', None)
+        os.environ['VECTOR_JOB_DB'] = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+        os.environ['VECTOR_WARM_FORMATS'] = fmt
+        import app as service
+        from io import BytesIO
+        from analysis_pool import pool_pids
+
+        # /analyze runs in a lane worker (and multi-page PDFs on the pool), so their memory counts too
+        service.warm_up()
+        client = service.app.test_client()
+
+        def worker_pids():
+            return service.scheduler.pids() + pool_pids()
+
+        form = dict(options, debug='timings')
+
+        def analyze():
+            service.result_cache.clear()  # every run must analyze, not hit the cache
+            response = client.post('/analyze', data={**form, 'file': (BytesIO(data), filename)})
+            return response.get_json()
+
+    # The format's libraries were loaded first, as served workers do, so their import is not counted as growth
+    baseline_rss = _peak_rss_mb(worker_pids())
+    result = analyze()
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = analyze()
+        times.append(time.perf_counter() - started)
+    timings = result.get('timings') or {}
+    return {
+        'times': times,
+        'peakRssMb': _peak_rss_mb(worker_pids()),
+        'baseRssMb': baseline_rss,
+        'stages': timings.get('stages', {}),
+        'counts': timings.get('counts', {}),
+        'letterArea': result.get('letterArea'),
+        'pathLength': result.get('pathLength'),
+        'shapes': len(result.get('shapes', []))
+    }
+
+
+def _cold_start(fmt, data, warm):
+    """In this (fresh) process: import the service, warm up if asked, then time the first /analyze"""
+    started = time.perf_counter()
+    os.environ.pop('VECTOR_CACHE_PATH', None)
+    os.environ['VECTOR_JOB_DB'] = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    os.environ['VECTOR_WARM_FORMATS'] = fmt
+    import app as service
+    from io import BytesIO
+    from plugins import import_times
+
+    boot = time.perf_counter() - started
+    warm_up_ms = service.warm_up()['totalMs'] if warm else None
+    request_started = time.perf_counter()
+    response = service.app.test_client().post('/analyze', data={'file': (BytesIO(data), f'synthetic.{fmt}')})
+    finished = time.perf_counter()
+    if response.status_code != 200:
+        raise RuntimeError(response.get_json().get('error'))
+    return {
+        'bootMs': boot * 1000,
+        'warmUpMs': warm_up_ms,
+        'firstResponseMs': (finished - request_started) * 1000,
+        'sinceStartMs': (finished - started) * 1000,
+        'importMs': import_times()
+    }
+
+
+def run_cold_start(repeat, log=print):
+    """Median start-up timings per format, cold and warmed up, each run in a fresh process"""
+    results = {}
+    context = get_context('spawn')
+    for fmt, params in COLD_START_CASES:
+        data = corpus.make(fmt, **params)
+        for warm in (False, True):
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    runs.append(pool.submit(_cold_start, fmt, data, warm).result())
+            median = lambda field: round(statistics.median(run[field] for run in runs), 1)
+            record = {
+                'format': fmt,
+                'warmUp': warm,
+                'bootMs': median('bootMs'),
+                'warmUpMs': median('warmUpMs') if warm else None,
+                'firstResponseMs': median('firstResponseMs'),
+                'sinceStartMs': median('sinceStartMs'),
+                'importMs': {library: round(statistics.median(run['importMs'].get(library, 0) for run in runs), 1)
+                             for library in runs[-1]['importMs']}
+            }
+            key = f"{fmt}/{'warm' if warm else 'cold'}"
+            results[key] = record
+            imports = ', '.join(f'{library} {ms:.0f}' for library, ms in record['importMs'].items()) or '-'
+            log(f"{key:<12} {record['bootMs']:>8.0f} {record['warmUpMs'] or 0:>8.0f} {record['firstResponseMs']:>10.1f} "
+                f"{record['sinceStartMs']:>10.0f}  {imports}")
+    return results
+
+
+def run_suite(cases, modes, repeat, log=print):
+    results = {}
+    context = get_context('spawn')
+    for name, fmt, params, options in cases:
+        data = corpus.make(fmt, **params)
+        for mode in modes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                run = pool.submit(_run_case, mode, fmt, data, options, repeat).result()
+            times = run['times']
+            best, median = min(times), statistics.median(times)
+            items = run['counts'].get('segments') or run['counts'].get('entities') or run['counts'].get('paths') or 0
+            record = {
+                'format': fmt,
+                'mode': mode,
+                'params': params,
+                'options': options,
+                'bytes': len(data),
+                'bestMs': round(best * 1000, 2),
+                'medianMs': round(median * 1000, 2),
+                'stdevMs': round(statistics.stdev(times) * 1000, 2) if len(times) > 1 else 0.0,
+                'throughputMBs': round(len(data) / median / 1e6, 3),
+                'itemsPerSecond': round(items / median) if items else None,
+                'peakRssMb': round(run['peakRssMb'], 1),
+                'rssGrowthMb': round(run['peakRssMb'] - run['baseRssMb'], 1),
+                'stages': run['stages'],
+                'counts': run['counts'],
+                'letterArea': run['letterArea'],
+                'pathLength': run['pathLength'],
+                'shapes': run['shapes']
+            }
+            key = f'{name}/{mode}'
+            results[key] = record
+            log(f"{key:<28} {record['bytes'] / 1024:>9.0f} {record['bestMs']:>10.1f} {record['medianMs']:>10.1f} "
+                f"{record['throughputMBs']:>8.2f} {record['peakRssMb']:>8.1f}")
+    return results
+
+
+def environment():
+    import numpy
+    import shapely
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'shapely': shapely.__version__
+    }
+
+
+def compare(baseline, current, threshold, rss_threshold):
+    """Regressions of current against baseline as (case, message) pairs"""
+    regressions = []
+    for key, now in current.items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        # Best-of-N is the least noisy estimate; a 1 ms floor keeps tiny cases from flapping
+        ratio = now['bestMs'] / max(before['bestMs'], 1.0)
+        if ratio > 1 + threshold:
+            regressions.append((key, f"time {before['bestMs']:.1f} -> {now['bestMs']:.1f} ms (+{(ratio - 1) * 100:.0f}%)"))
+        growth, base_growth = now['rssGrowthMb'], max(before['rssGrowthMb'], 1.0)
+        if growth > base_growth * (1 + rss_threshold):
+            regressions.append((key, f"memory growth {before['rssGrowthMb']:.1f} -> {growth:.1f} MB"))
+        for field in ('letterArea', 'pathLength', 'shapes'):
+            if before.get(field) != now.get(field):
+                regressions.append((key, f"{field} changed: {before.get(field)!r} -> {now.get(field)!r}"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick')
+    parser.add_argument('--cases', nargs='+', help='run only these cases (names as in the suite)')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write the results to this JSON baseline')
+    parser.add_argument('--compare', help='compare against this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+    parser.add_argument('--rss-threshold', type=float, default=0.25, help='allowed growth of peak memory')
+    parser.add_argument('--cold-start', action='store_true', help='time fresh processes up to their first response')
+    args = parser.parse_args()
+
+    if args.cold_start:
+        if args.compare:
+            parser.error('--cold-start cannot be combined with --compare')
+        print(f"{'case':<12} {'boot ms':>8} {'warm ms':>8} {'first ms':>10} {'total ms':>10}  imports (ms)")
+        results = run_cold_start(args.repeat)
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': BASELINE_VERSION,
+                    'createdAt': datetime.now(timezone.utc).isoformat(),
+                    'environment': environment(),
+                    'repeat': args.repeat,
+                    'coldStart': results
+                }, f, indent=2)
+            print(f'Saved {len(results)} results to {args.save}')
+        return
+
+    cases = SUITES[args.suite]
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != BASELINE_VERSION:
+            parser.error(f'{args.compare} is not a version {BASELINE_VERSION} baseline')
+        # Compare like with like: run the baseline's cases unless told otherwise
+        recorded = {key.split('/')[0] for key in baseline['results']}
+        cases = [case for case in FULL_CASES if case[0] in recorded]
+    if args.cases:
+        cases = [case for case in FULL_CASES if case[0] in args.cases]
+        missing = set(args.cases) - {case[0] for case in cases}
+        if missing:
+            parser.error(f"unknown case(s): {', '.join(sorted(missing))}")
+
+    print(f"{'case':<28} {'KiB':>9} {'best ms':>10} {'median ms':>10} {'MB/s':>8} {'RSS MB':>8}")
+    results = run_suite(cases, args.modes, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': BASELINE_VERSION,
+                'createdAt': datetime.now(timezone.utc).isoformat(),
+                'environment': environment(),
+                'repeat': args.repeat,
+                'results': results
+            }, f, indent=2)
+        print(f'Saved {len(results)} results to {args.save}')
+
+    if baseline is not None:
+        if baseline.get('environment') != environment():
+            print('Note: the baseline was recorded in a different environment')
+        regressions = compare(baseline, results, args.threshold, args.rss_threshold)
+        for key, message in regressions:
+            print(f'REGRESSION {key}: {message}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.compare}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Microbenchmark: the per-vertex Python loops the handlers used vs. the curves.py kernels.
+
+Run from the service directory:
+
+    python benchmarks/bench_geometry.py [--vertices 1000 10000 100000] [--repeat 5]
+
+Each size is one closed, wobbly polyline, also split into 50-vertex paths the
+way traced artwork arrives. The handlers fill a CurveBatch while they parse,
+so the kernels are timed on a freshly filled batch, and once more together with
+the add_lines calls that fill it from the same vertices.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from curves import CurveBatch, douglas_peucker  # noqa: E402
+
+PIECE = 50  # vertices per path in the many-paths case
+TOLERANCE = 0.1  # Douglas–Peucker tolerance in drawing units
+
+
+def python_path_length(path):
+    """The per-vertex loops the handlers used before the NumPy kernels"""
+    total_length = 0
+    for i in range(len(path) - 1):
+        x1, y1 = path[i]
+        x2, y2 = path[i + 1]
+        total_length += math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+    return total_length
+
+
+def python_polygon_area(path):
+    area = 0
+    n = len(path)
+    for i in range(n):
+        j = (i + 1) % n
+        area += path[i][0] * path[j][1]
+        area -= path[j][0] * path[i][1]
+    return abs(area) / 2
+
+
+def python_measure(paths):
+    return [(python_path_length(path), python_polygon_area(path)) for path in paths]
+
+
+def python_douglas_peucker(path, tolerance):
+    """Recursive Douglas–Peucker of one polyline, one span at a time; returns the kept indices"""
+    keep = {0, len(path) - 1}
+    spans = [(0, len(path) - 1)]
+    while spans:
+        lo, hi = spans.pop()
+        (ax, ay), (bx, by) = path[lo], path[hi]
+        cx, cy = bx - ax, by - ay
+        scale = cx * cx + cy * cy
+        farthest, split = -1.0, None
+        for i in range(lo + 1, hi):
+            dx, dy = path[i][0] - ax, path[i][1] - ay
+            t = min(max((dx * cx + dy * cy) / scale, 0.0), 1.0) if scale else 0.0
+            distance = (dx - t * cx) ** 2 + (dy - t * cy) ** 2
+            if distance > farthest:
+                farthest, split = distance, i
+        if split is not None and farthest > tolerance * tolerance:
+            keep.add(split)
+            spans += [(lo, split), (split, hi)]
+    return sorted(keep)
+
+
+def fill(paths):
+    batch = CurveBatch()
+    for path in paths:
+        batch.begin_path()
+        batch.add_lines([complex(x, y) for x, y in path])
+    return batch
+
+
+def batch_measure(batch):
+    # The shoelace loop closes every path, as close_subpaths does
+    lengths, areas, _ = batch.measure(close_subpaths=True)
+    return lengths, areas
+
+
+def batch_douglas_peucker(packed):
+    points, first, last = packed
+    return douglas_peucker(points, first, last, np.full(len(first), TOLERANCE))
+
+
+def make_polyline(vertices, seed=0):
+    """A closed, wobbly outline like a traced glyph"""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    r = 100 + 5 * np.sin(40 * t) + rng.normal(0, 0.05, vertices)
+    points = [(float(x), float(y)) for x, y in zip(r * np.cos(t), r * np.sin(t))]
+    return points + points[:1]
+
+
+def pack(paths):
+    """Polylines as one complex array with the first and last index of each, as CurveBatch.simplify packs runs"""
+    sizes = np.array([len(path) for path in paths])
+    last = np.cumsum(sizes) - 1
+    points = np.array([complex(x, y) for path in paths for x, y in path])
+    return points, last - sizes + 1, last
+
+
+def best_of(func, arg, repeat, setup=None):
+    """Best time of func(arg), or of func(setup(arg)) leaving setup out of the time"""
+    best = float('inf')
+    for _ in range(repeat):
+        value = arg if setup is None else setup(arg)
+        start = time.perf_counter()
+        func(value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vertices', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'vertices':>10} {'paths':>6} {'kernel':<10} {'python ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for vertices in args.vertices:
+        polyline = make_polyline(vertices)
+        pieces = [polyline[i:i + PIECE + 1] for i in range(0, vertices, PIECE)]
+        for paths in ([polyline], pieces):
+            expected, measured = python_measure(paths), batch_measure(fill(paths))
+            assert np.allclose(expected, np.column_stack(measured), rtol=1e-9)
+            packed = pack(paths)
+            kept = sum(len(python_douglas_peucker(path, TOLERANCE)) for path in paths)
+            assert kept == int(batch_douglas_peucker(packed).sum())
+            kernels = [
+                ('measure', python_measure, batch_measure, paths, fill),
+                ('fill+meas', python_measure, lambda p: batch_measure(fill(p)), paths, None),
+                ('simplify', lambda p: [python_douglas_peucker(path, TOLERANCE) for path in p],
+                 batch_douglas_peucker, packed, None),
+            ]
+            for name, python_func, numpy_func, numpy_arg, setup in kernels:
+                python_time = best_of(python_func, paths, args.repeat)
+                numpy_time = best_of(numpy_func, numpy_arg, args.repeat, setup)
+                print(f"{vertices:>10} {len(paths):>6} {name:<10} {python_time * 1000:>10.3f} "
+                      f"{numpy_time * 1000:>10.3f} {python_time / numpy_time:>7.1f}x")
+    print("measure = lengths and areas of every path, fill+meas = also filling the CurveBatch,")
+    print(f"simplify = Douglas–Peucker at tolerance {TOLERANCE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Synthetic SVG, DXF, EPS and PDF drawings for benchmarking the vector processor.
+
+Every generator is deterministic for a given seed and needs no network or
+sample files. Drawings are grids of closed wobbly outlines, like traced
+letters, with a controllable number of paths, vertices per path and share
+of curved segments.
+
+    python benchmarks/corpus.py --out /tmp/corpus [--paths 1000] [--vertices 40]
+"""
+import argparse
+import io
+import math
+import os
+
+import numpy as np
+
+
+def outlines(paths, vertices, seed=0, size=20.0):
+    """(paths, vertices, 2) array of closed outlines laid out on a grid, in drawing units"""
+    rng = np.random.default_rng(seed)
+    columns = max(1, math.ceil(math.sqrt(paths)))
+    t = np.linspace(0, 2 * math.pi, vertices, endpoint=False)
+    radius = size * 0.4 * (1 + 0.1 * np.sin(5 * t) + rng.normal(0, 0.01, (paths, vertices)))
+    index = np.arange(paths)
+    cx = (index % columns + 0.5) * size
+    cy = (index // columns + 0.5) * size
+    return np.stack([cx[:, None] + radius * np.cos(t), cy[:, None] + radius * np.sin(t)], axis=-1)
+
+
+def _segments(outline, curve_ratio, rng):
+    """Split an outline into ('L', end) and ('C', c1, c2, end) segments starting at its first vertex"""
+    count = len(outline)
+    curved = rng.random(count) < curve_ratio
+    for i in range(count):
+        start, end = outline[i], outline[(i + 1) % count]
+        if curved[i]:
+            normal = np.array([start[1] - end[1], end[0] - start[0]]) * 0.2
+            yield 'C', start + (end - start) / 3 + normal, start + 2 * (end - start) / 3 + normal, end
+        else:
+            yield 'L', end
+
+
+def _fmt(value):
+    return f'{value:.3f}'.rstrip('0').rstrip('.')
+
+
+def make_svg(paths=1000, vertices=40, curve_ratio=0.5, seed=0):
+    """An SVG document with one <path> per outline, dimensioned in mm"""
+    rng = np.random.default_rng(seed)
+    shapes = outlines(paths, vertices, seed)
+    extent = float(shapes.max()) + 10
+    out = io.StringIO()
+    out.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{_fmt(extent)}mm" height="{_fmt(extent)}mm" '
+              f'viewBox="0 0 {_fmt(extent)} {_fmt(extent)}">\n')
+    for outline in shapes:
+        d = [f'M{_fmt(outline[0][0])},{_fmt(outline[0][1])}']
+        for segment in _segments(outline, curve_ratio, rng):
+            d.append(segment[0] + ' '.join(f'{_fmt(p[0])},{_fmt(p[1])}' for p in segment[1:]))
+        out.write(f'<path d="{"".join(d)}Z" fill="black"/>\n')
+    out.write('</svg>\n')
+    return out.getvalue().encode('utf-8')
+
+
+def make_eps(paths=1000, vertices=40, curve_ratio=0.5, seed=0):
+    """An EPS file filling each outline with moveto/lineto/curveto/closepath"""
+    rng = np.random.default_rng(seed)
+    shapes = outlines(paths, vertices, seed)
+    extent = math.ceil(float(shapes.max()) + 10)
+    out = io.StringIO()
+    out.write('%!PS-Adobe-3.0 EPSF-3.0\n')
+    out.write(f'%%BoundingBox: 0 0 {extent} {extent}\n%%EndComments\n')
+    for outline in shapes:
+        out.write(f'newpath {_fmt(outline[0][0])} {_fmt(outline[0][1])} moveto\n')
+        for segment in _segments(outline, curve_ratio, rng):
+            coords = ' '.join(f'{_fmt(p[0])} {_fmt(p[1])}' for p in segment[1:])
+            out.write(f"{coords} {'lineto' if segment[0] == 'L' else 'curveto'}\n")
+        out.write('closepath fill\n')
+    out.write('showpage\n%%EOF\n')
+    return out.getvalue().encode('latin-1')
+
+
+def make_pdf(pages=1, paths=1000, vertices=40, curve_ratio=0.5, seed=0):
+    """A PDF with the outlines spread over its pages as filled drawings"""
+    import fitz  # PyMuPDF
+
+    rng = np.random.default_rng(seed)
+    per_page = max(1, math.ceil(paths / pages))
+    doc = fitz.open()
+    for page_number in range(pages):
+        shapes = outlines(per_page, vertices, seed + page_number)
+        extent = float(shapes.max()) + 10
+        page = doc.new_page(width=extent, height=extent)
+        shape = page.new_shape()
+        for outline in shapes:
+            current = fitz.Point(*outline[0])
+            for segment in _segments(outline, curve_ratio, rng):
+                points = [fitz.Point(*p) for p in segment[1:]]
+                if segment[0] == 'L':
+                    shape.draw_line(current, points[0])
+                else:
+                    shape.draw_bezier(current, *points)
+                current = points[-1]
+            shape.finish(fill=(0, 0, 0), color=None, closePath=True)
+        shape.commit()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_dxf(paths=1000, vertices=40, curve_ratio=0.5, inserts=0, seed=0):
+    """A DXF with closed LWPOLYLINE outlines (bulges for curved segments) and block inserts
+
+    inserts > 0 adds a block holding a circle and a bulged polyline that many
+    times, at varying rotations.
+    """
+    import ezdxf
+
+    rng = np.random.default_rng(seed)
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    shapes = outlines(paths, vertices, seed)
+    for outline in shapes:
+        bulges = np.where(rng.random(len(outline)) < curve_ratio, 0.2, 0.0)
+        msp.add_lwpolyline([(x, y, 0, 0, b) for (x, y), b in zip(outline.tolist(), bulges.tolist())],
+                           format='xyseb', close=True)
+    if inserts:
+        block = doc.blocks.new('MARK')
+        block.add_circle((0, 0), 2)
+        block.add_lwpolyline([(-3, -3, 0.4), (3, -3, 0), (3, 3, 0.4), (-3, 3, 0)], format='xyb', close=True)
+        offset = float(shapes.max()) + 20 if paths else 0.0
+        columns = max(1, math.ceil(math.sqrt(inserts)))
+        for i in range(inserts):
+            msp.add_blockref('MARK', (offset + (i % columns) * 10, (i // columns) * 10),
+                             dxfattribs={'rotation': (i * 7) % 360})
+    stream = io.StringIO()
+    doc.write(stream)
+    return stream.getvalue().encode('utf-8')
+
+
+GENERATORS = {
+    'svg': make_svg,
+    'eps': make_eps,
+    'pdf': make_pdf,
+    'dxf': make_dxf
+}
+
+
+def make(fmt, **params):
+    """Generate a drawing of the given format; params are passed to its generator"""
+    return GENERATORS[fmt](**params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True, help='directory to write the drawings to')
+    parser.add_argument('--paths', type=int, default=1000)
+    parser.add_argument('--vertices', type=int, default=40)
+    parser.add_argument('--curves', type=float, default=0.5, help='share of curved segments')
+    parser.add_argument('--pages', type=int, default=4, help='PDF pages')
+    parser.add_argument('--inserts', type=int, default=1000, help='DXF block inserts')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    common = {'paths': args.paths, 'vertices': args.vertices, 'curve_ratio': args.curves}
+    drawings = {
+        'svg': make_svg(**common),
+        'eps': make_eps(**common),
+        'pdf': make_pdf(pages=args.pages, **common),
+        'dxf': make_dxf(inserts=args.inserts, **common)
+    }
+    for fmt, data in drawings.items():
+        path = os.path.join(args.out, f'synthetic.{fmt}')
+        with open(path, 'wb') as f:
+            f.write(data)
+        print(f'{path}: {len(data) / 1024:.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Analysis modes, and time/segment budgets for quick estimates.
+
+A budgeted analysis measures its units (paths, DXF entities, PDF pages or
+windows of a PostScript stream) until the budget runs out. Units are taken in
+random order where the format allows it, so the part that was measured is a
+random sample and the totals can be extrapolated with a sampling error.
+"""
+import math
+import os
+import time
+
+import numpy as np
+
+from curves import DEFAULT_TOLERANCE
+
+MODES = ('quick', 'standard', 'precise')
+
+# Curve tolerance and default time budget (ms) per mode; an explicit tolerance or budget wins
+MODE_SETTINGS = {
+    'quick': {'tolerance': 1e-3, 'budgetMs': float(os.environ.get('VECTOR_QUICK_BUDGET_MS', 50))},
+    'standard': {'tolerance': DEFAULT_TOLERANCE, 'budgetMs': None},
+    'precise': {'tolerance': 1e-7, 'budgetMs': None}
+}
+
+# Seed of the sampling order, so repeated quick analyses of a file agree
+SAMPLE_SEED = 0
+
+
+class AnalysisBudget:
+    """Wall-clock and segment allowance of one analysis, counted from its start"""
+
+    def __init__(self, milliseconds=None, segments=None, started=None):
+        started = time.perf_counter() if started is None else started
+        self.deadline = None if milliseconds is None else started + milliseconds / 1000
+        self.segments = segments
+
+    @classmethod
+    def from_options(cls, options, started=None):
+        """The budget set by options ('budgetMs', 'maxSegments', or the mode's default), or None"""
+        milliseconds = options.get('budgetMs', MODE_SETTINGS[options.get('mode', 'standard')]['budgetMs'])
+        segments = options.get('maxSegments')
+        # Material areas need every outline, so they are never estimated
+        if (milliseconds is None and segments is None) or options.get('area') == 'material':
+            return None
+        return cls(milliseconds, segments, started)
+
+    def exceeded(self, segments=0):
+        """Whether the time is up or segments (measured so far) reached the segment allowance"""
+        if self.segments is not None and segments >= self.segments:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+
+def mode_tolerance(options):
+    """Curve tolerance for the options: an explicit 'tolerance', else the mode's"""
+    return options.get('tolerance', MODE_SETTINGS[options.get('mode', 'standard')]['tolerance'])
+
+
+def sample_order(count):
+    """Indices 0..count-1 in the fixed random order budgeted analyses measure units in"""
+    return np.random.default_rng(SAMPLE_SEED).permutation(count)
+
+
+def chunks(order, first=32, largest=1024):
+    """Split a sampling order into growing chunks, so budgets are checked often early on"""
+    start, size = 0, first
+    while start < len(order):
+        yield order[start:start + size]
+        start += size
+        size = min(size * 2, largest)
+
+
+def extrapolate(values, sizes, total_size):
+    """(estimate, error) of a total from the values of sampled units
+
+    sizes are the sampled units' sizes (1 per path, bytes per window) and
+    total_size that of all units. The estimate scales the sampled total by
+    total_size / sum(sizes); the error is two standard errors of that ratio
+    estimate (about a 95 % bound), or None with fewer than two units.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    sampled = float(sizes.sum())
+    if not sampled:
+        return 0.0, None
+    ratio = float(values.sum()) / sampled
+    estimate = ratio * total_size
+    count = len(values)
+    if count < 2:
+        return estimate, None
+    fraction = min(sampled / total_size, 1.0)
+    residual = float(np.sum((values - ratio * sizes) ** 2)) / (count - 1)
+    mean_size = sampled / count
+    variance = (1 - fraction) * residual / (count * mean_size ** 2) * total_size ** 2
+    return estimate, 2 * math.sqrt(variance)
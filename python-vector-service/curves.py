@@ -0,0 +1,536 @@
+"""Length and signed-area engine for lines, quadratic/cubic Béziers and elliptical arcs.
+
+Points are complex numbers (x + yj), as in svgpathtools. Lengths are integrated
+with Gauss-Legendre quadrature and adaptive interval halving until the estimate
+agrees with its two halves to within a relative tolerance; every pass evaluates
+all pending segments as one NumPy array. Areas use Green's theorem,
+A = 1/2 * integral(x dy - y dx), which is exact for Béziers with 3-point
+quadrature and closed-form for arcs.
+"""
+import numpy as np
+
+DEFAULT_TOLERANCE = 1e-4
+MAX_DEPTH = 12
+
+_GL_NODES, _GL_WEIGHTS = np.polynomial.legendre.leggauss(8)
+_GL_NODES = (_GL_NODES + 1) / 2  # mapped to [0, 1]
+_GL_WEIGHTS = _GL_WEIGHTS / 2
+_AREA_NODES, _AREA_WEIGHTS = np.polynomial.legendre.leggauss(3)
+_AREA_NODES = (_AREA_NODES + 1) / 2
+_AREA_WEIGHTS = _AREA_WEIGHTS / 2
+
+LINE, CUBIC, ARC = 0, 1, 2
+
+# Largest distance between a flattened curve and the true curve, relative to the curve's size
+OUTLINE_FLATNESS = 1e-4
+MAX_OUTLINE_SAMPLES = 1024
+
+
+def _quadrature(speed, owner, lo, hi):
+    t = lo[:, None] + (hi - lo)[:, None] * _GL_NODES
+    return (speed(owner, t) * _GL_WEIGHTS).sum(axis=1) * (hi - lo)
+
+
+def adaptive_length(speed, lo, hi, tolerance=DEFAULT_TOLERANCE, max_depth=MAX_DEPTH):
+    """Integrate speed(owner, t) over [lo, hi] for every owner, halving intervals until converged"""
+    count = len(lo)
+    result = np.zeros(count)
+    owner = np.arange(count)
+    lo = np.asarray(lo, dtype=np.float64)
+    hi = np.asarray(hi, dtype=np.float64)
+    for depth in range(max_depth + 1):
+        if not len(owner):
+            break
+        mid = (lo + hi) / 2
+        whole = _quadrature(speed, owner, lo, hi)
+        halves = _quadrature(speed, owner, lo, mid) + _quadrature(speed, owner, mid, hi)
+        done = np.abs(whole - halves) <= tolerance * np.maximum(np.abs(halves), 1e-12)
+        if depth == max_depth:
+            done[:] = True
+        result += np.bincount(owner[done], weights=halves[done], minlength=count)
+        pending = ~done
+        owner = np.concatenate((owner[pending], owner[pending]))
+        lo, hi = np.concatenate((lo[pending], mid[pending])), np.concatenate((mid[pending], hi[pending]))
+    return result
+
+
+def quadratic_to_cubic(p0, p1, p2):
+    """Exact degree elevation of quadratic Béziers"""
+    return p0, p0 + (p1 - p0) * (2 / 3), p2 + (p1 - p2) * (2 / 3), p2
+
+
+def _cubic_derivative(p0, p1, p2, p3, t):
+    mt = 1 - t
+    return 3 * ((p1 - p0)[:, None] * mt**2 + 2 * (p2 - p1)[:, None] * mt * t + (p3 - p2)[:, None] * t**2)
+
+
+def _cubic_point(p0, p1, p2, p3, t):
+    mt = 1 - t
+    return (p0[:, None] * mt**3 + 3 * p1[:, None] * mt**2 * t +
+            3 * p2[:, None] * mt * t**2 + p3[:, None] * t**3)
+
+
+def cubic_lengths(p0, p1, p2, p3, tolerance=DEFAULT_TOLERANCE):
+    """Arc length of cubic Béziers given as complex control point arrays"""
+    p0, p1, p2, p3 = (np.asarray(p, dtype=np.complex128) for p in (p0, p1, p2, p3))
+    speed = lambda owner, t: np.abs(_cubic_derivative(p0[owner], p1[owner], p2[owner], p3[owner], t))
+    return adaptive_length(speed, np.zeros(len(p0)), np.ones(len(p0)), tolerance)
+
+
+def cubic_signed_areas(p0, p1, p2, p3):
+    """Green's-theorem area contribution of each cubic Bézier"""
+    p0, p1, p2, p3 = (np.asarray(p, dtype=np.complex128) for p in (p0, p1, p2, p3))
+    t = np.broadcast_to(_AREA_NODES, (len(p0), len(_AREA_NODES)))
+    z = _cubic_point(p0, p1, p2, p3, t)
+    dz = _cubic_derivative(p0, p1, p2, p3, t)
+    return (np.imag(np.conj(z) * dz) * _AREA_WEIGHTS).sum(axis=1) / 2
+
+
+def line_signed_areas(p0, p1):
+    """Green's-theorem area contribution of each straight segment"""
+    return np.imag(np.conj(np.asarray(p0, dtype=np.complex128)) * np.asarray(p1, dtype=np.complex128)) / 2
+
+
+def arc_lengths(rx, ry, theta0, delta, tolerance=DEFAULT_TOLERANCE):
+    """Arc length of elliptical arcs; angles in radians, delta signed"""
+    rx, ry = np.asarray(rx, dtype=np.float64), np.asarray(ry, dtype=np.float64)
+    theta0, delta = np.asarray(theta0, dtype=np.float64), np.asarray(delta, dtype=np.float64)
+    speed = lambda owner, t: np.hypot(rx[owner][:, None] * np.sin(t), ry[owner][:, None] * np.cos(t))
+    lo = np.minimum(theta0, theta0 + delta)
+    hi = np.maximum(theta0, theta0 + delta)
+    return adaptive_length(speed, lo, hi, tolerance)
+
+
+def arc_signed_areas(center, rx, ry, phi, theta0, delta):
+    """Closed-form Green's-theorem area contribution of elliptical arcs"""
+    center = np.asarray(center, dtype=np.complex128)
+    rx, ry = np.asarray(rx, dtype=np.float64), np.asarray(ry, dtype=np.float64)
+    theta0, delta = np.asarray(theta0, dtype=np.float64), np.asarray(delta, dtype=np.float64)
+    rotation = np.exp(1j * np.asarray(phi, dtype=np.float64))
+    theta1 = theta0 + delta
+    chord = (rx * (np.cos(theta1) - np.cos(theta0)) + 1j * ry * (np.sin(theta1) - np.sin(theta0)))
+    return (np.imag(np.conj(center) * rotation * chord) + rx * ry * delta) / 2
+
+
+def affine_point(m, z):
+    """Complex point z mapped through the affine matrix m = (a, b, c, d, e, f)"""
+    a, b, c, d, e, f = m
+    x, y = z.real, z.imag
+    return complex(a * x + c * y + e, b * x + d * y + f)
+
+
+def transform_arc(m, center, rx, ry, phi, theta0, delta):
+    """(center, rx, ry, phi, theta0, delta) of an elliptical arc mapped through the affine matrix m"""
+    a, b, c, d, _, _ = m
+    cos, sin = np.cos(phi), np.sin(phi)
+    # The arc is center + A (cos t, sin t); A = U diag(rx', ry') W^T gives the new axes (U) and
+    # the rotation or reflection (W) of the parameter
+    axes = np.array([[a, c], [b, d]]) @ np.array([[cos * rx, -sin * ry], [sin * rx, cos * ry]])
+    u, radii, wt = np.linalg.svd(axes)
+    if np.linalg.det(u) < 0:
+        u[:, 1] = -u[:, 1]
+        wt[1] = -wt[1]
+    shift = np.arctan2(wt[0, 1], wt[0, 0])
+    if np.linalg.det(wt) > 0:
+        theta0, delta = theta0 - shift, delta
+    else:
+        theta0, delta = shift - theta0, -delta
+    return (affine_point(m, center), float(radii[0]), float(radii[1]), float(np.arctan2(u[1, 0], u[0, 0])),
+            float(theta0), float(delta))
+
+
+def _subpaths(owner, start, end):
+    """Split segments into subpaths: (subpath per segment, first and last segment, closed) per subpath"""
+    # Subpaths break wherever a path starts or a segment does not continue the previous one
+    scale = max(float(np.abs(np.concatenate((start, end))).max()), 1.0)
+    breaks = np.ones(len(owner), dtype=bool)
+    breaks[1:] = (owner[1:] != owner[:-1]) | (np.abs(start[1:] - end[:-1]) > 1e-9 * scale)
+    subpath = np.cumsum(breaks) - 1
+    first = np.flatnonzero(breaks)
+    last = np.append(first[1:] - 1, len(owner) - 1)
+    closed = np.abs(end[last] - start[first]) <= 1e-9 * scale
+    return subpath, first, last, closed
+
+
+def douglas_peucker(points, first, last, tolerance):
+    """Douglas–Peucker simplification of many polylines at once: a mask of the vertices to keep
+
+    Polyline k is points[first[k]:last[k] + 1] and keeps the vertices needed to
+    stay within tolerance[k] of every vertex it drops. Each pass splits all
+    pending spans at their farthest vertex with one set of array operations.
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[first] = keep[last] = True
+    x, y = points.real.copy(), points.imag.copy()
+    pending = last - first > 1
+    lo, hi, limit = first[pending], last[pending], tolerance[pending] ** 2
+    while len(lo):
+        inner = hi - lo - 1
+        heads = np.cumsum(inner) - inner
+        index = np.arange(heads[-1] + inner[-1]) - np.repeat(heads - lo - 1, inner)
+        # Squared distance of every inner vertex to its span's chord (to the start point for closed spans)
+        ax, ay = x[lo], y[lo]
+        cx, cy = x[hi] - ax, y[hi] - ay
+        scale = cx * cx + cy * cy
+        np.divide(1.0, scale, out=scale, where=scale > 0)
+        dx = x[index]
+        dx -= np.repeat(ax, inner)
+        dy = y[index]
+        dy -= np.repeat(ay, inner)
+        cx, cy = np.repeat(cx, inner), np.repeat(cy, inner)
+        t = dx * cx
+        t += dy * cy
+        t *= np.repeat(scale, inner)
+        np.clip(t, 0.0, 1.0, out=t)
+        cx *= t
+        cy *= t
+        dx -= cx
+        dy -= cy
+        distance = np.square(dx, out=dx)
+        distance += np.square(dy, out=dy)
+        # Split every span that strays too far at its first farthest vertex
+        farthest = np.maximum.reduceat(distance, heads)
+        hits = np.flatnonzero(distance == np.repeat(farthest, inner))
+        span = np.searchsorted(heads, hits, side='right') - 1
+        split = farthest > limit
+        split_at = index[hits[np.flatnonzero(np.diff(span, prepend=-1))]][split]
+        keep[split_at] = True
+        lo = np.concatenate((lo[split], split_at))
+        hi = np.concatenate((split_at, hi[split]))
+        limit = np.concatenate((limit[split], limit[split]))
+        pending = hi - lo > 1
+        lo, hi, limit = lo[pending], hi[pending], limit[pending]
+    return keep
+
+
+class CurveBatch:
+    """Collects the segments of many paths and measures them in a few vectorized passes
+
+    Segments must be added path by path in drawing order. A segment that does not
+    start where the previous one ended begins a new subpath.
+    """
+
+    def __init__(self):
+        self.paths = 0
+        self._kind = []
+        self._owner = []
+        self._start = []
+        self._end = []
+        self._cubic = []  # (c1, c2) for cubics
+        self._arc = []    # (center, rx, ry, phi, theta0, delta) for arcs
+        self._current = -1
+        self._cache = None    # _arrays() of the segments added so far
+        self._dropped = None  # per segment: a line whose end vertex simplify() left out of outlines()
+        self._changes = None  # per subpath: (signed area change, bound on the area moved) from simplify()
+
+    def __len__(self):
+        return len(self._kind)
+
+    def reset(self):
+        """Drop all collected paths and segments"""
+        self.__init__()
+
+    def begin_path(self):
+        """Start a new path and return its index"""
+        self._current = self.paths
+        self.paths += 1
+        return self._current
+
+    def add_line(self, start, end):
+        self._add(LINE, start, end)
+
+    def add_lines(self, points, closed=False):
+        """Add a polyline through a sequence of complex points in one call"""
+        points = list(points)
+        if closed and len(points) > 2:
+            points.append(points[0])
+        count = len(points) - 1
+        if count < 1:
+            return
+        self._kind.extend([LINE] * count)
+        self._owner.extend([self._current] * count)
+        self._start.extend(points[:-1])
+        self._end.extend(points[1:])
+
+    def add_quadratic(self, start, control, end):
+        _, c1, c2, _ = quadratic_to_cubic(start, control, end)
+        self.add_cubic(start, c1, c2, end)
+
+    def add_cubic(self, start, control1, control2, end):
+        self._add(CUBIC, start, end)
+        self._cubic.append((control1, control2))
+
+    def add_arc(self, start, end, center, rx, ry, phi, theta0, delta):
+        """Elliptical arc: center + exp(i*phi) * (rx*cos(t) + i*ry*sin(t)) for t from theta0 by delta"""
+        self._add(ARC, start, end)
+        self._arc.append((center, rx, ry, phi, theta0, delta))
+
+    def add_svg_path(self, path, transform=None):
+        """Add every segment of an svgpathtools Path to the current path
+
+        transform is an optional affine matrix (a, b, c, d, e, f) applied to the
+        segments, as in an SVG transform attribute.
+        """
+        if transform is not None:
+            self._add_transformed(path, transform)
+            return
+        for seg in path:
+            kind = type(seg).__name__
+            if kind == 'Line':
+                self.add_line(seg.start, seg.end)
+            elif kind == 'CubicBezier':
+                self.add_cubic(seg.start, seg.control1, seg.control2, seg.end)
+            elif kind == 'QuadraticBezier':
+                self.add_quadratic(seg.start, seg.control, seg.end)
+            elif kind == 'Arc':
+                self.add_arc(seg.start, seg.end, seg.center, seg.radius.real, seg.radius.imag,
+                             seg.phi, np.radians(seg.theta), np.radians(seg.delta))
+
+    def _add_transformed(self, path, transform):
+        # Béziers map control point by control point; arcs become other elliptical arcs
+        point = lambda z: affine_point(transform, z)
+        for seg in path:
+            kind = type(seg).__name__
+            if kind == 'Line':
+                self.add_line(point(seg.start), point(seg.end))
+            elif kind == 'CubicBezier':
+                self.add_cubic(point(seg.start), point(seg.control1), point(seg.control2), point(seg.end))
+            elif kind == 'QuadraticBezier':
+                self.add_quadratic(point(seg.start), point(seg.control), point(seg.end))
+            elif kind == 'Arc':
+                arc = transform_arc(transform, seg.center, seg.radius.real, seg.radius.imag,
+                                    seg.phi, np.radians(seg.theta), np.radians(seg.delta))
+                self.add_arc(point(seg.start), point(seg.end), *arc)
+
+    def _add(self, kind, start, end):
+        self._kind.append(kind)
+        self._owner.append(self._current)
+        self._start.append(start)
+        self._end.append(end)
+
+    def simplify(self, tolerance, close_subpaths=False, paths=None):
+        """Leave the line vertices that lie within tolerance of a simplified outline out of outlines()
+
+        Every run of consecutive straight segments in the subpaths outlines() returns
+        for the same close_subpaths and paths is simplified with Douglas–Peucker;
+        curves and the ends of runs stay where they are, so rings keep their start,
+        end and closure. tolerance is a distance in the batch's coordinates. Lengths
+        and areas from measure() are not affected.
+
+        Returns (vertices, kept): the vertices of the simplified runs before and
+        after. outlines() then reports, per ring, the exact change of its signed
+        area and a bound on the area between the old and the new ring: every
+        dropped vertex lies within tolerance of the chord replacing it, so that area
+        is at most tolerance times the length of the segments that were replaced.
+        """
+        if not self._kind:
+            return 0, 0
+        kind, owner, start, end, subpath, first, _, sub_closed = self._arrays()
+        selected = sub_closed | close_subpaths
+        if paths is not None:
+            selected &= np.asarray(paths, dtype=bool)[owner[first]]
+        lines = (kind == LINE) & selected[subpath]
+        changes = np.zeros((len(first), 2))
+        self._dropped, self._changes = np.zeros(len(kind), dtype=bool), changes
+        if not lines.any():
+            return 0, 0
+
+        # A run begins at a line that does not follow another line of its subpath
+        heads = lines.copy()
+        heads[1:] &= ~lines[:-1] | (subpath[1:] != subpath[:-1])
+        lines = np.flatnonzero(lines)
+        run = np.cumsum(heads)[lines] - 1
+        heads = np.flatnonzero(heads)
+        # Run r holds its first line's start and then the end of each of its lines
+        vertex = np.arange(len(lines)) + run + 1
+        run_first = np.flatnonzero(np.diff(run, prepend=-1)) + np.arange(len(heads))
+        run_last = np.append(run_first[1:] - 1, vertex[-1])
+        points = np.empty(len(lines) + len(heads), dtype=np.complex128)
+        points[run_first] = start[heads]
+        points[vertex] = end[lines]
+        keep = douglas_peucker(points, run_first, run_last, np.full(len(heads), float(tolerance)))
+        kept = keep[vertex]
+        self._dropped[lines[~kept]] = True
+
+        # Lines that lost their end or start vertex are part of a span replaced by a chord;
+        # the ends of runs are kept, so every chord joins two kept vertices of one run
+        replaced = lines[~kept | ~keep[vertex - 1]]
+        kept_points = np.flatnonzero(keep)
+        chords = np.flatnonzero(np.diff(kept_points) > 1)
+        chord_start, chord_end = kept_points[chords], kept_points[chords + 1]
+        line_of = np.empty(len(points), dtype=np.intp)
+        line_of[vertex] = lines
+        count = len(first)
+        changes[:, 0] = np.bincount(subpath[line_of[chord_end]], minlength=count,
+                                    weights=line_signed_areas(points[chord_start], points[chord_end]))
+        changes[:, 0] -= np.bincount(subpath[replaced], weights=line_signed_areas(start[replaced], end[replaced]),
+                                     minlength=count)
+        changes[:, 1] = np.bincount(subpath[replaced], weights=np.abs(end[replaced] - start[replaced]) * tolerance,
+                                    minlength=count)
+        return len(points), int(keep.sum())
+
+    def _arrays(self):
+        """(kind, owner, start, end) arrays of the segments and their _subpaths, converted once for all passes"""
+        if self._cache is None or len(self._cache[0]) != len(self._kind):
+            kind = np.asarray(self._kind, dtype=np.int8)
+            owner = np.asarray(self._owner, dtype=np.intp)
+            start = np.asarray(self._start, dtype=np.complex128)
+            end = np.asarray(self._end, dtype=np.complex128)
+            self._cache = (kind, owner, start, end) + _subpaths(owner, start, end)
+            self._dropped = self._changes = None
+        return self._cache
+
+    def measure(self, tolerance=DEFAULT_TOLERANCE, close_subpaths=False):
+        """Return (lengths, areas, closed) arrays with one entry per path
+
+        Areas are unsigned per path but signed per subpath, so oppositely wound
+        inner contours (letter counters) are subtracted. Only closed subpaths
+        contribute area unless close_subpaths is set, which closes every subpath
+        with a straight chord as PDF and PostScript fills do.
+        """
+        lengths = np.zeros(self.paths)
+        areas = np.zeros(self.paths)
+        closed = np.zeros(self.paths, dtype=bool)
+        if not self._kind:
+            return lengths, areas, closed
+
+        kind, owner, start, end, subpath, first, last, sub_closed = self._arrays()
+        seg_lengths = np.zeros(len(kind))
+        seg_areas = np.zeros(len(kind))
+
+        lines = kind == LINE
+        seg_lengths[lines] = np.abs(end[lines] - start[lines])
+        seg_areas[lines] = line_signed_areas(start[lines], end[lines])
+
+        cubics = kind == CUBIC
+        if self._cubic:
+            controls = np.asarray(self._cubic, dtype=np.complex128)
+            c1, c2 = controls[:, 0], controls[:, 1]
+            seg_lengths[cubics] = cubic_lengths(start[cubics], c1, c2, end[cubics], tolerance)
+            seg_areas[cubics] = cubic_signed_areas(start[cubics], c1, c2, end[cubics])
+
+        arcs = kind == ARC
+        if self._arc:
+            params = np.asarray(self._arc, dtype=np.complex128)
+            center = params[:, 0]
+            rx, ry, phi, theta0, delta = (params[:, i].real for i in range(1, 6))
+            seg_lengths[arcs] = arc_lengths(rx, ry, theta0, delta, tolerance)
+            seg_areas[arcs] = arc_signed_areas(center, rx, ry, phi, theta0, delta)
+
+        sub_owner = owner[first]
+        sub_start, sub_end = start[first], end[last]
+
+        sub_areas = np.bincount(subpath, weights=seg_areas, minlength=len(first))
+        # The chord back to the subpath start; zero for subpaths that are already closed
+        sub_areas += line_signed_areas(sub_end, sub_start)
+        if not close_subpaths:
+            sub_areas = np.where(sub_closed, sub_areas, 0.0)
+
+        lengths = np.bincount(owner, weights=seg_lengths, minlength=self.paths)
+        areas = np.abs(np.bincount(sub_owner, weights=sub_areas, minlength=self.paths))
+        closed = np.bincount(sub_owner, weights=sub_closed, minlength=self.paths) > 0
+        return lengths, areas, closed
+
+    def outlines(self, close_subpaths=False, paths=None, flatness=OUTLINE_FLATNESS):
+        """Flatten subpaths to polygon rings: returns (coords, ring_index, ring_owner, ring_changes)
+
+        coords is an (n, 2) array holding every ring's vertices in turn and
+        ring_index gives the ring of each vertex, the layout shapely.linearrings
+        takes. Curves get enough vertices to stay within flatness (relative to
+        their size) of the true curve, and lines lose the vertices simplify()
+        dropped; ring_changes holds each ring's (signed area change, bound on the
+        area moved) from that, zeros without it. Only closed subpaths are included
+        unless close_subpaths is set, and only those of the paths selected by the
+        boolean mask paths.
+        """
+        if not self._kind:
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+        
+        points, offsets, owner, first, sub_closed = self._flatten(flatness, self._dropped)
+        keep = sub_closed | close_subpaths
+        if paths is not None:
+            keep &= np.asarray(paths, dtype=bool)[owner[first]]
+        sub_counts = np.diff(offsets[np.append(first, len(owner))])
+        # Rings need at least three vertices to enclose an area
+        keep &= sub_counts >= 3
+        selected = np.repeat(keep, sub_counts)
+        coords = np.column_stack((points.real, points.imag))[selected]
+        ring_index = np.repeat(np.arange(keep.sum()), sub_counts[keep])
+        changes = np.zeros((len(first), 2)) if self._changes is None else self._changes
+        return coords, ring_index, owner[first][keep], changes[keep]
+    
+    def points(self, flatness=OUTLINE_FLATNESS):
+        """Flattened vertices of every segment as an (n, 2) array, with the path of each vertex"""
+        if not self._kind:
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.intp)
+        points, offsets, owner, _, _ = self._flatten(flatness)
+        return np.column_stack((points.real, points.imag)), np.repeat(owner, np.diff(offsets))
+    
+    def bounds(self, flatness=OUTLINE_FLATNESS):
+        """(min_x, min_y, max_x, max_y) per path as a (paths, 4) array; NaN for paths without segments"""
+        result = np.full((self.paths, 4), np.nan)
+        coords, owner = self.points(flatness)
+        if not len(coords):
+            return result
+        # Vertices are ordered by path, so every path is one contiguous run
+        heads = np.concatenate(([0], np.flatnonzero(np.diff(owner)) + 1))
+        paths = owner[heads]
+        result[paths, :2] = np.minimum.reduceat(coords, heads)
+        result[paths, 2:] = np.maximum.reduceat(coords, heads)
+        return result
+    
+    def _flatten(self, flatness, dropped=None):
+        """Flattened vertices of all segments: (points, offsets, owner, first, sub_closed)
+
+        Segment k owns points[offsets[k]:offsets[k + 1]]: its end point for lines,
+        points up to its end for curves, preceded by the subpath's start point when
+        the segment begins a subpath (first holds those segments). Lines marked in
+        the boolean mask dropped own no end point.
+        """
+        kind, owner, start, end, _, first, _, sub_closed = self._arrays()
+        cubics = np.flatnonzero(kind == CUBIC)
+        arcs = np.flatnonzero(kind == ARC)
+        
+        counts = np.ones(len(kind), dtype=np.intp)
+        if len(cubics):
+            controls = np.asarray(self._cubic, dtype=np.complex128)
+            c1, c2 = controls[:, 0], controls[:, 1]
+            p0, p3 = start[cubics], end[cubics]
+            # n chords deviate at most 3/4 * max second difference / n^2 from the curve
+            bend = np.maximum(np.abs(p0 - 2 * c1 + c2), np.abs(c1 - 2 * c2 + p3))
+            size = np.abs(c1 - p0) + np.abs(c2 - c1) + np.abs(p3 - c2)
+            counts[cubics] = np.ceil(np.sqrt(0.75 * bend / (flatness * np.maximum(size, 1e-12))))
+        if len(arcs):
+            params = np.asarray(self._arc, dtype=np.complex128)
+            center = params[:, 0]
+            rx, ry, phi, theta0, delta = (params[:, i].real for i in range(1, 6))
+            # Chords spanning an angle a stay within r * (1 - cos(a / 2)) of a circle of radius r
+            step = 2 * np.arccos(1 - flatness)
+            counts[arcs] = np.ceil(np.abs(delta) / step)
+        np.clip(counts, 1, MAX_OUTLINE_SAMPLES, out=counts)
+        lines = kind == LINE
+        if dropped is not None:
+            counts[dropped] = 0
+            lines &= ~dropped
+        counts[first] += 1
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        points = np.empty(offsets[-1], dtype=np.complex128)
+        points[offsets[first]] = start[first]
+        tail = offsets[1:] - 1  # index of each segment's end point
+        points[tail[lines]] = end[lines]
+        for curves in (cubics, arcs):
+            if not len(curves):
+                continue
+            # Parameter t in (0, 1] for every sample of every curve, ending at the curve's end point
+            n = np.clip(counts[curves] - np.isin(curves, first), 1, None)
+            curve = np.repeat(np.arange(len(curves)), n)
+            step_index = np.arange(len(curve)) - np.repeat(np.cumsum(n) - n, n)
+            t = (step_index + 1) / np.repeat(n, n)
+            target = np.repeat(tail[curves] - n + 1, n) + step_index
+            if curves is cubics:
+                points[target] = _cubic_point(p0[curve], c1[curve], c2[curve], p3[curve], t[:, None])[:, 0]
+            else:
+                theta = theta0[curve] + delta[curve] * t
+                ellipse = rx[curve] * np.cos(theta) + 1j * ry[curve] * np.sin(theta)
+                points[target] = center[curve] + np.exp(1j * phi[curve]) * ellipse
+        return points, offsets, owner, first, sub_closed
@@ -0,0 +1,365 @@
+"""Single-pass DXF measurement engine.
+
+Entities are measured through a dispatch table keyed by DXF type. Every handler
+adds the entity's lines, arcs and Bézier curves to one CurveBatch (one path per
+entity), so lengths, areas and extents are computed in a few vectorized passes
+after a single walk over the layout.
+
+Block references (INSERT) are measured from a per-block cache: each block
+definition is measured once, in block coordinates, and every insert reuses the
+block's length and area scaled by the insert's scale factor and transforms only
+the block's convex hull for the extents. Inserts with non-uniform scaling, which
+distorts curve lengths, are measured from their own virtual entities instead.
+
+With a simplify tolerance, the straight segments of the outlines collected for
+the material union are simplified (see CurveBatch.simplify). Blocks are
+simplified once, in block coordinates, and the area changes of their outlines
+scale with every insert.
+"""
+import math
+
+import numpy as np
+
+from curves import CurveBatch, DEFAULT_TOLERANCE, OUTLINE_FLATNESS
+from instrumentation import StageTimer
+from plugins import lazy_import
+
+shapely = lazy_import('shapely')
+ezdxf_path = lazy_import('ezdxf.path')
+
+TWO_PI = 2 * math.pi
+
+
+class BlockGeometry:
+    """Measurements of a block definition in block coordinates, shared by all of its inserts"""
+
+    def __init__(self, length, area, hull, outlines):
+        self.length = length
+        self.area = area
+        self.hull = hull          # (n, 2) convex hull vertices, for transformed extents
+        self.outlines = outlines  # (coords, ring_index, ring_changes) of the closed outlines, or None
+
+
+class DxfMeasurement:
+    """Result of measuring a sequence of entities"""
+
+    def __init__(self, names, lengths, areas, boxes, outlines=None, hull=None):
+        self.names = names        # one per entity, in drawing order
+        self.lengths = lengths
+        self.areas = areas
+        self.boxes = boxes        # (entities, 4) array of bounding boxes; NaN rows for empty entities
+        self.outlines = outlines  # (coords, ring_index, ring_changes) of closed outlines when requested
+        self.hull = hull          # convex hull vertices of everything measured, when requested
+
+    @property
+    def extents(self):
+        """(min_x, min_y, max_x, max_y) of everything measured, or None"""
+        boxes = self.boxes[~np.isnan(self.boxes).any(axis=1)]
+        if not len(boxes):
+            return None
+        return (float(boxes[:, 0].min()), float(boxes[:, 1].min()),
+                float(boxes[:, 2].max()), float(boxes[:, 3].max()))
+
+
+def _transform(points, matrix):
+    """Apply an ezdxf Matrix44 to (n, 2) points in the XY plane"""
+    m = np.array(list(matrix.rows()))
+    return points @ m[:2, :2] + m[3, :2]
+
+
+def _transform_outlines(outlines, matrix):
+    """Apply an ezdxf Matrix44 to (coords, ring_index, ring_changes) outlines
+
+    Areas scale by the determinant, which also flips the sign of mirrored rings.
+    """
+    coords, ring_index, changes = outlines
+    det = float(np.linalg.det(np.array(list(matrix.rows()))[:2, :2]))
+    return _transform(coords, matrix), ring_index, changes * (det, abs(det))
+
+
+def _hatch_boundaries(entity):
+    """Handles of the entities an associative hatch takes its boundary loops from"""
+    if not entity.dxf.get('associative', 0):
+        return []
+    return [handle for path in entity.paths for handle in path.source_boundary_objects]
+
+
+class DxfEngine:
+    """Measures DXF entities; blocks are measured once per document and reused by every insert"""
+
+    def __init__(self, doc, tolerance=DEFAULT_TOLERANCE, outlines=False, flatness=OUTLINE_FLATNESS, simplify=None,
+                 timer=None):
+        self.doc = doc
+        self.tolerance = tolerance
+        self.outlines = outlines
+        self.flatness = flatness
+        self.simplify = simplify  # simplification tolerance of the outlines in drawing units, or None
+        self.timer = timer or StageTimer()  # times the simplification as its own stage
+        self._blocks = {}  # block name -> BlockGeometry, or None for empty or recursive blocks
+        self.stats = {'entities': 0, 'blocks': 0, 'inserts': 0, 'segments': 0, 'vertices': 0, 'keptVertices': 0,
+                      'skipped': {}}
+        self.warnings = []
+        self.handlers = {
+            'LINE': self._line,
+            'CIRCLE': self._circle,
+            'ARC': self._arc,
+            'ELLIPSE': self._ellipse,
+            'LWPOLYLINE': self._lwpolyline,
+            'POLYLINE': self._polyline,
+            'SPLINE': self._spline,
+            'HATCH': self._hatch,
+            'INSERT': self._insert
+        }
+
+    def measure(self, entities, hull=False, numbers=None):
+        """Measure entities in a single pass; returns a DxfMeasurement
+
+        numbers are the entities' 1-based positions used in their names, for a
+        sample of a larger sequence; by default they are numbered from 1.
+        """
+        batch = CurveBatch()
+        names = []
+        extra = []  # [length, area, box points, outlines] added by handlers outside the batch
+        handles = []
+        boundaries = set()  # handles of the boundary entities of associative hatches
+        for entity in entities:
+            dxftype = entity.dxftype()
+            self.stats['entities'] += 1
+            names.append(f'{dxftype} {len(names) + 1 if numbers is None else numbers[len(names)]}')
+            handles.append(entity.dxf.handle)
+            batch.begin_path()
+            record = [0.0, 0.0, None, None]
+            extra.append(record)
+            handler = self.handlers.get(dxftype)
+            if handler is None:
+                skipped = self.stats['skipped']
+                skipped[dxftype] = skipped.get(dxftype, 0) + 1
+                continue
+            try:
+                handler(entity, batch, record)
+                if dxftype == 'HATCH':
+                    boundaries.update(_hatch_boundaries(entity))
+            except Exception as e:
+                # One malformed entity should not fail the whole drawing
+                self.warnings.append(f"{names[-1]} failed: {str(e)}")
+
+        lengths, areas, _ = batch.measure(self.tolerance)
+        self.stats['segments'] += len(batch)
+        boxes = batch.bounds(self.flatness)
+        for i, (length, area, points, _) in enumerate(extra):
+            lengths[i] += length
+            areas[i] += area
+            if points is not None and len(points):
+                box = np.concatenate((points.min(axis=0), points.max(axis=0)))
+                boxes[i] = box if np.isnan(boxes[i]).any() else np.concatenate(
+                    (np.minimum(boxes[i, :2], box[:2]), np.maximum(boxes[i, 2:], box[2:])))
+        if boundaries:
+            # The hatch's fill is the area its boundary entities enclose; counting both would count it twice
+            areas[[handle in boundaries for handle in handles]] = 0.0
+
+        outlines = None
+        if self.outlines:
+            if self.simplify is not None:
+                with self.timer.stage('simplify'):
+                    vertices, kept = batch.simplify(self.simplify)
+                self.stats['vertices'] += vertices
+                self.stats['keptVertices'] += kept
+            coords, ring_index, _, changes = batch.outlines(flatness=self.flatness)
+            parts = [(coords, ring_index, changes)] + [record[3] for record in extra if record[3] is not None]
+            outlines = self._merge_outlines(parts)
+        
+        hull_points = None
+        if hull:
+            points = [batch.points(self.flatness)[0]] + [record[2] for record in extra if record[2] is not None]
+            points = np.concatenate(points)
+            hull_points = shapely.get_coordinates(shapely.convex_hull(shapely.multipoints(points))) \
+                if len(points) else points
+        return DxfMeasurement(names, lengths, areas, boxes, outlines, hull_points)
+
+    def _merge_outlines(self, parts):
+        coords, indices, changes, offset = [], [], [], 0
+        for part_coords, part_index, part_changes in parts:
+            if not len(part_coords):
+                continue
+            coords.append(part_coords)
+            indices.append(part_index + offset)
+            changes.append(part_changes)
+            offset += int(part_index.max()) + 1
+        if not coords:
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+        return np.concatenate(coords), np.concatenate(indices), np.concatenate(changes)
+
+    def _mirrored(self, entity):
+        """OCS entities extruded along -Z are mirrored in X when seen from above"""
+        extrusion = entity.dxf.get('extrusion')
+        return extrusion is not None and extrusion[2] < 0
+
+    def _add_circular_arc(self, batch, center, radius, theta0, delta, mirrored):
+        if mirrored:
+            center = complex(-center.real, center.imag)
+            theta0, delta = math.pi - theta0, -delta
+        start = center + radius * complex(math.cos(theta0), math.sin(theta0))
+        end = center + radius * complex(math.cos(theta0 + delta), math.sin(theta0 + delta))
+        batch.add_arc(start, end, center, radius, radius, 0.0, theta0, delta)
+
+    def _line(self, entity, batch, record):
+        start, end = entity.dxf.start, entity.dxf.end
+        batch.add_line(complex(start[0], start[1]), complex(end[0], end[1]))
+
+    def _circle(self, entity, batch, record):
+        center, radius = entity.dxf.center, entity.dxf.radius
+        if radius > 0:
+            self._add_circular_arc(batch, complex(center[0], center[1]), radius, 0.0, TWO_PI,
+                                   self._mirrored(entity))
+
+    def _arc(self, entity, batch, record):
+        center, radius = entity.dxf.center, entity.dxf.radius
+        theta0 = math.radians(entity.dxf.start_angle)
+        delta = (math.radians(entity.dxf.end_angle) - theta0) % TWO_PI
+        if radius > 0 and delta > 0:
+            self._add_circular_arc(batch, complex(center[0], center[1]), radius, theta0, delta,
+                                   self._mirrored(entity))
+
+    def _ellipse(self, entity, batch, record):
+        center = complex(entity.dxf.center[0], entity.dxf.center[1])
+        major = complex(entity.dxf.major_axis[0], entity.dxf.major_axis[1])
+        rx = abs(major)
+        # The minor axis is extrusion x major, so it flips with a -Z extrusion
+        ry = rx * entity.dxf.ratio * (-1 if self._mirrored(entity) else 1)
+        phi = math.atan2(major.imag, major.real)
+        theta0 = entity.dxf.start_param
+        delta = (entity.dxf.end_param - theta0) % TWO_PI or TWO_PI
+        rotation = complex(math.cos(phi), math.sin(phi))
+        point = lambda t: center + rotation * complex(rx * math.cos(t), ry * math.sin(t))
+        if rx > 0:
+            batch.add_arc(point(theta0), point(theta0 + delta), center, rx, ry, phi, theta0, delta)
+
+    def _add_bulged(self, batch, vertices, closed, mirrored):
+        """Add a polyline given as (x, y, bulge) vertices; a bulge is tan(sweep / 4) of the arc to the next vertex"""
+        if mirrored:
+            vertices = [(-x, y, -bulge) for x, y, bulge in vertices]
+        # Two vertices can still close through a bulged segment (a circle drawn as two arcs)
+        if closed and (len(vertices) > 2 or (len(vertices) == 2 and vertices[-1][2])):
+            vertices = list(vertices) + [vertices[0]]
+        points = [complex(x, y) for x, y, _ in vertices]
+        if not any(bulge for _, _, bulge in vertices[:-1]):
+            batch.add_lines(points)
+            return
+        for (_, _, bulge), start, end in zip(vertices, points, points[1:]):
+            if not bulge or start == end:
+                batch.add_line(start, end)
+                continue
+            chord = end - start
+            # The center lies on the chord's perpendicular bisector
+            center = (start + end) / 2 + 1j * chord * (1 - bulge * bulge) / (4 * bulge)
+            radius = abs(start - center)
+            theta0 = math.atan2((start - center).imag, (start - center).real)
+            batch.add_arc(start, end, center, radius, radius, 0.0, theta0, 4 * math.atan(bulge))
+
+    def _lwpolyline(self, entity, batch, record):
+        self._add_bulged(batch, list(entity.get_points('xyb')), entity.closed, self._mirrored(entity))
+
+    def _polyline(self, entity, batch, record):
+        if entity.is_polygon_mesh or entity.is_poly_face_mesh:
+            # 3D meshes have no cut path
+            skipped = self.stats['skipped']
+            skipped['POLYLINE (mesh)'] = skipped.get('POLYLINE (mesh)', 0) + 1
+            return
+        vertices = [(v.dxf.location[0], v.dxf.location[1], v.dxf.bulge if entity.is_2d_polyline else 0)
+                    for v in entity.vertices]
+        self._add_bulged(batch, vertices, entity.is_closed, entity.is_2d_polyline and self._mirrored(entity))
+
+    def _spline(self, entity, batch, record):
+        spline = entity.construction_tool()
+        if spline.degree == 3 and not spline.is_rational:
+            # Exact: a non-rational cubic B-spline is a chain of cubic Béziers
+            segments = [[complex(p[0], p[1]) for p in controls] for controls in spline.bezier_decomposition()]
+            for controls in segments:
+                batch.add_cubic(*controls)
+            if entity.closed and segments and segments[-1][3] != segments[0][0]:
+                batch.add_line(segments[-1][3], segments[0][0])
+        else:
+            size = max(np.ptp(np.array(spline.control_points)[:, :2], axis=0).max(), 1e-9)
+            batch.add_lines([complex(p[0], p[1]) for p in spline.flattening(size * self.flatness)],
+                            closed=entity.closed)
+
+    def _hatch(self, entity, batch, record):
+        # A hatch is a fill: its area counts (even-odd over the boundary loops) but its
+        # boundary is usually also drawn as separate entities, so it adds no path length.
+        # The area of the boundary entities of an associative hatch is left out instead (see measure)
+        rings = []
+        for path in ezdxf_path.from_hatch(entity):
+            points = np.array([(p[0], p[1]) for p in path.flattening(self._path_distance(path))])
+            if len(points) >= 3:
+                rings.append(points)
+        if not rings:
+            return
+        loops = shapely.polygons([shapely.linearrings(r) for r in rings])
+        fill = None
+        for loop in loops:
+            if not shapely.is_valid(loop):
+                # Keep only the polygonal parts of a repaired self-intersecting loop
+                parts = shapely.get_parts(shapely.make_valid(loop))
+                loop = shapely.union_all(parts[shapely.get_type_id(parts) == 3])
+            fill = loop if fill is None else shapely.symmetric_difference(fill, loop)
+        record[1] += float(shapely.area(fill))
+        record[2] = np.concatenate(rings)
+        if self.outlines:
+            record[3] = (np.concatenate(rings), np.repeat(np.arange(len(rings)), [len(r) for r in rings]),
+                         np.zeros((len(rings), 2)))
+
+    def _path_distance(self, path):
+        extents = np.array([(v[0], v[1]) for v in path.control_vertices()])
+        return max(np.ptp(extents, axis=0).max(), 1e-9) * self.flatness
+
+    def _insert(self, entity, batch, record):
+        self.stats['inserts'] += 1
+        inserts = entity.multi_insert() if entity.mcount > 1 else [entity]
+        points, outlines = [], []
+        for insert in inserts:
+            block = self._block(insert.dxf.name)
+            if block is None:
+                continue
+            sx, sy = insert.dxf.xscale, insert.dxf.yscale
+            if math.isclose(abs(sx), abs(sy), rel_tol=1e-9):
+                # Uniform scale (possibly mirrored): lengths scale by |s| and areas by s^2
+                matrix = insert.matrix44()
+                record[0] += block.length * abs(sx)
+                record[1] += block.area * sx * sx
+                if len(block.hull):
+                    points.append(_transform(block.hull, matrix))
+                if block.outlines is not None and len(block.outlines[0]):
+                    outlines.append(_transform_outlines(block.outlines, matrix))
+            else:
+                # Non-uniform scaling turns circles into ellipses: measure this instance's lengths directly.
+                # Areas still scale by |sx sy|, and the virtual entities would lose their hatches' boundaries
+                measured = self.measure(insert.virtual_entities())
+                record[0] += float(measured.lengths.sum())
+                record[1] += block.area * abs(sx * sy)
+                if measured.extents:
+                    x0, y0, x1, y1 = measured.extents
+                    points.append(np.array([(x0, y0), (x1, y1)]))
+                if measured.outlines is not None:
+                    outlines.append(measured.outlines)
+        if points:
+            record[2] = np.concatenate(points)
+        if outlines:
+            record[3] = self._merge_outlines(outlines)
+
+    def _block(self, name):
+        """Measure a block definition once; later inserts reuse the cached geometry"""
+        if name in self._blocks:
+            return self._blocks[name]
+        self._blocks[name] = None  # guards against blocks that (indirectly) insert themselves
+        layout = self.doc.blocks.get(name)
+        if layout is None:
+            return None
+        # The convex hull of the block keeps rotated inserts' extents tight
+        measured = self.measure(layout, hull=True)
+        if not len(measured.hull):
+            return None
+        block = BlockGeometry(float(measured.lengths.sum()), float(measured.areas.sum()),
+                              measured.hull, measured.outlines)
+        self._blocks[name] = block
+        self.stats['blocks'] += 1
+        return block
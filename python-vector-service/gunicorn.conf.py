@@ -0,0 +1,65 @@
+# Production server settings, used with: gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+bind = os.environ.get('VECTOR_BIND', '0.0.0.0:5001')
+
+# Pre-forked worker processes; analyses are CPU bound so one per core is a good start
+workers = int(os.environ.get('VECTOR_WORKERS', 0)) or multiprocessing.cpu_count()
+
+# Each worker has its own process pool for the pages of multi-page PDFs; share the cores between the pools
+# rather than giving every worker one process per core
+os.environ.setdefault('VECTOR_BATCH_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+# Each worker handles its batch admissions and the requests running or queued in its analysis lanes
+# on threads, so a saturated worker can still answer 503 quickly instead of leaving connections hanging
+worker_class = 'gthread'
+threads = (int(os.environ.get('VECTOR_MAX_ACTIVE', 1)) + int(os.environ.get('VECTOR_MAX_QUEUED', 4))
+           + int(os.environ.get('VECTOR_FAST_WORKERS', 1)) + int(os.environ.get('VECTOR_FAST_MAX_QUEUED', 8))
+           + int(os.environ.get('VECTOR_HEAVY_WORKERS', 1)) + int(os.environ.get('VECTOR_HEAVY_MAX_QUEUED', 2)) + 1)
+
+# Recycle workers periodically to contain memory growth in PyMuPDF/ezdxf
+max_requests = int(os.environ.get('VECTOR_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.environ.get('VECTOR_MAX_REQUESTS_JITTER', 50))
+
+# In-flight analyses get this long to finish on SIGHUP (reload) or SIGTERM (shutdown)
+graceful_timeout = int(os.environ.get('VECTOR_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('VECTOR_WORKER_TIMEOUT', 120))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('VECTOR_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Metrics snapshots left by a previous run would otherwise be added to this one's totals
+    directory = os.environ.get('VECTOR_METRICS_DIR')
+    if directory and os.path.isdir(directory):
+        for entry in os.listdir(directory):
+            if entry.startswith('metrics-'):
+                os.remove(os.path.join(directory, entry))
+
+
+def post_worker_init(worker):
+    # Import and exercise the format libraries before the worker accepts requests, so the first
+    # request after a start, scale-up or recycle does not pay for them (VECTOR_WARM_FORMATS=none skips).
+    # This also starts the fork server the worker's lane and pool processes are started from, while the
+    # worker has no request threads yet; a lane worker killed later is restarted from it
+    from app import warm_up
+    warm_up()
+
+
+def worker_exit(server, worker):
+    # Stop the worker's lane processes along with it, and write its last metrics for child_exit to archive
+    from app import metrics, scheduler
+    scheduler.stop()
+    metrics.flush(force=True)
+
+
+def child_exit(server, worker):
+    # Keep a recycled worker's counts in the shared totals
+    directory = os.environ.get('VECTOR_METRICS_DIR')
+    if directory:
+        from metrics import archive_worker
+        archive_worker(directory, worker.pid)
@@ -0,0 +1,151 @@
+"""Upload ingestion: format sniffing and a complexity pre-scan while the body streams in.
+
+The multipart parser writes each uploaded file into an UploadStream chunk by
+chunk. The first bytes are checked against the format the file name claims:
+the %PDF header, the %!PS (or DOS EPS) header, the root element of an SVG
+document, or the first SECTION of a DXF file. A file that is something else
+is rejected there, before the rest of the body is read. Accepted files are
+counted as they arrive: paths for SVG and EPS, structures for DXF and page
+objects for PDF, a cheap estimate of the work an analysis will take.
+"""
+import io
+import re
+
+from svg_stream import SVG_SHAPES
+
+# Bytes looked at before deciding; SVG prologs (comments, DOCTYPE) may take up to SNIFF_LIMIT
+SNIFF_BYTES = 8 * 1024
+SNIFF_LIMIT = 256 * 1024
+
+BINARY_DXF_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+DOS_EPS_MAGIC = b'\xc5\xd0\xd3\xc6'
+
+_SVG_PROLOG = re.compile(rb'(?:\s+|<\?.*?\?>|<!--.*?-->|<!DOCTYPE(?:[^\[>]|\[.*?\])*>)*', re.DOTALL)
+_SVG_ROOT = re.compile(rb'<(?:[\w.-]+:)?svg[\s/>]')
+_DXF_START = re.compile(rb'\s*(?:999\r?\n[^\n]*\n\s*)*0\r?\n\s*SECTION\s*\r?\n')
+
+# What the pre-scan counts per format: (name, pattern); matches never span more than SCAN_OVERLAP bytes.
+# Patterns start with a literal where they can, which the regex engine scans for quickly; the EPS one
+# checks the characters before m (moveto, rmoveto or the m abbreviation) with lookbehinds after it.
+SCAN_OVERLAP = 32
+PRESCAN_PATTERNS = {
+    'svg': ('paths', re.compile(rb'<(?:[\w.-]+:)?(?:' + '|'.join(list(SVG_SHAPES) + ['use']).encode() + rb')[\s/>]')),
+    'eps': ('paths', re.compile(rb'm(?:(?<![\w/]m)(?:oveto)?|(?<=rm)(?<![\w/]rm)oveto)(?!\w)')),
+    'dxf': ('entities', re.compile(rb'\n *0\r?\n[A-Z_]')),
+    'pdf': ('pages', re.compile(rb'/Type\s*/Page(?![A-Za-z])'))
+}
+
+
+class UploadRejected(Exception):
+    """An upload refused while the body streams in; status is the HTTP status to answer with
+
+    Not a ValueError, which the form parser would swallow.
+    """
+
+    def __init__(self, message, status=415):
+        super().__init__(message)
+        self.status = status
+
+
+def sniff_format(head, final=False):
+    """The format of a file from its first bytes: 'svg', 'dxf', 'eps', 'pdf', or None
+
+    Returns '' while an SVG prolog has not ended yet within head, unless final
+    (head is the whole file), so the caller can wait for more bytes.
+    """
+    if head[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        # UTF-16 documents are sniffed in UTF-8
+        head = head.decode('utf-16', 'ignore').encode('utf-8')
+    if head.startswith(b'\xef\xbb\xbf'):
+        head = head[3:]
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    if head.startswith(DOS_EPS_MAGIC) or head.lstrip(b'\x04 \t\r\n').startswith(b'%!'):
+        return 'eps'
+    if head.startswith(BINARY_DXF_SENTINEL) or _DXF_START.match(head):
+        return 'dxf'
+    prolog = _SVG_PROLOG.match(head).end()
+    if _SVG_ROOT.match(head, prolog):
+        return 'svg'
+    # An unfinished comment, DOCTYPE or processing instruction, or a root tag cut short
+    rest = head[prolog:]
+    if not final and (rest.startswith((b'<!--', b'<!DOCTYPE', b'<?')) or (rest[:1] in (b'', b'<') and len(rest) < 64)):
+        return ''
+    return None
+
+
+class UploadStream(io.BytesIO):
+    """In-memory upload that checks its format from the first chunk and pre-scans the rest
+
+    expected is the format the file name claims, or None when its extension
+    is not supported. A bad upload raises UploadRejected from write() when
+    abort is set; otherwise it keeps error set and discards what follows.
+    """
+
+    def __init__(self, expected, abort=True):
+        super().__init__()
+        self.expected = expected
+        self.abort = abort
+        self.format = None
+        self.error = None
+        self.size = 0
+        self._count = 0
+        self._pattern = None
+        self._tail = b''
+
+    def write(self, data):
+        if self.error is not None:
+            return len(data)
+        self.size += len(data)
+        written = super().write(data)
+        if self.format is None:
+            if self.size >= SNIFF_BYTES:
+                self._sniff(final=False)
+        elif self._pattern is not None:
+            self._scan(bytes(data))
+        return written
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # The parser rewinds the file once it is complete: the last chance to sniff a small file
+        if offset == 0 and whence == io.SEEK_SET and self.format is None and self.error is None:
+            self._sniff(final=True)
+        return super().seek(offset, whence)
+
+    def prescan(self):
+        """{'format', 'bytes', and the estimated count of the format's units} of the upload so far"""
+        result = {'format': self.format, 'bytes': self.size}
+        if self._pattern is not None:
+            result[PRESCAN_PATTERNS[self.format][0]] = self._count
+        return result
+
+    def _sniff(self, final):
+        head = self.getvalue()
+        if self.expected is None:
+            return self._reject('Unsupported file format', 400)
+        if not head:
+            return self._reject('Empty file', 400)
+        detected = sniff_format(head[:SNIFF_LIMIT], final or len(head) >= SNIFF_LIMIT)
+        if detected == '':
+            return
+        if detected != self.expected:
+            if detected is None:
+                return self._reject(f'File content is not a valid {self.expected.upper()} file')
+            return self._reject(f'File content is {detected.upper()}, not {self.expected.upper()}')
+        self.format = detected
+        # Binary DXF has no text to count
+        if not head.startswith(BINARY_DXF_SENTINEL):
+            self._pattern = PRESCAN_PATTERNS[detected][1]
+            self._scan(head)
+
+    def _scan(self, data):
+        # Matches lying wholly in the carried-over tail were counted with the previous chunk
+        pattern, tail = self._pattern, self._tail
+        self._count += len(pattern.findall(tail + data)) - len(pattern.findall(tail))
+        self._tail = (tail + data)[-SCAN_OVERLAP:]
+
+    def _reject(self, message, status=415):
+        self.error = message
+        self.seek(0)
+        self.truncate()
+        if self.abort:
+            raise UploadRejected(message, status)
@@ -0,0 +1,110 @@
+"""Per-stage timing of analyses and sampling profiles of slow requests.
+
+A StageTimer is filled in by VectorProcessor while it analyzes a file and
+reported under the result's 'timings' key. A StackSampler records where a
+request thread spends its time by sampling its stack from a background thread,
+which costs little enough to leave on for every request and only write out the
+slow ones.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Wall-clock time per analysis stage, plus item counts
+
+    Stages may nest; time spent in an inner stage is charged to that stage only,
+    so the stage times add up to the time they cover.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self._stack = []  # [name, started] of the open stages
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self._charge(self._stack[-1], now)
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._charge(self._stack.pop(), now)
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _charge(self, entry, now):
+        name, since = entry
+        self.stages[name] = self.stages.get(name, 0.0) + now - since
+
+    def add(self, name, seconds):
+        """Charge time measured elsewhere (e.g. in a worker process) to a stage"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def report(self):
+        """The timings as reported in results: milliseconds per stage and the counts"""
+        return {
+            'totalMs': round((time.perf_counter() - self._started) * 1000, 2),
+            'stages': {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+            'counts': dict(self.counts)
+        }
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval while running
+
+    Stacks are kept in the folded format ('outer;inner;leaf count' per line)
+    read by flame graph tools such as flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = self.stopped = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        return False
+
+    @property
+    def elapsed(self):
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        """Write the samples in folded format"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
@@ -0,0 +1,390 @@
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Progress reported once a job is picked up; analyses themselves do not report finer progress
+PROGRESS_STARTED = 0.1
+
+# Attempts a job gets when the process running it dies (OOM kill, worker timeout) before it is failed
+MAX_ATTEMPTS = 3
+
+# Attempts at storing a finished job's result; a job whose result cannot be stored is requeued
+STORE_RETRIES = 3
+
+
+class QueueFull(Exception):
+    """The job queue already holds its maximum number of pending jobs"""
+
+
+class CallbackRejected(ValueError):
+    """A callback URL is not an http(s) URL, or names a host that callbacks may not reach"""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Callbacks are not redirected: a redirect could lead them to a host the URL check rejects"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def check_callback_url(url, allowed_hosts=None):
+    """Raise CallbackRejected unless url may receive job callbacks
+
+    With allowed_hosts, only those host names are accepted. Otherwise every
+    address the host resolves to must be public, so callbacks cannot reach
+    loopback, private, link-local (cloud metadata) or reserved addresses
+    from inside the service's network.
+    """
+    parsed = urlparse(url)
+    try:
+        port = parsed.port
+    except ValueError:  # a port that is not a number or out of range
+        port = -1
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host or port == -1:
+        raise CallbackRejected('callbackUrl must be an http(s) URL')
+    if allowed_hosts is not None:
+        if host not in allowed_hosts:
+            raise CallbackRejected(f'callbackUrl host {host} is not allowed')
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(
+            host, port or (443 if parsed.scheme == 'https' else 80), proto=socket.IPPROTO_TCP)}
+    except (OSError, UnicodeError):
+        raise CallbackRejected(f'callbackUrl host {host} cannot be resolved')
+    for address in addresses:
+        address = ipaddress.ip_address(address.split('%', 1)[0])
+        if not address.is_global or address.is_multicast:
+            raise CallbackRejected(f'callbackUrl host {host} resolves to a non-public address')
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+class JobQueue:
+    """Persistent analysis job queue in SQLite, drained by background dispatcher threads
+
+    Several processes (gunicorn workers) may share one database file: jobs are
+    claimed atomically, and running jobs carry a heartbeat so that jobs left
+    behind by a process that died are put back in the queue by the survivors.
+    """
+
+    def __init__(self, path, analyze, workers=1, max_queued=100, ttl=24 * 3600, lease=60,
+                 poll_interval=1.0, callback_timeout=10, callback_retries=3, callback_hosts=None):
+        self.path = path
+        self.analyze = analyze  # (data, filename, options) -> result dict
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.callback_timeout = callback_timeout
+        self.callback_retries = callback_retries
+        # Host names callbacks may be sent to, or None for any host with only public addresses
+        self.callback_hosts = None if callback_hosts is None else {host.lower() for host in callback_hosts}
+        self._opener = urllib.request.build_opener(_NoRedirect)
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._owner = uuid.uuid4().hex  # identifies this process's claims
+        self._active = set()  # ids of the jobs this process is analyzing; only these get heartbeats
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'requeued': 0,
+            'callbacksDelivered': 0,
+            'callbacksFailed': 0
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    data BLOB,
+                    progress REAL NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    callback_url TEXT,
+                    callback_status TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    heartbeat_at REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def start(self):
+        """Start the dispatcher threads (once per process)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def check_callback(self, url):
+        """Raise CallbackRejected unless url may receive this queue's callbacks (see check_callback_url)"""
+        check_callback_url(url, self.callback_hosts)
+
+    def submit(self, data, filename, options, callback_url=None):
+        """Queue an analysis and return its job id; raises QueueFull when the queue is at capacity"""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(f'Job queue is full ({self.max_queued} pending jobs)')
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, options, data, callback_url, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, filename, json.dumps(options), data, callback_url, time.time())
+            )
+        with self._lock:
+            self.stats['submitted'] += 1
+        self._wakeup.set()
+        return job_id
+
+    def complete(self, filename, options, result, callback_url=None):
+        """Record a job whose result is already known (e.g. from the result cache)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, options, progress, result, callback_url, "
+                "created_at, started_at, finished_at) VALUES (?, 'done', ?, ?, 1, ?, ?, ?, ?, ?)",
+                (job_id, filename, json.dumps(options), json.dumps(result), callback_url, now, now, now)
+            )
+        with self._lock:
+            self.stats['submitted'] += 1
+            self.stats['completed'] += 1
+        if callback_url:
+            threading.Thread(target=self._notify, args=(job_id,), daemon=True).start()
+        return job_id
+
+    def get(self, job_id):
+        """The job's status document, or None for an unknown (or expired) job"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, filename, progress, result, error, callback_url, callback_status, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        (job_id, status, filename, progress, result, error, callback_url, callback_status,
+         created_at, started_at, finished_at) = row
+        job = {
+            'jobId': job_id,
+            'status': status,
+            'progress': progress,
+            'fileName': filename,
+            'createdAt': _timestamp(created_at),
+            'startedAt': _timestamp(started_at),
+            'finishedAt': _timestamp(finished_at)
+        }
+        if result is not None:
+            job['result'] = json.loads(result)
+        if error is not None:
+            job['error'] = error
+        if callback_url:
+            job['callback'] = {'url': callback_url, 'status': callback_status or 'pending'}
+        return job
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['workers'] = self.workers
+        stats['maxQueued'] = self.max_queued
+        try:
+            with self._connect() as conn:
+                counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        except sqlite3.Error:
+            counts = {}
+        for status in ('queued', 'running', 'done', 'failed'):
+            stats[status] = counts.get(status, 0)
+        return stats
+
+    def _run(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_sweep > self.lease / 4:
+                    self._recover()
+                job = self._claim()
+            except sqlite3.Error:
+                logger.exception('Job queue database error')
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._lock:
+                self._active.add(job[0])
+            try:
+                self._process(*job)
+            except Exception:
+                # The dispatcher must outlive any single job
+                logger.exception('Job %s failed unexpectedly', job[0])
+            finally:
+                with self._lock:
+                    self._active.discard(job[0])
+
+    def _claim(self):
+        """Atomically move the oldest queued job to running; returns (id, data, filename, options)"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, data, filename, options FROM jobs WHERE status = 'queued' "
+                "ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', progress = ?, owner = ?, started_at = ?, "
+                "heartbeat_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (PROGRESS_STARTED, self._owner, now, now, row[0])
+            )
+        job_id, data, filename, options = row
+        return job_id, data, filename, json.loads(options)
+
+    def _process(self, job_id, data, filename, options):
+        try:
+            result = self.analyze(data, filename, options)
+        except Exception as e:
+            result = {'fileName': filename, 'error': str(e) or e.__class__.__name__}
+        failed = 'error' in result
+
+        # A busy database ("database is locked") usually frees up quickly; the job stays running until then
+        for attempt in range(STORE_RETRIES):
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, progress = 1, result = ?, error = ?, data = NULL, "
+                        "finished_at = ? WHERE id = ?",
+                        ('failed' if failed else 'done', json.dumps(result), result.get('error'), time.time(), job_id)
+                    )
+                    callback_url = conn.execute("SELECT callback_url FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+                break
+            except sqlite3.Error:
+                logger.exception('Storing the result of job %s failed (attempt %d)', job_id, attempt + 1)
+                time.sleep(2 ** attempt)
+        else:
+            # Without heartbeats the job is requeued once its lease runs out
+            logger.error('Giving up on storing the result of job %s; it will be requeued', job_id)
+            return
+        with self._lock:
+            self.stats['failed' if failed else 'completed'] += 1
+        if callback_url:
+            try:
+                self._notify(job_id)
+            except sqlite3.Error:
+                logger.exception('Callback bookkeeping for job %s failed', job_id)
+
+    def _notify(self, job_id):
+        """POST the finished job document to its callback URL, retrying with backoff"""
+        job = self.get(job_id)
+        body = json.dumps(job).encode('utf-8')
+        status = None
+        for attempt in range(self.callback_retries):
+            request = urllib.request.Request(
+                job['callback']['url'], data=body, method='POST',
+                headers={'Content-Type': 'application/json'}
+            )
+            try:
+                # Checked again on every attempt: the host may resolve elsewhere than at submission
+                self.check_callback(request.full_url)
+            except CallbackRejected as e:
+                status = f'failed: {e}'
+                break
+            try:
+                with self._opener.open(request, timeout=self.callback_timeout) as response:
+                    status = f'delivered ({response.status})'
+                break
+            except Exception as e:
+                status = f'failed: {e}'
+                if attempt + 1 < self.callback_retries:
+                    time.sleep(2 ** attempt)
+        delivered = status.startswith('delivered')
+        with self._lock:
+            self.stats['callbacksDelivered' if delivered else 'callbacksFailed'] += 1
+        if not delivered:
+            logger.warning('Callback for job %s %s', job_id, status)
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job_id))
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease / 4)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                        [(time.time(), job_id, self._owner) for job_id in active]
+                    )
+            except sqlite3.Error:
+                logger.exception('Job heartbeat failed')
+
+    def _recover(self):
+        """Requeue jobs whose process died mid-analysis and purge expired finished jobs"""
+        self._last_sweep = time.monotonic()
+        now = time.time()
+        with self._connect() as conn:
+            stale = conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = 'running' AND heartbeat_at < ?",
+                (now - self.lease,)
+            ).fetchall()
+            for job_id, attempts in stale:
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', progress = 1, data = NULL, error = ?, "
+                        "finished_at = ? WHERE id = ? AND status = 'running'",
+                        (f'Analysis was interrupted {attempts} times', now, job_id)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', progress = 0, owner = NULL "
+                        "WHERE id = ? AND status = 'running'", (job_id,)
+                    )
+                    with self._lock:
+                        self.stats['requeued'] += 1
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - self.ttl,)
+            )
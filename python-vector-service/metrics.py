@@ -0,0 +1,260 @@
+"""Prometheus metrics in the text exposition format, without extra dependencies.
+
+Each process keeps its own counters and histograms. Under gunicorn, set
+VECTOR_METRICS_DIR to a directory shared by the workers: every process then
+writes a snapshot of its metrics there, at most once per flush interval and
+when it exits, and /metrics adds up the snapshots of all workers (including
+ones already recycled), so a scrape gives about the same totals whichever
+worker answers it.
+
+RollingWindow keeps the most recent values per key in this process, for the
+percentiles of recent analyses reported by the readiness document.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class Metrics:
+    """Registry of labelled counters and histograms"""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval  # seconds between two snapshots written by flush
+        self._lock = threading.Lock()
+        self._flushed = -math.inf  # time.monotonic() of the last snapshot
+        self._timer = None         # the pending write of a throttled flush
+        self._help = {}
+        self._buckets = {}
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [count per bucket..., sum]}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def counter(self, name, help_text):
+        self._help[name] = ('counter', help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS):
+        self._help[name] = ('histogram', help_text)
+        self._buckets[name] = tuple(buckets)
+        self._histograms.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        buckets = self._buckets[name]
+        with self._lock:
+            series = self._histograms[name]
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(buckets) + 2)
+            # Buckets are stored per interval (the last one is +Inf) and made cumulative when rendered
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            counts[index] += 1
+            counts[-1] += value
+
+    def flush(self, force=False):
+        """Write this process's snapshot to the shared directory, if there is one
+
+        At most one snapshot is written per flush_interval: a flush within the
+        interval schedules a single write at its end instead, so the snapshot
+        lags by less than the interval. force writes it now (at worker exit).
+        """
+        if not self.directory:
+            return
+        with self._lock:
+            wait = self._flushed + self.flush_interval - time.monotonic()
+            if not force and wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._write_snapshot)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self._write_snapshot()
+
+    def _write_snapshot(self):
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flushed = time.monotonic()
+            payload = _dump(self._counters, self._histograms)
+        _write(path, payload)
+
+    def _collect(self):
+        """Counters and histograms of this process, plus those of the other processes sharing the directory"""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self._histograms.items()}
+        if not self.directory:
+            return counters, histograms
+        own = f'metrics-{os.getpid()}.json'
+        for entry in os.listdir(self.directory):
+            if entry != own and entry.startswith('metrics-') and entry.endswith('.json'):
+                snapshot = _read_snapshot(os.path.join(self.directory, entry))
+                if snapshot:
+                    _merge(counters, histograms, snapshot)
+        return counters, histograms
+
+    def render(self, gauges=()):
+        """The metrics in Prometheus text format
+
+        gauges are (name, help, [(labels dict, value)]) tuples describing the
+        current state of this process, appended as they are.
+        """
+        counters, histograms = self._collect()
+        lines = []
+        for name, (kind, help_text) in self._help.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for key, value in sorted(counters[name].items()):
+                    lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+                continue
+            buckets = self._buckets[name]
+            for key, counts in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(buckets + (math.inf,), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(key + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(counts[-1])}')
+                lines.append(f'{name}_count{_format_labels(key)} {cumulative}')
+        for name, help_text, samples in gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(_label_key(labels))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class RollingWindow:
+    """The last size values observed per key (such as a file format), for percentiles of recent activity"""
+
+    def __init__(self, size=256):
+        self.size = size
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, value):
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = deque(maxlen=self.size)
+            values.append(value)
+
+    def summary(self, fractions=(0.5, 0.95)):
+        """{key: {'p50': ..., 'p95': ..., 'samples': n}} over the values in the window"""
+        with self._lock:
+            snapshot = {key: sorted(values) for key, values in self._values.items()}
+        summary = {}
+        for key, values in snapshot.items():
+            summary[key] = {f'p{round(fraction * 100)}': percentile(values, fraction) for fraction in fractions}
+            summary[key]['samples'] = len(values)
+        return summary
+
+
+def percentile(values, fraction):
+    """The nearest-rank percentile of sorted values, 0 when there are none"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, math.ceil(fraction * len(values)) - 1)]
+
+
+def archive_worker(directory, pid):
+    """Fold the snapshot of an exited worker into the directory's archive file
+
+    Called from the gunicorn master when a worker exits, so recycled workers
+    keep counting towards the totals without leaving one file each behind.
+    """
+    path = os.path.join(directory, f'metrics-{pid}.json')
+    snapshot = _read_snapshot(path)
+    if snapshot is None:
+        return
+    archive = os.path.join(directory, 'metrics-archive.json')
+    counters, histograms = {}, {}
+    for part in (_read_snapshot(archive), snapshot):
+        if part:
+            for name in part.get('counters', {}):
+                counters.setdefault(name, {})
+            for name in part.get('histograms', {}):
+                histograms.setdefault(name, {})
+            _merge(counters, histograms, part)
+    _write(archive, _dump(counters, histograms))
+    os.remove(path)
+
+
+def _dump(counters, histograms):
+    return json.dumps({
+        'counters': {name: [[list(k), v] for k, v in series.items()] for name, series in counters.items()},
+        'histograms': {name: [[list(k), v] for k, v in series.items()] for name, series in histograms.items()}
+    })
+
+
+def _write(path, payload):
+    # Written under a temporary name and renamed, so readers never see a partial file
+    temp = f'{path}.{threading.get_ident()}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(payload)
+    os.replace(temp, path)
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(counters, histograms, snapshot):
+    """Add a snapshot's series to the known metrics in counters and histograms"""
+    for name, series in snapshot.get('counters', {}).items():
+        if name in counters:
+            target = counters[name]
+            for key, value in series:
+                key = tuple(map(tuple, key))
+                target[key] = target.get(key, 0) + value
+    for name, series in snapshot.get('histograms', {}).items():
+        if name in histograms:
+            target = histograms[name]
+            for key, value in series:
+                key = tuple(map(tuple, key))
+                merged = target.get(key)
+                # Series recorded with different buckets (an older deployment) are not mixed
+                if merged is None:
+                    target[key] = list(value)
+                elif len(merged) == len(value):
+                    target[key] = [a + b for a, b in zip(merged, value)]
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value)) if abs(value) < 1e15 else repr(value)
+        return repr(value)
+    return str(value)
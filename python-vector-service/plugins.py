@@ -0,0 +1,104 @@
+"""Lazily imported libraries and the file format plugins that need them.
+
+PyMuPDF, ezdxf, shapely and svgpathtools (which pulls in scipy) take about a
+second to import together, while a worker may only ever see one format.
+Modules therefore refer to them through lazy_import() proxies, which import
+the library the first time one of its attributes is used.
+
+Each file format is a plugin: the function that analyzes it, the libraries
+it needs and a tiny sample file. The libraries are loaded the first time a
+file of the format arrives, or up front by a warm-up that analyzes the
+sample before a worker takes traffic. How long each library took to import
+is recorded for the cold-start report.
+"""
+import importlib
+import sys
+import time
+
+# Milliseconds each library took to import in this process, in import order
+_import_ms = {}
+
+_plugins = {}
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is used, then imports it"""
+
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = load_library(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{'' if self._module is None else ' (loaded)'}>"
+
+
+def lazy_import(name):
+    """A proxy for the module name (e.g. 'fitz' or 'ezdxf.path') that imports it on first use"""
+    return LazyModule(name)
+
+
+def load_library(name):
+    """Import a module, recording the time taken under its top-level package when it was not loaded yet"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    package = name.split('.')[0]
+    fresh = package not in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    if fresh:
+        _import_ms[package] = round((time.perf_counter() - started) * 1000, 1)
+    return module
+
+
+def import_times():
+    """{library: milliseconds} for the libraries imported through this module so far"""
+    return dict(_import_ms)
+
+
+class FormatPlugin:
+    """How files with one extension are analyzed
+
+    handler(processor, source, filename, options) returns an AnalysisResult;
+    libraries are imported before its first use, and sample() returns a tiny
+    file of the format to warm up with.
+    """
+
+    def __init__(self, extension, handler, libraries=(), sample=None):
+        self.extension = extension
+        self.name = extension.lstrip('.')
+        self.handler = handler
+        self.libraries = tuple(libraries)
+        self.sample = sample
+        self.loaded = False
+
+    def load(self):
+        """Import the plugin's libraries unless done already"""
+        if not self.loaded:
+            for library in self.libraries:
+                load_library(library)
+            self.loaded = True
+
+
+def register_format(extension, handler, libraries=(), sample=None):
+    """Register the plugin for files ending in extension ('.svg'), replacing any earlier one"""
+    plugin = _plugins[extension.lower()] = FormatPlugin(extension.lower(), handler, libraries, sample)
+    return plugin
+
+
+def format_plugin(extension):
+    """The plugin for an extension such as '.svg', or None when the format is not supported"""
+    return _plugins.get(extension.lower())
+
+
+def format_plugins():
+    """All registered plugins, in registration order"""
+    return list(_plugins.values())
@@ -0,0 +1,143 @@
+"""Streaming PostScript tokenizer for EPS analysis.
+
+The tokenizer walks a buffer (an mmap of the file or a memoryview of the upload)
+one window at a time and yields the tokens of each window as a list, so memory
+use does not grow with the file. The regex matches whole runs of plain numbers
+and operators, which are then split with bytes.split(); comments, strings,
+literal names and procedure bodies are consumed without producing tokens.
+"""
+import re
+import struct
+
+CHUNK_SIZE = 1 << 20
+
+# DOS EPS files wrap the PostScript section in a binary header with a TIFF/WMF preview
+DOS_EPS_MAGIC = b'\xc5\xd0\xd3\xc6'
+
+_TOKEN_RUN = re.compile(rb"""
+    (?P<plain>[^%()<>/{}\[\]]+)
+  | (?P<comment>%[^\r\n]*)
+  | (?P<string>\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\))
+  | (?P<dict><<|>>)
+  | (?P<hex><[^<>]*>)
+  | (?P<unterminated>[(<])
+  | (?P<name>/{1,2}[^\s()<>\[\]{}/%]*)
+  | (?P<bracket>[{}\[\]])
+  | (?P<stray>[)>])
+""", re.VERBOSE | re.DOTALL)
+
+_BBOX = re.compile(rb'%%BoundingBox:\s*(\(atend\)|[-+\d.eE]+\s+[-+\d.eE]+\s+[-+\d.eE]+\s+[-+\d.eE]+)')
+_HEADER_END = re.compile(rb'%%EndComments|^[^%\s]', re.MULTILINE)
+
+_NUMBER_START = frozenset(b'0123456789+-.')
+
+# Longest construct (string or hex string) carried across windows before it is treated as garbage
+MAX_CARRY = 16 * CHUNK_SIZE
+
+
+def postscript_section(buffer):
+    """The PostScript part of an EPS buffer, skipping a DOS EPS binary header if present"""
+    view = memoryview(buffer)
+    if bytes(view[:4]) == DOS_EPS_MAGIC and len(view) >= 12:
+        offset, length = struct.unpack('<II', view[4:12])
+        return view[offset:offset + length]
+    return view
+
+
+def find_bounding_box(buffer, header_limit=CHUNK_SIZE, trailer_size=64 * 1024):
+    """(x1, y1, x2, y2) from the %%BoundingBox DSC comment, or None
+
+    Only the header (up to %%EndComments or the first non-comment line) is
+    searched, plus the trailer when the header says (atend).
+    """
+    head = bytes(buffer[:header_limit])
+    end = _HEADER_END.search(head)
+    match = _BBOX.search(head, 0, end.start() if end else len(head))
+    if match and match.group(1) == b'(atend)':
+        tail = bytes(buffer[max(0, len(buffer) - trailer_size):])
+        match = None
+        for match in _BBOX.finditer(tail):
+            pass
+    if not match or match.group(1) == b'(atend)':
+        return None
+    try:
+        return tuple(float(v) for v in match.group(1).split())
+    except ValueError:
+        return None
+
+
+def _plain_tokens(run, tokens):
+    """Append the numbers (as floats) and operators (as str) in a run without special characters"""
+    append = tokens.append
+    for word in run.split():
+        if word[0] in _NUMBER_START:
+            try:
+                append(float(word))
+                continue
+            except ValueError:
+                pass
+        append(word.decode('latin-1'))
+
+
+def tokenize(buffer, chunk_size=CHUNK_SIZE, offsets=False):
+    """Yield lists of tokens from a PostScript buffer, one list per window
+
+    Numbers are floats and operators are str. Procedure bodies ({...}) are
+    reduced to their '{' and '}' tokens so the operators inside them are not
+    mistaken for drawing commands. With offsets, (end offset, tokens) pairs
+    are yielded instead, telling how much of the buffer has been read.
+    """
+    total = len(buffer)
+    pos = 0
+    depth = 0
+    while pos < total:
+        window_end = min(pos + chunk_size, total)
+        final = window_end == total
+        chunk = bytes(buffer[pos:window_end])
+        if not final:
+            # End the window on a line break (or at least whitespace) so no plain token is cut
+            cut = max(chunk.rfind(b'\n'), chunk.rfind(b'\r'))
+            if cut < 0:
+                cut = max(chunk.rfind(b' '), chunk.rfind(b'\t'))
+            if cut < 0:
+                if chunk_size < MAX_CARRY:
+                    chunk_size *= 2
+                    continue
+                cut = len(chunk) - 1
+            chunk = chunk[:cut + 1]
+
+        tokens = []
+        for match in _TOKEN_RUN.finditer(chunk):
+            kind = match.lastgroup
+            if kind == 'plain':
+                if depth == 0:
+                    _plain_tokens(match.group(), tokens)
+            elif kind == 'bracket':
+                bracket = match.group()
+                if bracket == b'{':
+                    if depth == 0:
+                        tokens.append('{')
+                    depth += 1
+                elif bracket == b'}':
+                    if depth:
+                        depth -= 1
+                    if depth == 0:
+                        tokens.append('}')
+                elif depth == 0:
+                    tokens.append(bracket.decode('latin-1'))
+            elif kind == 'unterminated' and not final:
+                # A string or hex string continues past this window; rescan it with the next one
+                if match.start() > 0:
+                    chunk = chunk[:match.start()]
+                    break
+                if chunk_size < MAX_CARRY:
+                    chunk = b''
+                    chunk_size *= 2
+                    break
+                # Longer than MAX_CARRY: skip the opening bracket as garbage
+
+        if not chunk:
+            continue  # window widened; retry from the same position
+        pos += len(chunk)
+        if tokens:
+            yield (pos, tokens) if offsets else tokens
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Part of every key; bumped when the cached result objects change shape, or an analysis gives different
+# results for the same file, so stale disk entries are never read
+CACHE_VERSION = 9
+
+
+def make_cache_key(data, options=None):
+    """Build a content-addressed key from the upload bytes and analysis options"""
+    digest = hashlib.sha256()
+    digest.update(f'v{CACHE_VERSION}\0'.encode('ascii'))
+    digest.update(data)
+    digest.update(b'\0')
+    digest.update(json.dumps(options or {}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier analysis result cache: in-memory LRU backed by an optional SQLite file"""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, disk_path=None, disk_max_entries=10000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()  # key -> (payload, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'memoryHits': 0,
+            'diskHits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'diskEvictions': 0,
+            'stores': 0
+        }
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS results (
+                        key TEXT PRIMARY KEY,
+                        payload BLOB NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return the cached result for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['memoryHits'] += 1
+                return pickle.loads(entry[0])
+
+        payload = self._disk_get(key)
+        with self._lock:
+            if payload is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.stats['diskHits'] += 1
+            self._memory_put(key, payload)
+        return pickle.loads(payload)
+
+    def put(self, key, result):
+        """Store a result in both tiers"""
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.stats['stores'] += 1
+            self._memory_put(key, payload)
+        self._disk_put(key, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM results")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hitRate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['maxEntries'] = self.max_entries
+            stats['maxBytes'] = self.max_bytes
+        stats['disk'] = self.disk_path is not None
+        if self.disk_path:
+            try:
+                with self._connect() as conn:
+                    stats['diskEntries'] = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            except sqlite3.Error:
+                stats['diskEntries'] = None
+        return stats
+
+    def _memory_put(self, key, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (payload, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.stats['evictions'] += 1
+
+    def _disk_get(self, key):
+        if not self.disk_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                return row[0]
+        except sqlite3.Error:
+            return None
+
+    def _disk_put(self, key, payload):
+        if not self.disk_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, payload, accessed_at) VALUES (?, ?, ?)",
+                    (key, payload, time.time())
+                )
+                count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                overflow = count - self.disk_max_entries
+                if overflow > 0:
+                    conn.execute("""
+                        DELETE FROM results WHERE key IN (
+                            SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?
+                        )
+                    """, (overflow,))
+                    with self._lock:
+                        self.stats['diskEvictions'] += overflow
+        except sqlite3.Error:
+            pass
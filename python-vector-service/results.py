@@ -0,0 +1,284 @@
+"""Analysis results with raw values in mm, and their serialized forms.
+
+The processors fill in an AnalysisResult: totals as floats and one NumPy
+column per shape property. Text is only produced when a result is serialized:
+
+- legacy:  the original JSON with every value pre-formatted ("12.34 mm")
+- numeric: compact JSON with plain numbers and columnar shape arrays
+- packed:  a binary header plus little-endian float64 shape columns
+           (see encode_packed / decode_packed)
+
+Any of them can leave out the per-shape detail and report aggregates only.
+Analyses stopped early by a budget carry an 'estimate': the totals are then
+extrapolated from the part that was measured, which is reported alongside.
+Analyses with simplified material outlines carry a 'simplification' with its error bound.
+"""
+import json
+import struct
+
+import numpy as np
+
+# How a shape without area is labelled in the legacy format
+OPEN = 0    # 'Open path (no area)'
+CLOSED = 1  # 'No area': a closed but unfilled PostScript path
+
+FORMATS = ('legacy', 'numeric', 'packed')
+
+PACKED_MAGIC = b'VRES'
+PACKED_VERSION = 1
+_PACKED_HEADER = struct.Struct('<4sHHI')  # magic, version, reserved, header length
+
+# Decimals kept in the numeric formats: micrometres and square micrometres are plenty for pricing
+NUMERIC_DECIMALS = 3
+
+
+class AnalysisResult:
+    """Outcome of one file analysis, in mm and mm²"""
+
+    __slots__ = ('file_name', 'paper', 'letter_area', 'path_length', 'lengths', 'areas', 'names', 'kinds',
+                 'material', 'pages', 'page_count', 'warnings', 'skipped', 'legacy', 'estimate', 'error',
+                 'timings', 'prescan', 'simplification')
+
+    def __init__(self, file_name, paper=None, letter_area=0.0, path_length=0.0, lengths=(), areas=(),
+                 names=None, kinds=None, error=None):
+        self.file_name = file_name
+        self.paper = paper                # (width, height) in mm, or None when unknown
+        self.letter_area = letter_area
+        self.path_length = path_length
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.names = names                # None means 'Path 1', 'Path 2', ...
+        self.kinds = kinds                # None means every shape is OPEN
+        self.material = None              # material area summary (area=material)
+        self.pages = None                 # per-page summaries of multi-page PDFs
+        self.page_count = None
+        self.warnings = None
+        self.skipped = None               # DXF entity types that were not measured
+        self.legacy = {}                  # legacy-format text replacing a field, e.g. 'No paths found'
+        self.estimate = None              # how the totals were extrapolated, for partial analyses
+        self.error = error
+        self.timings = None
+        self.prescan = None               # upload pre-scan: sniffed format, bytes and estimated item count
+        self.simplification = None        # vertices dropped by the simplify option and the error bound
+
+    @classmethod
+    def failed(cls, file_name, error):
+        return cls(file_name, error=error)
+
+    @property
+    def shape_count(self):
+        return len(self.lengths)
+
+    def shape_names(self):
+        if self.names is not None:
+            return self.names
+        return [f'Path {i}' for i in range(1, self.shape_count + 1)]
+
+    def serialize(self, fmt='legacy', shapes=True):
+        """The result as a JSON-ready dict (legacy, numeric) or bytes (packed)"""
+        if fmt == 'legacy':
+            return self.to_legacy(shapes)
+        if fmt == 'numeric':
+            return self.to_numeric(shapes)
+        if fmt == 'packed':
+            return encode_packed(self, shapes)
+        raise ValueError(f'Unknown result format: {fmt!r}')
+
+    def to_legacy(self, shapes=True):
+        """The original response: every measurement formatted as text with its unit"""
+        if self.error is not None:
+            return {
+                'fileName': self.file_name,
+                'error': self.error,
+                'paperArea': 'Unknown',
+                'letterArea': 0,
+                'pathLength': 0,
+                'shapes': []
+            }
+        result = {
+            'fileName': self.file_name,
+            'paperArea': _paper_text(self.paper),
+            'letterArea': self.legacy.get('letterArea') or f"{self.letter_area:.2f} mm²",
+            'pathLength': self.legacy.get('pathLength') or f"{self.path_length:.2f} mm"
+        }
+        if shapes:
+            result['shapes'] = self.legacy.get('shapes') or self._legacy_shapes()
+        else:
+            result['shapeCount'] = self.shape_count
+        result['units'] = 'mm'
+        if self.material is not None:
+            material = self.material
+            result['materialArea'] = {
+                'rawArea': f"{material['rawArea']:.2f} mm²",
+                'unionArea': f"{material['unionArea']:.2f} mm²",
+                'overlapArea': f"{material['overlapArea']:.2f} mm²",
+                'outlines': material['outlines'],
+                'components': material['components'],
+                'overlapping': material['overlapping'],
+                'nested': material['nested'],
+                'timeMs': material['timeMs']
+            }
+        if self.estimate is not None:
+            estimate = self.estimate
+            result['estimate'] = {
+                'partial': True,
+                'basis': estimate['basis'],
+                'coverage': round(estimate['coverage'], 4),
+                'sampled': estimate['sampled'],
+                'total': estimate['total'],
+                'measuredLetterArea': f"{estimate['measuredLetterArea']:.2f} mm²",
+                'measuredPathLength': f"{estimate['measuredPathLength']:.2f} mm",
+                'letterAreaError': _error_text(estimate['letterAreaError'], 'mm²'),
+                'pathLengthError': _error_text(estimate['pathLengthError'], 'mm')
+            }
+        if self.simplification is not None:
+            simplification = self.simplification
+            result['simplification'] = {
+                'tolerance': f"{simplification['tolerance']:g} mm",
+                'vertices': simplification['vertices'],
+                'keptVertices': simplification['keptVertices'],
+                'reduction': round(simplification['reduction'], 4),
+                'letterAreaError': _error_text(simplification['letterAreaError'], 'mm²')
+            }
+        if self.page_count is not None:
+            result['pageCount'] = self.page_count
+            result['pages'] = [{
+                'page': page['page'],
+                'paperArea': _paper_text((page['width'], page['height'])),
+                'letterArea': f"{page['letterArea']:.2f} mm²",
+                'pathLength': f"{page['pathLength']:.2f} mm",
+                'shapeCount': page['shapeCount']
+            } for page in self.pages]
+        if self.skipped:
+            result['skippedEntities'] = self.skipped
+        if self.warnings:
+            result['warnings'] = self.warnings
+        if self.prescan is not None:
+            result['prescan'] = self.prescan
+        return result
+
+    def _legacy_shapes(self):
+        kinds = self.kinds
+        shapes = []
+        for i, (name, length, area) in enumerate(zip(self.shape_names(), self.lengths.tolist(), self.areas.tolist())):
+            if area > 0:
+                area_text = f"{area:.2f} mm²"
+            elif kinds is not None and kinds[i] == CLOSED:
+                area_text = 'No area'
+            else:
+                area_text = 'Open path (no area)'
+            shapes.append({'name': name, 'length': f"{length:.2f} mm", 'area': area_text})
+        return shapes
+
+    def to_numeric(self, shapes=True):
+        """Compact JSON: plain numbers in mm/mm² and the shapes as columns"""
+        if self.error is not None:
+            return {'fileName': self.file_name, 'error': self.error}
+        result = self._numeric_summary()
+        if shapes:
+            columns = {
+                'length': np.round(self.lengths, NUMERIC_DECIMALS).tolist(),
+                'area': np.round(self.areas, NUMERIC_DECIMALS).tolist()
+            }
+            if self.names is not None:
+                columns['name'] = self.names
+            result['shapes'] = columns
+        return result
+
+    def _numeric_summary(self):
+        """Everything except the shape columns, with numbers rounded to NUMERIC_DECIMALS"""
+        result = {
+            'fileName': self.file_name,
+            'units': 'mm',
+            'paper': None if self.paper is None else {
+                'width': round(self.paper[0], NUMERIC_DECIMALS),
+                'height': round(self.paper[1], NUMERIC_DECIMALS)
+            },
+            'letterArea': round(self.letter_area, NUMERIC_DECIMALS),
+            'pathLength': round(self.path_length, NUMERIC_DECIMALS),
+            'shapeCount': self.shape_count
+        }
+        if self.material is not None:
+            material = dict(self.material)
+            for key in ('rawArea', 'unionArea', 'overlapArea'):
+                material[key] = round(material[key], NUMERIC_DECIMALS)
+            result['materialArea'] = material
+        if self.estimate is not None:
+            estimate = {key: round(value, NUMERIC_DECIMALS) if isinstance(value, float) else value
+                        for key, value in self.estimate.items()}
+            estimate['coverage'] = round(self.estimate['coverage'], 4)
+            result['estimate'] = {'partial': True, **estimate}
+        if self.simplification is not None:
+            simplification = {key: round(value, NUMERIC_DECIMALS) if isinstance(value, float) else value
+                              for key, value in self.simplification.items()}
+            simplification['reduction'] = round(self.simplification['reduction'], 4)
+            result['simplification'] = simplification
+        if self.page_count is not None:
+            result['pageCount'] = self.page_count
+            result['pages'] = [{
+                key: round(value, NUMERIC_DECIMALS) if isinstance(value, float) else value
+                for key, value in page.items()
+            } for page in self.pages]
+        if self.skipped:
+            result['skippedEntities'] = self.skipped
+        if self.warnings:
+            result['warnings'] = self.warnings
+        if self.prescan is not None:
+            result['prescan'] = self.prescan
+        return result
+
+
+def _paper_text(paper):
+    if paper is None:
+        return 'Unknown'
+    return f"{paper[0]:.2f}x{paper[1]:.2f} mm"
+
+
+def _error_text(error, unit):
+    return 'Unknown' if error is None else f"±{error:.2f} {unit}"
+
+
+def encode_packed(result, shapes=True, extra=None):
+    """Binary form of a result
+
+    Layout (little-endian): 4-byte magic b'VRES', uint16 version, uint16
+    reserved, uint32 header length, the header as UTF-8 JSON (the numeric
+    format without shape columns, plus extra), zero padding to a multiple of
+    8 bytes, then shapeCount float64 lengths and shapeCount float64 areas in
+    mm and mm². Without shapes, or for a failed analysis, the columns are left
+    out and header['columns'] is empty.
+    """
+    if result.error is not None:
+        header = {'fileName': result.file_name, 'error': result.error}
+    else:
+        header = result._numeric_summary()
+        if shapes and result.names is not None:
+            header['names'] = result.names
+    header['columns'] = ['length', 'area'] if shapes and result.error is None else []
+    if extra:
+        header.update(extra)
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    encoded += b' ' * (-(_PACKED_HEADER.size + len(encoded)) % 8)
+    parts = [_PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, 0, len(encoded)), encoded]
+    if header['columns']:
+        parts.append(result.lengths.astype('<f8').tobytes())
+        parts.append(result.areas.astype('<f8').tobytes())
+    return b''.join(parts)
+
+
+def decode_packed(data):
+    """(header dict, {column: float64 array}) from encode_packed output"""
+    magic, version, _, length = _PACKED_HEADER.unpack_from(data)
+    if magic != PACKED_MAGIC:
+        raise ValueError('Not a packed analysis result')
+    if version != PACKED_VERSION:
+        raise ValueError(f'Unsupported packed result version {version}')
+    offset = _PACKED_HEADER.size
+    header = json.loads(bytes(data[offset:offset + length]))
+    offset += length
+    count = header.get('shapeCount', 0)
+    columns = {}
+    for name in header['columns']:
+        columns[name] = np.frombuffer(data, dtype='<f8', count=count, offset=offset)
+        offset += 8 * count
+    return header, columns
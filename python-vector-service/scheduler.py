@@ -0,0 +1,379 @@
+"""Lanes of killable analysis workers, chosen by the upload pre-scan.
+
+A pathological file can keep an analysis busy for minutes, and a thread that
+runs it cannot be stopped. Analyses therefore run in worker processes, each
+serving one analysis at a time over a pipe. A worker that is still busy when
+the request's deadline passes is killed and replaced, and the request gets an
+AnalysisTimeout instead of a result. An optional CPU limit (RLIMIT_CPU, set
+per analysis) has the kernel stop a worker that computes for too long.
+
+Workers are split into lanes. Small files, judged by the pre-scan of the upload
+(bytes and paths, entities or pages), go to the fast lane, everything else to
+the heavy lane, so small files never wait behind a heavy one. Each lane has its
+own bounded queue; lane stats report its depth and the recent queue waits.
+
+Workers cannot start processes of their own, so a worker hands the pages of
+a multi-page PDF back to the server process, which measures them on its
+pool (analysis_pool) within the same deadline.
+"""
+import math
+import os
+import signal
+import threading
+import time
+from collections import deque
+from functools import partial
+
+try:
+    import resource
+except ImportError:  # Unix only; elsewhere the CPU limit is not enforced
+    resource = None
+
+from werkzeug.utils import secure_filename
+
+from analysis_pool import START_METHOD, delegate_pdf_pages, measure_pdf_pages, process_context
+from instrumentation import StackSampler
+from metrics import percentile
+from results import AnalysisResult
+from vector_processor import VectorProcessor, select_pages, warm_up
+
+LANES = ('fast', 'heavy')
+
+# Queue waits kept per lane for the wait percentiles in its stats
+WAIT_SAMPLES = 1024
+
+
+class LaneFull(Exception):
+    """The lane's queue already holds its maximum number of waiting requests"""
+
+
+class AnalysisTimeout(Exception):
+    """An analysis did not finish within its deadline or CPU limit and was cancelled
+
+    reason is 'queue' (the deadline passed before a worker was free),
+    'deadline' (the worker was killed) or 'cpu' (the worker hit its CPU limit).
+    """
+
+    def __init__(self, reason, lane, deadline_ms, waited_ms, ran_ms=0.0, cpu_seconds=None):
+        if reason == 'cpu':
+            message = f'Analysis exceeded its CPU limit of {cpu_seconds:g} s and was cancelled'
+        elif reason == 'queue':
+            message = f'Analysis could not start within its deadline of {deadline_ms:g} ms'
+        else:
+            message = f'Analysis did not finish within its deadline of {deadline_ms:g} ms and was cancelled'
+        super().__init__(message)
+        self.reason = reason
+        self.lane = lane
+        self.deadline_ms = deadline_ms
+        self.waited_ms = waited_ms
+        self.ran_ms = ran_ms
+
+    def to_dict(self):
+        return {
+            'reason': self.reason,
+            'lane': self.lane,
+            'deadlineMs': self.deadline_ms,
+            'waitedMs': round(self.waited_ms, 1),
+            'ranMs': round(self.ran_ms, 1)
+        }
+
+
+class _Cancelled(Exception):
+    """A worker was stopped before it answered; reason as in AnalysisTimeout"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _serve(conn, parent_conn, profile, start_method):
+    """Worker process: analyze (data, filename, options, cpu seconds) tasks until the pipe closes
+
+    Replies are ('result', result, profile file name or None). The pages of
+    a multi-page PDF are measured by the server process on its pool: the
+    worker sends ('pages', arguments) and waits for (pages, error).
+    """
+    parent_conn.close()
+    # Signal handlers inherited from the server process do not apply here
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if hasattr(signal, 'SIGXCPU'):
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+    # Forked workers inherit the server's warmed libraries; others warm up themselves (the fork
+    # server has the libraries imported already, so that only exercises them)
+    if start_method != 'fork':
+        warm_up()
+    delegate_pdf_pages(partial(_request_pages, conn))
+    processor = VectorProcessor()
+    while True:
+        try:
+            data, filename, options, cpu_seconds = conn.recv()
+        except EOFError:
+            return
+        if cpu_seconds and resource is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = usage.ru_utime + usage.ru_stime
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(used + cpu_seconds), hard))
+        profile_name = None
+        try:
+            if profile:
+                with StackSampler(interval=profile['intervalMs'] / 1000) as sampler:
+                    result = processor.analyze(data, filename, options)
+                profile_name = _write_profile(sampler, profile, filename)
+            else:
+                result = processor.analyze(data, filename, options)
+        except Exception as e:
+            result = AnalysisResult.failed(filename, str(e) or e.__class__.__name__)
+        conn.send(('result', result, profile_name))
+
+
+def _request_pages(conn, *arguments):
+    """Page delegate of a worker: measure_pdf_pages on the server process, for the PDF being analyzed"""
+    conn.send(('pages', arguments))
+    pages, error = conn.recv()
+    if error is not None:
+        raise Exception(error)
+    return pages
+
+
+def _write_profile(sampler, profile, filename):
+    """Keep the sampled stacks of an analysis slower than the profile threshold; returns the file name"""
+    if sampler.elapsed * 1000 < profile['slowMs'] or not sampler.samples:
+        return None
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{secure_filename(filename) or 'upload'}.folded"
+    sampler.write(os.path.join(profile['dir'], name))
+    return name
+
+
+class LaneWorker:
+    """One worker process and the parent's end of its pipe; started on first use and after a kill
+
+    Workers are started from analysis_pool.process_context, not forked from
+    the multithreaded server process.
+    """
+
+    def __init__(self, profile=None):
+        self.profile = profile
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        context = process_context()
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn, self.conn, self.profile, START_METHOD),
+                                       name='vector-lane-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run(self, task, timeout):
+        """Send a task and wait up to timeout seconds for the reply; raises _Cancelled after killing the worker
+
+        Meanwhile measures the PDF pages the worker hands back on this process's pool.
+        """
+        if self.process is None or not self.process.is_alive():
+            self.stop()
+            self.start()
+        deadline = time.perf_counter() + timeout
+        try:
+            self.conn.send(task)
+            while self.conn.poll(max(deadline - time.perf_counter(), 0)):
+                reply = self.conn.recv()
+                if reply[0] == 'result':
+                    return reply[1:]
+                try:
+                    pages = measure_pdf_pages(task[0], *reply[1], timeout=deadline - time.perf_counter())
+                except TimeoutError:
+                    break
+                except Exception as e:
+                    self.conn.send((None, str(e) or e.__class__.__name__))
+                else:
+                    self.conn.send((pages, None))
+        except (EOFError, OSError):
+            self.process.join(1)
+            code = self.process.exitcode
+            self.stop()
+            if hasattr(signal, 'SIGXCPU') and code == -signal.SIGXCPU:
+                raise _Cancelled('cpu')
+            raise Exception(f'Analysis worker exited unexpectedly (exit code {code})')
+        self.stop()
+        raise _Cancelled('deadline')
+
+    def stop(self):
+        """Kill the worker process, if any"""
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = self.conn = None
+
+
+class Lane:
+    """A fixed set of workers with a bounded queue of requests waiting for one"""
+
+    def __init__(self, name, workers=1, max_queued=4, cpu_seconds=None, profile=None):
+        self.name = name
+        self.workers = workers
+        self.max_queued = max_queued
+        self.cpu_seconds = cpu_seconds
+        self._workers = [LaneWorker(profile) for _ in range(workers)]
+        self._idle = list(self._workers)
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.active = 0
+        self.queued = 0
+        self.stats = {'completed': 0, 'timedOut': 0, 'killed': 0, 'rejected': 0}
+
+    def start(self):
+        """Start the lane's idle worker processes ahead of the first request"""
+        with self._cond:
+            for worker in self._idle:
+                if worker.process is None:
+                    worker.start()
+
+    def stop(self):
+        with self._cond:
+            for worker in self._idle:
+                worker.stop()
+
+    def run(self, data, filename, options, deadline_ms, started=None, reject=True):
+        """Analyze on the lane's next free worker within deadline_ms of started (default: now)
+
+        Returns (AnalysisResult, seconds waited, profile file name or None).
+        Raises LaneFull when reject is set and the queue is full, and
+        AnalysisTimeout when the deadline passes in the queue or on the worker.
+        """
+        queued = time.perf_counter()
+        deadline = (queued if started is None else started) + deadline_ms / 1000
+        worker = self._acquire(deadline, reject)
+        running = time.perf_counter()
+        waited = running - queued
+        self._waits.append(waited)
+        if worker is None:
+            self._count('timedOut')
+            raise AnalysisTimeout('queue', self.name, deadline_ms, waited * 1000)
+        try:
+            result, profile_name = worker.run((data, filename, options, self.cpu_seconds), deadline - running)
+        except _Cancelled as e:
+            self._count('timedOut')
+            self._count('killed')
+            raise AnalysisTimeout(e.reason, self.name, deadline_ms, waited * 1000,
+                                  (time.perf_counter() - running) * 1000, self.cpu_seconds)
+        finally:
+            self._release(worker)
+        self._count('completed')
+        return result, waited, profile_name
+
+    def _acquire(self, deadline, reject):
+        with self._cond:
+            if not self._idle and reject and self.queued >= self.max_queued:
+                self.stats['rejected'] += 1
+                raise LaneFull(f'The {self.name} lane is at capacity, please retry later')
+            self.queued += 1
+            try:
+                # A request whose deadline has passed already does not take a worker, even an idle one
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        return None
+                    if self._idle:
+                        break
+                    self._cond.wait(remaining)
+                self.active += 1
+                return self._idle.pop()
+            finally:
+                self.queued -= 1
+
+    def _release(self, worker):
+        with self._cond:
+            self.active -= 1
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def pids(self):
+        """Process ids of the lane's worker processes that are running"""
+        return [worker.process.pid for worker in self._workers
+                if worker.process is not None and worker.process.is_alive()]
+
+    def load(self):
+        """(workers, busy, queued) right now; cheaper than get_stats"""
+        with self._cond:
+            return self.workers, self.active, self.queued
+
+    def _count(self, name):
+        with self._cond:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            stats = dict(self.stats, workers=self.workers, active=self.active, queued=self.queued,
+                         maxQueued=self.max_queued)
+        stats['waitMs'] = {
+            'p50': round(percentile(waits, 0.5) * 1000, 2),
+            'p99': round(percentile(waits, 0.99) * 1000, 2),
+            'max': round(waits[-1] * 1000, 2) if waits else 0.0,
+            'samples': len(waits)
+        }
+        return stats
+
+
+class LaneScheduler:
+    """Routes analyses to the fast or the heavy lane by the pre-scan of their upload
+
+    fast_limits caps what counts as small: 'bytes' of the upload and the
+    pre-scanned 'paths', 'entities' or (analyzed) 'pages'. Uploads without a
+    pre-scan go to the heavy lane.
+    """
+
+    def __init__(self, fast_workers=1, fast_queued=8, heavy_workers=1, heavy_queued=2, fast_limits=None,
+                 cpu_seconds=None, profile=None):
+        self.fast_limits = dict(fast_limits or {})
+        self.lanes = {
+            'fast': Lane('fast', fast_workers, fast_queued, cpu_seconds, profile),
+            'heavy': Lane('heavy', heavy_workers, heavy_queued, cpu_seconds, profile)
+        }
+
+    def lane_for(self, prescan, options=None):
+        """'fast' or 'heavy' for an upload with this pre-scan and these analysis options"""
+        if not prescan:
+            return 'heavy'
+        counts = dict(prescan)
+        if counts.get('format') == 'pdf' and 'pages' in counts:
+            # Only the selected pages are analyzed, the first one by default
+            try:
+                counts['pages'] = len(select_pages((options or {}).get('pages'), max(counts['pages'], 1)))
+            except ValueError:
+                pass
+        for name, limit in self.fast_limits.items():
+            if limit is not None and counts.get(name, 0) > limit:
+                return 'heavy'
+        return 'fast'
+
+    def run(self, lane, data, filename, options, deadline_ms, started=None, reject=True):
+        """Lane.run on the named lane"""
+        return self.lanes[lane].run(data, filename, options, deadline_ms, started, reject)
+
+    def start(self):
+        for lane in self.lanes.values():
+            lane.start()
+
+    def stop(self):
+        for lane in self.lanes.values():
+            lane.stop()
+
+    def pids(self):
+        """Process ids of the running workers of all lanes"""
+        return [pid for lane in self.lanes.values() for pid in lane.pids()]
+
+    def load(self):
+        """(workers, busy, queued) summed over the lanes"""
+        totals = [0, 0, 0]
+        for lane in self.lanes.values():
+            for i, value in enumerate(lane.load()):
+                totals[i] += value
+        return tuple(totals)
+
+    def get_stats(self):
+        return {name: lane.get_stats() for name, lane in self.lanes.items()}
@@ -0,0 +1,182 @@
+"""Streaming SVG reader: shape elements with their transforms, one at a time.
+
+ElementTree's iterparse walks the document and every shape element is handed
+out as soon as its end tag has been read, then cleared and detached, so memory
+is bounded by the nesting depth rather than the size of the document.
+
+transform attributes of a shape and all its ancestors, including the x/y
+placement of <use>, are composed into one affine matrix (a, b, c, d, e, f),
+mapping (x, y) to (a*x + c*y + e, b*x + d*y + f) as in SVG. Content of
+containers that are never rendered themselves (<defs>, <symbol>, ...) only
+counts where a <use> places it. The shapes of an element referenced by <use>
+are collected once, while it streams past, and handed out again for every
+<use> with a key, so callers can reuse what they computed for the first one.
+"""
+import io
+import mmap
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from plugins import lazy_import
+
+svgpathtools_parser = lazy_import('svgpathtools.parser')
+svg_to_paths = lazy_import('svgpathtools.svg_to_paths')
+
+# Shape elements in the order svgpathtools.svg2paths returns them, with their conversion to path data
+SVG_SHAPES = {
+    'path': lambda attrs: attrs['d'],
+    'polyline': lambda attrs: svg_to_paths.polyline2pathd(attrs),
+    'polygon': lambda attrs: svg_to_paths.polygon2pathd(attrs),
+    'line': lambda attrs: 'M' + attrs['x1'] + ' ' + attrs['y1'] + 'L' + attrs['x2'] + ' ' + attrs['y2'],
+    'ellipse': lambda attrs: svg_to_paths.ellipse2pathd(attrs),
+    'circle': lambda attrs: svg_to_paths.ellipse2pathd(attrs),
+    'rect': lambda attrs: svg_to_paths.rect2pathd(attrs)
+}
+SHAPE_RANK = {tag: rank for rank, tag in enumerate(SVG_SHAPES)}
+
+# Containers whose content is only drawn where it is referenced
+NOT_RENDERED = {'defs', 'symbol', 'clipPath', 'mask', 'marker', 'pattern'}
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+_HREF = re.compile(rb'href\s*=\s*["\']\s*#([^"\'\s]+)')
+# Markup the streaming reader is needed for: without it, shapes can be read straight from the bytes
+_STRUCTURE = re.compile(rb'transform\s*=|<(?:[\w.-]+:)?(?:use|' + '|'.join(NOT_RENDERED).encode() + rb')[\s/>]')
+
+
+def parse_transform(text):
+    """The affine matrix of an SVG transform attribute"""
+    if not text or not text.strip():
+        return IDENTITY
+    m = svgpathtools_parser.parse_transform(text)
+    return (float(m[0, 0]), float(m[1, 0]), float(m[0, 1]), float(m[1, 1]), float(m[0, 2]), float(m[1, 2]))
+
+
+def compose(outer, inner):
+    """The matrix applying inner first, then outer"""
+    if inner is IDENTITY:
+        return outer
+    if outer is IDENTITY:
+        return inner
+    a, b, c, d, e, f = outer
+    p, q, r, s, t, u = inner
+    return (a * p + c * q, b * p + d * q, a * r + c * s, b * r + d * s, a * t + c * u + e, b * t + d * u + f)
+
+
+def similarity_scale(m, tolerance=1e-9):
+    """Scale factor of a matrix that only rotates, reflects, translates and scales uniformly, else None
+
+    Such a matrix multiplies every length by the factor and every area by its
+    square, so shapes can be measured untransformed.
+    """
+    a, b, c, d, _, _ = m
+    first, second = a * a + b * b, c * c + d * d
+    if abs(a * c + b * d) > tolerance * (first + second) or abs(first - second) > tolerance * (first + second):
+        return None
+    return first ** 0.5
+
+
+def needs_structure(data):
+    """Whether an SVG document uses transforms, <use> or non-rendered containers"""
+    return _STRUCTURE.search(data) is not None
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+class SvgReader:
+    """Reads an SVG document (a path or bytes) as a stream of shapes
+
+    root is the root element with its attributes; shapes() yields the shape
+    elements in document order as (tag, path data, matrix, key) tuples. key is
+    None, or identifies a piece of a <use>d element that is handed out again.
+    References that cannot be resolved end up in warnings.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            referenced = set()
+            if os.path.getsize(source):
+                with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    referenced = self._referenced_ids(view)
+            stream = source
+        else:
+            referenced = self._referenced_ids(source)
+            stream = io.BytesIO(source)
+        self.warnings = []
+        self._referenced = referenced
+        self._templates = {}  # id -> [(tag, d, matrix relative to the element's parent, key)]
+        self._events = ET.iterparse(stream, events=('start', 'end'))
+        _, self.root = next(self._events)
+
+    @staticmethod
+    def _referenced_ids(data):
+        return {match.decode('utf-8', 'replace') for match in _HREF.findall(data)}
+
+    def shapes(self):
+        # Per open element: [hidden, absolute matrix, ((capture list, matrix relative to it), ...), own capture]
+        stack = [self._frame(False, IDENTITY, (), self.root)]
+        elements = [self.root]
+        deferred = []  # <use> elements referring to something not read yet
+        for event, elem in self._events:
+            if event == 'start':
+                hidden, absolute, captures, _ = frame = self._frame(*stack[-1][:3], elem)
+                stack.append(frame)
+                elements.append(elem)
+                if _local(elem.tag) == 'use':
+                    ref = (elem.get('href') or elem.get(XLINK_HREF) or '').strip()[1:]
+                    if ref in self._templates:
+                        yield from self._place(ref, hidden, absolute, captures)
+                    else:
+                        deferred.append((ref, hidden, absolute))
+                continue
+
+            hidden, absolute, captures, capture = stack.pop()
+            elements.pop()
+            tag = _local(elem.tag)
+            if tag in SVG_SHAPES:
+                d = SVG_SHAPES[tag](elem.attrib)
+                if not hidden:
+                    yield tag, d, absolute, None
+                for target, relative in captures:
+                    target.append((tag, d, relative, None))
+            if capture is not None:
+                ident = elem.get('id')
+                self._templates[ident] = [(t, d, m, key or (ident, n)) for n, (t, d, m, key) in enumerate(capture)]
+            if elements:
+                elem.clear()
+                elements[-1].remove(elem)
+
+        for ref, hidden, absolute in deferred:
+            if ref in self._templates:
+                yield from self._place(ref, hidden, absolute, ())
+            else:
+                self.warnings.append(f"Reference #{ref} not found")
+
+    def _frame(self, hidden, absolute, captures, elem):
+        """Stack entry of an element opened inside an element with the given hidden, matrix and captures"""
+        tag = _local(elem.tag)
+        own = parse_transform(elem.get('transform'))
+        if tag == 'use':
+            x, y = float(elem.get('x') or 0), float(elem.get('y') or 0)
+            if x or y:
+                own = compose(own, (1.0, 0.0, 0.0, 1.0, x, y))
+        captures = tuple((target, compose(relative, own)) for target, relative in captures)
+        # A referenced element collects its shapes relative to its parent, its own transform included
+        capture = None
+        ident = elem.get('id')
+        if ident in self._referenced and ident not in self._templates:
+            capture = []
+            captures += ((capture, own),)
+        return [hidden or tag in NOT_RENDERED, compose(absolute, own), captures, capture]
+
+    def _place(self, ref, hidden, absolute, captures):
+        """The shapes of a <use> of ref, also adding them to the templates being captured around it"""
+        for tag, d, relative, key in self._templates[ref]:
+            if not hidden:
+                yield tag, d, compose(absolute, relative), key
+            for target, outer in captures:
+                target.append((tag, d, compose(outer, relative), key))
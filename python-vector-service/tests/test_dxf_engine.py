@@ -0,0 +1,49 @@
+"""DXF hatches: the fill of an associative hatch is not counted again for its boundary entities"""
+import io
+
+import ezdxf
+import pytest
+
+from vector_processor import VectorProcessor
+
+SQUARE = [(0, 0), (10, 0), (10, 10), (0, 10)]
+FILL = 100 - 3.14159265 * 4  # the square with the circle as its hole
+
+
+def drawing(associative, xscale=None):
+    """A square with a circular hole, drawn as an LWPOLYLINE and a CIRCLE and filled by a HATCH
+
+    With xscale, the three entities are in a block inserted with that X scale.
+    """
+    doc = ezdxf.new()
+    layout = doc.modelspace() if xscale is None else doc.blocks.new('SHAPE')
+    square = layout.add_lwpolyline(SQUARE, close=True)
+    hole = layout.add_circle((5, 5), 2)
+    hatch = layout.add_hatch()
+    hatch.paths.add_polyline_path(SQUARE, is_closed=True)
+    hatch.paths.add_edge_path().add_arc((5, 5), 2, 0, 360)
+    if associative:
+        hatch.dxf.associative = 1
+        hatch.paths.paths[0].source_boundary_objects = [square.dxf.handle]
+        hatch.paths.paths[1].source_boundary_objects = [hole.dxf.handle]
+    if xscale is not None:
+        doc.modelspace().add_blockref('SHAPE', (20, 0), dxfattribs={'xscale': xscale})
+    stream = io.StringIO()
+    doc.write(stream)
+    return stream.getvalue().encode()
+
+
+def letter_area(data):
+    result = VectorProcessor().analyze(data, 'hatch.dxf', {})
+    assert result.error is None
+    return result.serialize('numeric', False)['letterArea']
+
+
+@pytest.mark.parametrize('xscale', [None, 1, -1, 2])
+def test_associative_hatch_counts_once(xscale):
+    scale = 1 if xscale is None else abs(xscale)
+    assert letter_area(drawing(True, xscale)) == pytest.approx(FILL * scale, rel=1e-4)
+
+
+def test_plain_hatch_adds_its_fill():
+    assert letter_area(drawing(False)) == pytest.approx(100 + 3.14159265 * 4 + FILL, rel=1e-4)
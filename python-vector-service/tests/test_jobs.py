@@ -0,0 +1,160 @@
+"""Job queue: atomic claims, lease recovery of jobs left by a dead process, and callback URL checks"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from jobs import MAX_ATTEMPTS, CallbackRejected, JobQueue, check_callback_url
+
+
+def analyzed(data, filename, options):
+    return {'fileName': filename, 'bytes': len(data)}
+
+
+def test_each_job_is_claimed_once(tmp_path):
+    # Two processes sharing the database; the oldest queued job is claimed first
+    first, second = (JobQueue(str(tmp_path / 'jobs.db'), analyzed) for _ in range(2))
+    ids = [first.submit(b'x' * size, f'{size}.svg', {}) for size in (1, 2, 3)]
+    claims = [first._claim(), second._claim(), first._claim(), second._claim()]
+    assert [claim and claim[0] for claim in claims] == ids + [None]
+    assert claims[1][1:] == (b'xx', '2.svg', {})
+    assert all(first.get(job_id)['status'] == 'running' for job_id in ids)
+
+
+def test_claims_from_many_threads_do_not_overlap(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), analyzed)
+    ids = {queue.submit(b'x', f'{i}.svg', {}) for i in range(20)}
+    claimed = []
+
+    def claim():
+        while (job := queue._claim()) is not None:
+            claimed.append(job[0])
+
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(ids)
+
+
+def test_jobs_of_a_dead_process_are_requeued_then_failed(tmp_path):
+    lease = 0.1
+    dead, survivor = (JobQueue(str(tmp_path / 'jobs.db'), analyzed, lease=lease) for _ in range(2))
+    job_id = dead.submit(b'x', 'a.svg', {})
+    for attempt in range(MAX_ATTEMPTS):
+        # Claimed, then never heartbeated: the process running it died
+        assert (dead if attempt == 0 else survivor)._claim()[0] == job_id
+        survivor._recover()
+        assert survivor.get(job_id)['status'] == 'running'  # still within its lease
+        time.sleep(lease * 2)
+        survivor._recover()
+        if attempt + 1 < MAX_ATTEMPTS:
+            assert survivor.get(job_id)['status'] == 'queued'
+    job = survivor.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == f'Analysis was interrupted {MAX_ATTEMPTS} times'
+    assert survivor.get_stats()['requeued'] == MAX_ATTEMPTS - 1
+
+
+def test_heartbeats_keep_a_long_job_leased(tmp_path):
+    lease = 0.4
+    release = threading.Event()
+
+    def slow(data, filename, options):
+        release.wait(5)
+        return analyzed(data, filename, options)
+
+    running = JobQueue(str(tmp_path / 'jobs.db'), slow, lease=lease, poll_interval=0.05)
+    other = JobQueue(str(tmp_path / 'jobs.db'), analyzed, lease=lease)
+    running.start()
+    job_id = running.submit(b'x', 'a.svg', {})
+    time.sleep(lease * 3)
+    other._recover()
+    assert other.get(job_id)['status'] == 'running'
+    release.set()
+    for _ in range(100):
+        if other.get(job_id)['status'] == 'done':
+            break
+        time.sleep(0.05)
+    assert other.get(job_id)['status'] == 'done'
+    assert running.get_stats()['requeued'] == other.get_stats()['requeued'] == 0
+
+
+@pytest.mark.parametrize('url', [
+    'ftp://example.com/hook',
+    'http://:8080/hook',
+    'http://127.0.0.1/hook',
+    'http://localhost:8080/hook',
+    'http://10.1.2.3/hook',
+    'http://169.254.169.254/latest/meta-data',
+    'http://[::1]/hook',
+    'http://[::ffff:127.0.0.1]/hook',
+    'http://0.0.0.0/hook',
+])
+def test_internal_callback_urls_are_rejected(url):
+    with pytest.raises(CallbackRejected):
+        check_callback_url(url)
+
+
+def test_public_and_allowed_callback_urls():
+    check_callback_url('https://93.184.215.14/hook')
+    check_callback_url('http://hooks.internal:8000/done', {'hooks.internal'})
+    with pytest.raises(CallbackRejected):
+        check_callback_url('https://93.184.215.14/hook', {'hooks.internal'})
+
+
+@pytest.fixture
+def hook():
+    """A local server that records the callbacks it receives and redirects those to /redirect"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers['Content-Length'])))))
+            if self.path == '/redirect':
+                self.send_response(307)
+                self.send_header('Location', '/target')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}', received
+    server.shutdown()
+    server.server_close()
+
+
+def callback_status(queue, job_id):
+    """The callback status of a finished job, once its delivery thread is done"""
+    for _ in range(100):
+        status = queue.get(job_id)['callback']['status']
+        if status != 'pending':
+            return status
+        time.sleep(0.05)
+    return status
+
+
+def test_callbacks_are_delivered_but_not_redirected(tmp_path, hook):
+    base, received = hook
+    queue = JobQueue(str(tmp_path / 'jobs.db'), None, callback_retries=1, callback_hosts=['127.0.0.1'])
+    delivered = queue.complete('a.svg', {}, {'fileName': 'a.svg'}, base + '/hook')
+    redirected = queue.complete('a.svg', {}, {'fileName': 'a.svg'}, base + '/redirect')
+    assert callback_status(queue, delivered) == 'delivered (200)'
+    assert callback_status(queue, redirected).startswith('failed: HTTP Error 307')
+    assert sorted(path for path, _ in received) == ['/hook', '/redirect']
+
+
+def test_callbacks_to_internal_hosts_are_not_sent(tmp_path, hook):
+    base, received = hook
+    queue = JobQueue(str(tmp_path / 'jobs.db'), None, callback_retries=1)
+    job_id = queue.complete('a.svg', {}, {'fileName': 'a.svg'}, base + '/hook')
+    assert 'non-public address' in callback_status(queue, job_id)
+    assert received == []
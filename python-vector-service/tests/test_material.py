@@ -0,0 +1,83 @@
+"""Material area of nested, duplicated and overlapping outlines"""
+import numpy as np
+import pytest
+
+from material import material_area
+from vector_processor import VectorProcessor
+
+
+def square(x, y, size):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)]
+
+
+def area(*rings):
+    coords = np.array([point for ring in rings for point in ring], dtype=float)
+    ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    return material_area(coords, ring_index)
+
+
+OUTER = square(0, 0, 10)
+COUNTER = square(2, 2, 6)
+
+
+def test_separate_outlines_add_up():
+    summary = area(square(0, 0, 10), square(20, 0, 5))
+    assert summary['area'] == pytest.approx(125)
+    assert summary['components'] == 2
+    assert summary['overlapping'] == 0
+
+
+def test_counter_is_a_hole_and_island_is_material():
+    assert area(OUTER, COUNTER)['area'] == pytest.approx(64)
+    summary = area(OUTER, COUNTER, square(4, 4, 2))
+    assert summary['area'] == pytest.approx(68)
+    assert summary['nested'] == 2
+
+
+def test_duplicated_outlines_count_once():
+    summary = area(OUTER, COUNTER, OUTER, COUNTER)
+    assert summary['area'] == pytest.approx(64)
+    assert summary['nested'] == 2
+
+
+def test_counter_inside_overlapping_outlines():
+    # The dot lies in the overlap of both squares: one level deep, not two
+    left, right, dot = square(0, 0, 10), square(5, 5, 10), square(6, 6, 2)
+    assert area(left, right)['area'] == pytest.approx(175)
+    summary = area(left, right, dot)
+    assert summary['area'] == pytest.approx(171)
+    assert summary['overlapping'] == 3
+
+
+def test_overlapping_outlines_are_unioned():
+    summary = area(square(0, 0, 10), square(0, 5, 10), square(0, 0, 10))
+    assert summary['area'] == pytest.approx(150)
+
+
+def svg(*paths):
+    body = ''.join(f'<path d="{d}"/>' for d in paths)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="40mm" height="40mm" '
+            f'viewBox="0 0 40 40">{body}</svg>').encode()
+
+
+def letter_area(document):
+    result = VectorProcessor().analyze(document, 'letters.svg', {'area': 'material'})
+    assert result.error is None
+    return result.letter_area
+
+
+O_PATH = 'M0 0H10V10H0Z M2 2V8H8V2Z'
+
+
+@pytest.mark.parametrize('paths', [
+    [O_PATH],
+    [O_PATH, O_PATH],
+    ['M0 0H10V10H0Z', 'M2 2H8V8H2Z'],
+    ['M0 0H10V10H0Z', 'M2 2H8V8H2Z', 'M0 0H10V10H0Z', 'M2 2H8V8H2Z'],
+])
+def test_svg_letter_counters(paths):
+    assert letter_area(svg(*paths)) == pytest.approx(64)
+
+
+def test_svg_dot_inside_overlapping_squares():
+    assert letter_area(svg('M0 0H10V10H0Z', 'M5 5H15V15H5Z', 'M6 6H8V8H6Z')) == pytest.approx(171)
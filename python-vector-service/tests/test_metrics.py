@@ -0,0 +1,32 @@
+"""Metrics snapshots in the shared directory are written at most once per flush interval"""
+import json
+import os
+import time
+
+from metrics import Metrics
+
+
+def requests_counted(directory):
+    with open(os.path.join(directory, f'metrics-{os.getpid()}.json'), encoding='utf-8') as f:
+        series = json.load(f)['counters']['requests']
+    return sum(value for _, value in series)
+
+
+def test_flush_is_throttled(tmp_path):
+    metrics = Metrics(str(tmp_path), flush_interval=0.2)
+    metrics.counter('requests', 'Requests')
+    metrics.inc('requests')
+    metrics.flush()
+    assert requests_counted(tmp_path) == 1
+    # Within the interval: not written yet, but at the end of the interval
+    metrics.inc('requests')
+    metrics.flush()
+    metrics.inc('requests')
+    metrics.flush()
+    assert requests_counted(tmp_path) == 1
+    time.sleep(0.4)
+    assert requests_counted(tmp_path) == 3
+    # A forced flush (at worker exit) is written at once
+    metrics.inc('requests')
+    metrics.flush(force=True)
+    assert requests_counted(tmp_path) == 4
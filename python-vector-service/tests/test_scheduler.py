@@ -0,0 +1,66 @@
+"""Lane deadlines: an analysis still running at its deadline is cancelled and its worker killed"""
+import io
+import os
+import tempfile
+
+import pytest
+
+from scheduler import AnalysisTimeout, Lane
+
+SMALL = (b'<svg xmlns="http://www.w3.org/2000/svg" width="10mm" height="10mm" viewBox="0 0 10 10">'
+         b'<path d="M1 1 L9 1 L9 9 Z"/></svg>')
+
+
+def large_svg(paths=4000, vertices=100):
+    """A drawing big enough for the heavy lane that takes well over 100 ms to analyze"""
+    body = ''.join(
+        '<path d="M{0} 0 '.format(i % 100) + ' '.join(f'L{(i + j) % 100} {j % 97}' for j in range(vertices)) + ' Z"/>'
+        for i in range(paths))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm" viewBox="0 0 100 100">'
+            f'{body}</svg>').encode()
+
+
+@pytest.fixture
+def lane():
+    lane = Lane('heavy', workers=1)
+    lane.start()
+    yield lane
+    lane.stop()
+
+
+def test_deadline_kills_the_worker(lane):
+    result, _, _ = lane.run(SMALL, 'small.svg', {}, 60000)
+    assert result.error is None
+    [pid] = lane.pids()
+
+    with pytest.raises(AnalysisTimeout) as timeout:
+        lane.run(large_svg(), 'large.svg', {}, 100)
+    assert timeout.value.reason == 'deadline'
+    assert lane.pids() == []
+    assert lane.get_stats()['killed'] == 1
+
+    # The next analysis gets a fresh worker
+    result, _, _ = lane.run(SMALL, 'small.svg', {}, 60000)
+    assert result.error is None
+    assert lane.pids() not in ([], [pid])
+
+
+def test_analyze_answers_504_at_the_deadline(monkeypatch):
+    monkeypatch.setenv('VECTOR_JOB_DB', os.path.join(tempfile.mkdtemp(), 'jobs.db'))
+    import app as service
+
+    client = service.app.test_client()
+    heavy = service.scheduler.lanes['heavy']
+    try:
+        response = client.post('/analyze', data={'file': (io.BytesIO(large_svg()), 'large.svg'),
+                                                 'deadlineMs': '100', 'area': 'material'})
+        assert response.status_code == 504
+        document = response.get_json()
+        assert document['fileName'] == 'large.svg'
+        assert document['timeout']['reason'] == 'deadline'
+        assert document['timeout']['lane'] == 'heavy'
+        assert document['prescan']['format'] == 'svg'
+        assert heavy.get_stats()['killed'] == 1
+        assert heavy.pids() == []
+    finally:
+        service.scheduler.stop()
@@ -0,0 +1,69 @@
+"""Simplified material outlines: exact lengths, tight area errors and unchanged overlap"""
+import numpy as np
+import pytest
+
+from curves import CurveBatch
+from vector_processor import VectorProcessor
+
+
+def traced(cx, cy, radius, count, seed, reverse=False):
+    """A closed outline with tracing noise, as (x, y) vertices"""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    r = radius + rng.normal(0, 0.03, count)
+    points = np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t)))
+    return points[::-1] if reverse else points
+
+
+def path_data(points):
+    return 'M' + ' L'.join(f'{x:.4f} {y:.4f}' for x, y in points) + ' Z'
+
+
+def analyze(paths, **options):
+    body = ''.join(f'<path d="{d}"/>' for d in paths)
+    document = (f'<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm" '
+                f'viewBox="0 0 100 100">{body}</svg>').encode()
+    result = VectorProcessor().analyze(document, 'traced.svg', dict(options, area='material'))
+    assert result.error is None
+    return result
+
+
+@pytest.mark.parametrize('paths', [
+    # Separate outlines, a glyph with its counter, and two overlapping outlines
+    [traced(20, 20, 10, 3000, 1), traced(60, 60, 8, 2000, 2)],
+    [traced(30, 30, 20, 4000, 3), traced(30, 30, 12, 3000, 4, reverse=True)],
+    [traced(30, 30, 15, 3000, 5), traced(45, 30, 15, 3000, 6)],
+])
+def test_simplified_union(paths):
+    paths = [path_data(points) for points in paths]
+    exact = analyze(paths)
+    simplified = analyze(paths, simplify=0.1)
+    report = simplified.simplification
+    assert report['keptVertices'] < report['vertices'] / 5
+    assert simplified.path_length == exact.path_length
+    assert simplified.material['rawArea'] == exact.material['rawArea']
+    change = abs(simplified.letter_area - exact.letter_area)
+    assert change <= report['letterAreaError'] + 1e-9
+    assert simplified.material['overlapArea'] == pytest.approx(exact.material['overlapArea'], abs=report['letterAreaError'])
+
+
+def test_error_is_exact_for_separate_outlines():
+    paths = [path_data(traced(20, 20, 10, 3000, 1)), path_data(traced(60, 60, 8, 2000, 2))]
+    exact = analyze(paths)
+    simplified = analyze(paths, simplify=0.1)
+    assert simplified.simplification['letterAreaError'] == pytest.approx(
+        abs(simplified.letter_area - exact.letter_area))
+    assert simplified.material['overlapArea'] == pytest.approx(0, abs=1e-6)
+
+
+def test_only_selected_outlines_are_simplified():
+    batch = CurveBatch()
+    for closed in (True, False):
+        batch.begin_path()
+        batch.add_lines([complex(x, y) for x, y in traced(0, 0, 10, 500, 7)], closed=closed)
+    vertices, kept = batch.simplify(0.1)
+    assert vertices == 501
+    coords, _, owners, changes = batch.outlines()
+    assert owners.tolist() == [0]
+    assert len(coords) == kept
+    assert changes[0, 1] > abs(changes[0, 0]) > 0
@@ -1,13 +1,95 @@
+import io
+import mmap
+from itertools import chain
 import os
 import xml.etree.ElementTree as ET
+from html import unescape
 import re
-import math
 from pathlib import Path
-import fitz  # PyMuPDF
-import ezdxf
-from shapely.geometry import Polygon, LineString
-from shapely.ops import unary_union
-import svgpathtools
+import time
+import numpy as np
+
+from curves import CurveBatch
+from svg_stream import SvgReader, SVG_SHAPES, SHAPE_RANK, IDENTITY, similarity_scale, needs_structure
+from budget import AnalysisBudget, mode_tolerance, sample_order, chunks, extrapolate
+from material import material_area, merge_summaries
+from dxf_engine import DxfEngine, DxfMeasurement
+from postscript import tokenize, find_bounding_box, postscript_section
+from instrumentation import StageTimer
+from results import AnalysisResult, CLOSED, OPEN
+from plugins import lazy_import, load_library, register_format, format_plugin, format_plugins, import_times
+
+# The format libraries are imported when first used (see plugins)
+fitz = lazy_import('fitz')  # PyMuPDF
+ezdxf = lazy_import('ezdxf')
+ezdxf_document = lazy_import('ezdxf.document')
+ezdxf_files = lazy_import('ezdxf.filemanagement')
+ezdxf_tagger = lazy_import('ezdxf.lldxf.tagger')
+svgpathtools = lazy_import('svgpathtools')
+
+# Libraries area=material needs on top of the format's own
+MATERIAL_LIBRARIES = ('shapely',)
+
+BINARY_DXF_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+
+# PostScript path operators understood by the EPS state machine
+EPS_OPERATORS = {
+    'm': 'moveto', 'moveto': 'moveto', 'rmoveto': 'rmoveto',
+    'l': 'lineto', 'lineto': 'lineto', 'rlineto': 'rlineto',
+    'c': 'curveto', 'curveto': 'curveto', 'rcurveto': 'rcurveto',
+    'closepath': 'closepath', 'cp': 'closepath',
+    'stroke': 'stroke', 'S': 'stroke',
+    'fill': 'fill', 'F': 'fill'
+}
+# Streamed SVG shapes and EPS paths are measured in batches of about this many segments
+FLUSH_SEGMENTS = 50000
+# Window size of a budgeted EPS analysis: the budget is checked after each window
+EPS_BUDGET_WINDOW = 64 * 1024
+
+# Budgeted SVG analyses of documents without transforms or references find shape elements with
+# these instead of parsing the whole document
+SVG_ROOT_CHUNK = 4096
+_SVG_SHAPE_START = re.compile(rb'<(?:[\w.-]+:)?(path|polyline|polygon|line|ellipse|circle|rect)(?=[\s/>])')
+_SVG_START_TAG = re.compile(rb'<[^\s/>]+((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>')
+_SVG_ATTRIBUTE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_XML_COMMENT = re.compile(rb'<!--.*?-->', re.DOTALL)
+
+# PDFs with at least this many selected pages are measured across the worker pool
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('VECTOR_PDF_PARALLEL_PAGES', 4))
+_PAGE_RANGE = re.compile(r'^(\d+)(?:-(\d+))?$')
+
+
+def parse_page_ranges(spec):
+    """Parse 'all' or a list like '1-3,5' into sorted (first, last) 1-based ranges; None means all pages"""
+    spec = str(spec).strip().lower()
+    if spec == 'all':
+        return None
+    ranges = []
+    for part in spec.split(','):
+        match = _PAGE_RANGE.match(part.strip())
+        if not match:
+            raise ValueError(f"Invalid page range: {part.strip()!r}")
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part.strip()!r}")
+        ranges.append((first, last))
+    return sorted(ranges)
+
+
+def select_pages(spec, page_count):
+    """0-based page indices selected by a page spec; only the first page when spec is None"""
+    if page_count < 1:
+        raise ValueError("Document has no pages")
+    if spec is None:
+        return [0]
+    ranges = parse_page_ranges(spec)
+    if ranges is None:
+        return list(range(page_count))
+    indices = sorted({page - 1 for first, last in ranges for page in range(first, min(last, page_count) + 1)})
+    if not indices:
+        raise ValueError(f"No pages selected; the document has {page_count} page(s)")
+    return indices
 
 class VectorProcessor:
     def __init__(self):
@@ -20,40 +102,91 @@ class VectorProcessor:
             'in': 25.4,          # 1 inch = 25.4 mm
             'cm': 10.0           # 1 cm = 10 mm
         }
+        # Stage timings of the current analysis, reported under the result's 'timings' key
+        self.timer = StageTimer()
+        # Time/segment budget of the current analysis, None when it measures everything
+        self.budget = None
+    
+    def analyze_file(self, source, filename, options=None):
+        """Main analysis function that routes to appropriate processor
+
+        source is a filesystem path, the file contents as bytes/memoryview, or a
+        readable file-like object; in-memory sources are parsed without touching disk.
+        options may set 'tolerance', the relative accuracy of curve lengths, or a
+        'mode' ('quick', 'standard', 'precise') choosing it; 'budgetMs' and
+        'maxSegments' (or quick mode's default time budget) let the analysis stop
+        early and extrapolate its totals, reported under 'estimate'. With
+        area=material, 'simplify', a tolerance in mm, simplifies runs of straight
+        segments in the outlines of the union and reports its error bound under
+        'simplification'.
+        Returns the legacy result dict, with the time spent per stage under 'timings'.
+        """
+        analysis = self.analyze(source, filename, options)
+        result = analysis.to_legacy()
+        result['timings'] = analysis.timings
+        return result
     
-    def analyze_file(self, file_path, filename):
-        """Main analysis function that routes to appropriate processor"""
+    def analyze(self, source, filename, options=None):
+        """Like analyze_file, but returns an AnalysisResult (raw values in mm) to serialize as needed"""
         ext = Path(filename).suffix.lower()
+        options = options or {}
+        if 'simplify' in options and options.get('area') != 'material':
+            # Only the outlines of the material union are simplified
+            options = {key: value for key, value in options.items() if key != 'simplify'}
+        self.timer = StageTimer()
+        self.budget = AnalysisBudget.from_options(options)
         
         try:
-            if ext == '.svg':
-                return self._analyze_svg(file_path, filename)
-            elif ext == '.dxf':
-                return self._analyze_dxf(file_path, filename)
-            elif ext == '.pdf':
-                return self._analyze_pdf(file_path, filename)
-            elif ext == '.eps':
-                return self._analyze_eps(file_path, filename)
-            else:
+            if hasattr(source, 'read'):
+                with self.timer.stage('read'):
+                    source = source.read()
+            plugin = format_plugin(ext)
+            if plugin is None:
                 raise ValueError(f"Unsupported file format: {ext}")
+            if not plugin.loaded:
+                # Only the first file of a format in a worker that was not warmed up pays for its imports
+                with self.timer.stage('import'):
+                    plugin.load()
+            if options.get('area') == 'material':
+                with self.timer.stage('import'):
+                    for library in MATERIAL_LIBRARIES:
+                        load_library(library)
+            result = plugin.handler(self, source, filename, options)
         except Exception as e:
-            return {
-                'fileName': filename,
-                'error': str(e),
-                'paperArea': 'Unknown',
-                'letterArea': 0,
-                'pathLength': 0,
-                'shapes': []
-            }
+            result = AnalysisResult.failed(filename, str(e))
+        result.timings = self.timer.report()
+        return result
     
-    def _analyze_svg(self, file_path, filename):
-        """Analyze SVG file using svgpathtools with improved unit handling and area accuracy"""
+    def _analyze_svg(self, source, filename, options):
+        """Analyze SVG file using svgpathtools with improved unit handling and area accuracy
+
+        The document is streamed (see svg_stream): shapes are measured in batches as they are
+        read, with their transforms applied, and <use>d content is measured once.
+        """
         try:
-            paths, attributes = svgpathtools.svg2paths(file_path)
+            timer = self.timer
+            budget = self.budget
+            reader = shapes = None
+            with timer.stage('parse'):
+                if budget is None:
+                    reader = SvgReader(source)
+                    root = reader.root
+                else:
+                    data = Path(source).read_bytes() if self._is_path(source) else source
+                    if needs_structure(data):
+                        # Transforms and references need the streaming reader; its shapes are then sampled
+                        reader = SvgReader(data)
+                        root = reader.root
+                        shapes = sorted(reader.shapes(), key=lambda shape: SHAPE_RANK[shape[0]])
+                        count = len(shapes)
+                    else:
+                        # Only the root element is parsed up front; shape elements are located by a scan
+                        # and parsed as they are sampled
+                        root = self._svg_root(data)
+                        shape_tags = self._svg_shape_tags(data)
+                        count = len(shape_tags)
 
             # Get SVG dimensions and units
-            tree = ET.parse(file_path)
-            root = tree.getroot()
             svg_ns = '{http://www.w3.org/2000/svg}'
             width_attr = root.get('width')
             height_attr = root.get('height')
@@ -83,389 +216,767 @@ class VectorProcessor:
 
             width_mm = self._convert_to_mm(width, svg_unit)
             height_mm = self._convert_to_mm(height, svg_unit)
-            paper_area = f"{width_mm:.2f}x{height_mm:.2f} mm"
 
-            # Analyze paths
-            total_length = 0
-            total_area = 0
-            shapes = []
             warnings = []
-
-            for i, path in enumerate(paths):
-                try:
-                    length = path.length()
-                    total_length += length
-                    area = 0
-                    if hasattr(path, 'isclosed') and path.isclosed():
-                        # Use svgpathtools' area if available (signed area, may be negative)
+            tolerance = mode_tolerance(options)
+            material = None
+            sampled = None
+            scale = self._convert_to_mm(1, svg_unit)
+            simplify = options.get('simplify')
+            if simplify is not None:
+                simplify /= scale
+            simplified = []  # what the simplification dropped per flushed batch
+            if budget is None:
+                material_mode = options.get('area') == 'material'
+                lengths, areas, outlines = self._measure_svg_stream(reader, tolerance, material_mode, warnings,
+                                                                    simplify, simplified)
+                if outlines is not None:
+                    with timer.stage('material'):
+                        material = material_area(*outlines)
+            else:
+                def measure(indices):
+                    batch = CurveBatch()
+                    with timer.stage('parse'):
+                        if shapes is None:
+                            parsed = [(svgpathtools.parse_path(self._svg_element_data(data, *shape_tags[i])), IDENTITY)
+                                      for i in indices]
+                        else:
+                            parsed = [(svgpathtools.parse_path(shapes[i][1]), shapes[i][2]) for i in indices]
+                    for i, (path, transform) in zip(indices, parsed):
+                        batch.begin_path()
                         try:
-                            area = abs(path.area())
-                        except Exception:
-                            # Fallback to polygon sampling if area() fails
-                            points = [(path.point(t).real, path.point(t).imag) for t in [j/199.0 for j in range(200)]]
-                            if len(points) > 2:
-                                try:
-                                    poly = Polygon(points)
-                                    area = abs(poly.area)
-                                except Exception as e:
-                                    warnings.append(f"Path {i+1} area calc failed: {str(e)}")
-                                    area = 0
-                        total_area += area
-                    # Convert to mm
-                    length_mm = self._convert_to_mm(length, svg_unit)
-                    area_mm = self._convert_to_mm(area, svg_unit) * self._convert_to_mm(1, svg_unit)
-                    shapes.append({
-                        'name': f'Path {i+1}',
-                        'length': f"{length_mm:.2f} mm",
-                        'area': f"{area_mm:.2f} mm²" if area > 0 else "Open path (no area)"
-                    })
-                except Exception as e:
-                    warnings.append(f"Path {i+1} failed: {str(e)}")
-            # Convert totals to mm
-            total_length_mm = self._convert_to_mm(total_length, svg_unit)
-            total_area_mm = self._convert_to_mm(total_area, svg_unit) * self._convert_to_mm(1, svg_unit)
-            result = {
-                'fileName': filename,
-                'paperArea': paper_area,
-                'letterArea': f"{total_area_mm:.2f} mm²",
-                'pathLength': f"{total_length_mm:.2f} mm",
-                'shapes': shapes,
-                'units': 'mm'
-            }
+                            batch.add_svg_path(path, None if transform is IDENTITY else transform)
+                        except Exception as e:
+                            warnings.append(f"Path {i+1} failed: {str(e)}")
+                    lengths, areas, _ = batch.measure(tolerance)
+                    timer.count('paths', len(indices))
+                    timer.count('segments', len(batch))
+                    return lengths, areas
+
+                with timer.stage('geometry'):
+                    sampled, lengths, areas = self._measure_sample(count, measure)
+            if reader is not None:
+                warnings.extend(reader.warnings)
+
+            total_length = sum(lengths.tolist())
+            total_area = sum(areas.tolist())
+            # Convert to mm
+            result = AnalysisResult(
+                filename,
+                paper=(width_mm, height_mm),
+                letter_area=self._convert_to_mm(total_area, svg_unit) * scale,
+                path_length=self._convert_to_mm(total_length, svg_unit),
+                lengths=lengths * scale,
+                areas=areas * scale * scale
+            )
+            if material is not None:
+                self._add_material_area(result, total_area, material, svg_unit)
+            if simplify is not None:
+                self._add_simplification(result, options['simplify'], simplified, material, svg_unit)
+            if sampled is not None and len(sampled) < count:
+                result.names = [f'Path {i + 1}' for i in sampled.tolist()]
+                self._add_estimate(result, 'paths', result.lengths, result.areas, np.ones(len(sampled)), count, count)
             if warnings:
-                result['warnings'] = warnings
+                result.warnings = warnings
             return result
         except Exception as e:
             raise Exception(f"SVG analysis failed: {str(e)}")
     
-    def _analyze_dxf(self, file_path, filename):
-        """Analyze DXF file using ezdxf"""
+    def _analyze_dxf(self, source, filename, options):
+        """Analyze DXF file using ezdxf, measuring every entity in one pass over the modelspace"""
         try:
-            doc = ezdxf.readfile(file_path)
-            msp = doc.modelspace()
+            timer = self.timer
+            with timer.stage('parse'):
+                doc = self._read_dxf(source)
+                msp = doc.modelspace()
             
-            # Get drawing extents
-            extents = msp.extents()
-            if extents:
-                width = extents[1][0] - extents[0][0]
-                height = extents[1][1] - extents[0][1]
-                # DXF units are typically mm, but convert for consistency
-                paper_area = f"{width:.2f}x{height:.2f} mm"
-            else:
-                paper_area = "Unknown"
+            material_mode = options.get('area') == 'material'
+            sampled = None
+            with timer.stage('geometry'):
+                # DXF units are typically mm, so the simplify tolerance applies as it is
+                engine = DxfEngine(doc, mode_tolerance(options), outlines=material_mode,
+                                   simplify=options.get('simplify'), timer=timer)
+                if self.budget is None:
+                    measured = engine.measure(msp)
+                    timer.count('segments', engine.stats['segments'])
+                else:
+                    entities = list(msp)
+                    
+                    def measure(indices):
+                        segments = engine.stats['segments']
+                        part = engine.measure([entities[i] for i in indices], numbers=[i + 1 for i in indices])
+                        timer.count('segments', engine.stats['segments'] - segments)
+                        return part.lengths, part.areas, part.boxes
+                    
+                    sampled, lengths, areas, boxes = self._measure_sample(len(entities), measure)
+                    names = [f'{entities[i].dxftype()} {i + 1}' for i in sampled.tolist()]
+                    measured = DxfMeasurement(names, lengths, areas, boxes)
+            for name in ('entities', 'blocks', 'inserts'):
+                timer.count(name, engine.stats[name])
             
-            total_length = 0
-            total_area = 0
-            shapes = []
-            shape_count = 0
+            # Entities with neither length nor area (points, degenerate shapes) are not reported
+            lengths = np.asarray(measured.lengths, dtype=np.float64)
+            areas = np.asarray(measured.areas, dtype=np.float64)
+            keep = np.flatnonzero((lengths > 0) | (areas > 0))
+            lengths, areas = lengths[keep], areas[keep]
+            names = [measured.names[i] for i in keep.tolist()]
             
-            # Process entities
-            for entity in msp:
-                shape_count += 1
-                length = 0
-                area = 0
-                
-                if entity.dxftype() == 'LINE':
-                    start = entity.dxf.start
-                    end = entity.dxf.end
-                    length = math.sqrt((end[0] - start[0])**2 + (end[1] - start[1])**2)
-                
-                elif entity.dxftype() == 'CIRCLE':
-                    radius = entity.dxf.radius
-                    length = 2 * math.pi * radius  # Circumference
-                    area = math.pi * radius**2
-                
-                elif entity.dxftype() == 'ARC':
-                    radius = entity.dxf.radius
-                    start_angle = math.radians(entity.dxf.start_angle)
-                    end_angle = math.radians(entity.dxf.end_angle)
-                    angle_diff = end_angle - start_angle
-                    if angle_diff < 0:
-                        angle_diff += 2 * math.pi
-                    length = radius * angle_diff
-                
-                elif entity.dxftype() == 'LWPOLYLINE':
-                    points = list(entity.get_points())
-                    if len(points) > 1:
-                        for i in range(len(points) - 1):
-                            dx = points[i+1][0] - points[i][0]
-                            dy = points[i+1][1] - points[i][1]
-                            length += math.sqrt(dx**2 + dy**2)
-                        
-                        # If closed, calculate area
-                        if entity.closed and len(points) > 2:
-                            try:
-                                poly = Polygon([(p[0], p[1]) for p in points])
-                                area = abs(poly.area)
-                            except:
-                                area = 0
-                
-                if length > 0 or area > 0:
-                    total_length += length
-                    total_area += area
-                    shapes.append({
-                        'name': f'{entity.dxftype()} {shape_count}',
-                        'length': f"{length:.2f} mm",
-                        'area': f"{area:.2f} mm²" if area > 0 else "Open path (no area)"
-                    })
+            material = None
+            if material_mode:
+                with timer.stage('material'):
+                    material = material_area(*measured.outlines)
             
-            return {
-                'fileName': filename,
-                'paperArea': paper_area,
-                'letterArea': f"{total_area:.2f} mm²",
-                'pathLength': f"{total_length:.2f} mm",
-                'shapes': shapes,
-                'units': 'mm'
-            }
+            # Drawing extents, accumulated in the same pass
+            extents = measured.extents
+            paper = None
+            if extents:
+                # DXF units are typically mm
+                paper = (float(extents[2] - extents[0]), float(extents[3] - extents[1]))
+            
+            total_area = sum(areas.tolist())
+            result = AnalysisResult(
+                filename,
+                paper=paper,
+                letter_area=total_area,
+                path_length=sum(lengths.tolist()),
+                lengths=lengths,
+                areas=areas,
+                names=names
+            )
+            if material is not None:
+                self._add_material_area(result, total_area, material, 'mm')
+            if engine.simplify is not None:
+                self._add_simplification(result, engine.simplify,
+                                         [[engine.stats['vertices'], engine.stats['keptVertices']]], material, 'mm')
+            if sampled is not None and len(sampled) < len(entities):
+                # Extrapolated over all entities, including the sampled ones without length or area
+                self._add_estimate(result, 'entities', measured.lengths, measured.areas, np.ones(len(sampled)),
+                                   len(entities), len(entities))
+            if engine.stats['skipped']:
+                result.skipped = engine.stats['skipped']
+            if engine.warnings:
+                result.warnings = engine.warnings
+            return result
             
         except Exception as e:
             raise Exception(f"DXF analysis failed: {str(e)}")
     
-    def _analyze_pdf(self, file_path, filename):
-        """Analyze PDF file using PyMuPDF"""
+    def _analyze_pdf(self, source, filename, options):
+        """Analyze PDF file using PyMuPDF
+
+        Only the first page is analyzed unless options['pages'] is 'all' or a
+        range list such as '1-3,5'; then per-page summaries and document totals
+        are returned, and larger page sets are measured across the worker pool.
+        """
         try:
-            doc = fitz.open(file_path)
-            page = doc[0]  # Analyze first page
+            timer = self.timer
+            with timer.stage('parse'):
+                if self._is_path(source):
+                    doc = fitz.open(source)
+                else:
+                    doc = fitz.open(stream=source, filetype='pdf')
+            page_count = doc.page_count
+            indices = select_pages(options.get('pages'), page_count)
+            tolerance = mode_tolerance(options)
+            material = options.get('area') == 'material'
+            simplify = options.get('simplify')
+            if simplify is not None:
+                simplify /= self._convert_to_mm(1, 'points')
+            selected = len(indices)
+            first_page = doc[indices[0]].rect
             
-            # Get page dimensions
-            rect = page.rect
-            width = rect.width
-            height = rect.height
-            # Convert PDF points to mm
-            width_mm = self._convert_to_mm(width, 'points')
-            height_mm = self._convert_to_mm(height, 'points')
-            paper_area = f"{width_mm:.2f}x{height_mm:.2f} mm"
+            measured = None
+            if self.budget is not None:
+                # Pages in sampling order, one at a time, until the budget runs out
+                sampled = {}
+                for position in sample_order(selected).tolist():
+                    index = indices[position]
+                    sampled[index] = self._measure_pdf_page(doc[index], tolerance, material, simplify)
+                    if self.budget.exceeded(timer.counts.get('segments', 0)):
+                        break
+                indices = sorted(sampled)
+                measured = [sampled[index] for index in indices]
+            elif len(indices) >= PDF_PARALLEL_MIN_PAGES:
+                # Imported here because the pool module itself imports this one
+                from analysis_pool import measure_pdf_pages
+                with timer.stage('pages'):
+                    measured = measure_pdf_pages(source, indices, tolerance, material, simplify)
+            if measured is None:
+                measured = [self._measure_pdf_page(doc[i], tolerance, material, simplify) for i in indices]
+            doc.close()
+            timer.count('pages', len(indices))
             
-            # Get vector paths
-            paths = page.get_drawings()
+            multi_page = 'pages' in options
+            scale = self._convert_to_mm(1, 'points')
             total_length = 0
             total_area = 0
-            shapes = []
+            pages = []
+            names = [] if multi_page else None
             
-            for i, path in enumerate(paths):
-                length = 0
-                area = 0
-                
-                # Calculate path length
-                for item in path['items']:
-                    if item[0] == 'l':  # Line
-                        p1, p2 = item[1], item[2]
-                        length += math.sqrt((p2.x - p1.x)**2 + (p2.y - p1.y)**2)
-                    elif item[0] == 'c':  # Curve - approximate
-                        p1, p2, p3, p4 = item[1], item[2], item[3], item[4]
-                        # Approximate curve length
-                        length += (math.sqrt((p2.x - p1.x)**2 + (p2.y - p1.y)**2) +
-                                 math.sqrt((p3.x - p2.x)**2 + (p3.y - p2.y)**2) +
-                                 math.sqrt((p4.x - p3.x)**2 + (p4.y - p3.y)**2))
-                
-                # Check if path is filled (has area)
-                if path.get('fill'):
-                    # Approximate area calculation
-                    rect = path.get('rect')
-                    if rect:
-                        area = (rect.x1 - rect.x0) * (rect.y1 - rect.y0)
-                
-                total_length += length
-                total_area += area
-                
-                # Convert to mm
-                length_mm = self._convert_to_mm(length, 'points')
-                area_mm = self._convert_to_mm(area, 'points') * self._convert_to_mm(1, 'points')
-                
-                shapes.append({
-                    'name': f'Path {i+1}',
-                    'length': f"{length_mm:.2f} mm",
-                    'area': f"{area_mm:.2f} mm²" if area > 0 else "Open path (no area)"
+            for index, (width, height, lengths, areas, _, _) in zip(indices, measured):
+                page_length = sum(lengths)
+                page_area = sum(areas)
+                total_length += page_length
+                total_area += page_area
+                if multi_page:
+                    names.extend(f'Page {index + 1} Path {i}' for i in range(1, len(lengths) + 1))
+                pages.append({
+                    'page': index + 1,
+                    'width': self._convert_to_mm(width, 'points'),
+                    'height': self._convert_to_mm(height, 'points'),
+                    'letterArea': self._convert_to_mm(page_area, 'points') * scale,
+                    'pathLength': self._convert_to_mm(page_length, 'points'),
+                    'shapeCount': len(lengths)
                 })
             
-            doc.close()
-            
-            # Convert totals to mm
-            total_length_mm = self._convert_to_mm(total_length, 'points')
-            total_area_mm = self._convert_to_mm(total_area, 'points') * self._convert_to_mm(1, 'points')
+            lengths = np.fromiter(chain.from_iterable(page[2] for page in measured), dtype=np.float64)
+            areas = np.fromiter(chain.from_iterable(page[3] for page in measured), dtype=np.float64)
+            timer.count('paths', len(lengths))
             
-            return {
-                'fileName': filename,
-                'paperArea': paper_area,
-                'letterArea': f"{total_area_mm:.2f} mm²",
-                'pathLength': f"{total_length_mm:.2f} mm",
-                'shapes': shapes,
-                'units': 'mm'
-            }
+            # Convert to mm
+            result = AnalysisResult(
+                filename,
+                paper=(self._convert_to_mm(first_page.width, 'points'), self._convert_to_mm(first_page.height, 'points')),
+                letter_area=self._convert_to_mm(total_area, 'points') * scale,
+                path_length=self._convert_to_mm(total_length, 'points'),
+                lengths=lengths * scale,
+                areas=areas * scale * scale,
+                names=names
+            )
+            summary = None
+            if material:
+                # Pages are separate sheets, so their material areas simply add up
+                summary = merge_summaries(page[4] for page in measured)
+                self._add_material_area(result, total_area, summary, 'points')
+            if simplify is not None:
+                self._add_simplification(result, options['simplify'], [page[5] for page in measured], summary,
+                                         'points')
+            if multi_page:
+                result.page_count = page_count
+                result.pages = pages
+            if len(indices) < selected:
+                self._add_estimate(result, 'pages', [page['pathLength'] for page in pages],
+                                   [page['letterArea'] for page in pages], np.ones(len(pages)), selected, selected)
+            return result
             
         except Exception as e:
             raise Exception(f"PDF analysis failed: {str(e)}")
     
-    def _analyze_eps(self, file_path, filename):
-        """Enhanced EPS analysis by parsing PostScript commands"""
+    def _measure_pdf_page(self, page, tolerance, material=False, simplify=None):
+        """(width, height, lengths, areas, material, simplified) of a PDF page in points, lengths and areas per path
+
+        material is the page's material area summary when requested, else None.
+        simplify is a tolerance in points for simplifying the material outlines;
+        simplified is then what _simplify reports for the page, else None.
+        """
+        timer = self.timer
+        with timer.stage('extract'):
+            paths = page.get_drawings()
+        
+        # Measure the line, curve, rectangle and quad items of every path in one batch
+        with timer.stage('geometry'):
+            batch = CurveBatch()
+            for path in paths:
+                batch.begin_path()
+                for item in path['items']:
+                    if item[0] == 'l':  # Line
+                        batch.add_line(self._pdf_point(item[1]), self._pdf_point(item[2]))
+                    elif item[0] == 'c':  # Cubic Bézier
+                        batch.add_cubic(*(self._pdf_point(p) for p in item[1:5]))
+                    elif item[0] == 're':  # Rectangle
+                        rect = item[1]
+                        corners = [rect.tl, rect.tr, rect.br, rect.bl]
+                        if len(item) > 2 and item[2] == 1:  # Anti-clockwise
+                            corners.reverse()
+                        self._add_pdf_polygon(batch, corners)
+                    elif item[0] == 'qu':  # Quad
+                        quad = item[1]
+                        self._add_pdf_polygon(batch, [quad.ul, quad.ur, quad.lr, quad.ll])
+            # Fills implicitly close every subpath
+            lengths, areas, _ = batch.measure(tolerance, close_subpaths=True)
+        timer.count('segments', len(batch))
+        
+        # Only filled paths have area
+        filled = [bool(path.get('fill')) for path in paths]
+        areas = [float(area) if fill else 0.0 for fill, area in zip(filled, areas)]
+        summary = simplified = None
+        if material:
+            if simplify is not None:
+                simplified = self._simplify(batch, simplify, close_subpaths=True, paths=filled)
+            with timer.stage('material'):
+                coords, ring_index, _, changes = batch.outlines(close_subpaths=True, paths=filled)
+                summary = material_area(coords, ring_index, changes)
+        return page.rect.width, page.rect.height, lengths.tolist(), areas, summary, simplified
+    
+    def _analyze_eps(self, source, filename, options):
+        """Enhanced EPS analysis by streaming PostScript commands through a path state machine"""
         try:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                content = f.read()
-            
-            # Extract bounding box
-            bbox_match = re.search(r'%%BoundingBox:\s*([\d.-]+)\s+([\d.-]+)\s+([\d.-]+)\s+([\d.-]+)', content)
-            if bbox_match:
-                x1, y1, x2, y2 = map(float, bbox_match.groups())
-                width = abs(x2 - x1)
-                height = abs(y2 - y1)
-                # Convert EPS points to mm
-                width_mm = self._convert_to_mm(width, 'points')
-                height_mm = self._convert_to_mm(height, 'points')
-                paper_area = f"{width_mm:.2f}x{height_mm:.2f} mm"
-            else:
-                paper_area = "Unknown"
-            
-            # Parse PostScript path commands more accurately
-            shapes = []
-            total_length = 0
-            total_area = 0
-            
-            # Split content into lines and process commands
-            lines = content.split('\n')
-            current_path = []
-            path_count = 0
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Look for coordinate pairs followed by commands
-                tokens = line.split()
-                i = 0
-                while i < len(tokens):
-                    try:
-                        # Check for moveto command
-                        if i + 2 < len(tokens) and tokens[i + 2] in ['m', 'moveto']:
-                            x, y = float(tokens[i]), float(tokens[i + 1])
-                            if current_path:  # Finish previous path
-                                path_count += 1
-                                length = self._calculate_path_length(current_path)
-                                total_length += length
-                                length_mm = self._convert_to_mm(length, 'points')
-                                shapes.append({
-                                    'name': f'Path {path_count}',
-                                    'length': f"{length_mm:.2f} mm",
-                                    'area': 'Open path (no area)'
-                                })
-                            current_path = [(x, y)]
-                            i += 3
-                        
-                        # Check for lineto command
-                        elif i + 2 < len(tokens) and tokens[i + 2] in ['l', 'lineto']:
-                            x, y = float(tokens[i]), float(tokens[i + 1])
-                            current_path.append((x, y))
-                            i += 3
-                        
-                        # Check for closepath
-                        elif tokens[i] in ['closepath', 'cp']:
-                            if current_path and len(current_path) > 2:
-                                current_path.append(current_path[0])  # Close the path
-                                path_count += 1
-                                length = self._calculate_path_length(current_path)
-                                area = self._calculate_polygon_area(current_path)
-                                total_length += length
-                                total_area += area
-                                length_mm = self._convert_to_mm(length, 'points')
-                                area_mm = self._convert_to_mm(area, 'points') * self._convert_to_mm(1, 'points')
-                                shapes.append({
-                                    'name': f'Closed Path {path_count}',
-                                    'length': f"{length_mm:.2f} mm",
-                                    'area': f"{area_mm:.2f} mm²" if area > 0 else 'No area'
-                                })
-                                current_path = []
-                            i += 1
-                        
-                        # Check for stroke/fill commands
-                        elif tokens[i] in ['stroke', 'fill', 'S', 'F']:
-                            if current_path:
-                                path_count += 1
-                                length = self._calculate_path_length(current_path)
-                                total_length += length
-                                area = 0
-                                if tokens[i] in ['fill', 'F'] and len(current_path) > 2:
-                                    area = self._calculate_polygon_area(current_path)
-                                    total_area += area
-                                length_mm = self._convert_to_mm(length, 'points')
-                                area_mm = self._convert_to_mm(area, 'points') * self._convert_to_mm(1, 'points') if area > 0 else 0
-                                shapes.append({
-                                    'name': f'Path {path_count}',
-                                    'length': f"{length_mm:.2f} mm",
-                                    'area': f"{area_mm:.2f} mm²" if area > 0 else 'Open path (no area)'
-                                })
-                                current_path = []
-                            i += 1
-                        else:
-                            i += 1
-                    except (ValueError, IndexError):
-                        i += 1
-            
-            # Handle any remaining path
-            if current_path:
-                path_count += 1
-                length = self._calculate_path_length(current_path)
-                total_length += length
-                length_mm = self._convert_to_mm(length, 'points')
-                shapes.append({
-                    'name': f'Path {path_count}',
-                    'length': f"{length_mm:.2f} mm",
-                    'area': 'Open path (no area)'
-                })
-            
-            # If no paths found, try alternative parsing
-            if not shapes:
-                # Look for basic drawing commands as fallback
-                move_commands = len(re.findall(r'[\d.-]+\s+[\d.-]+\s+m(?:oveto)?', content))
-                line_commands = len(re.findall(r'[\d.-]+\s+[\d.-]+\s+l(?:ineto)?', content))
-                
-                if move_commands > 0 or line_commands > 0:
-                    shapes.append({
-                        'name': f'PostScript Elements ({move_commands + line_commands})',
-                        'length': 'Cannot calculate without coordinates',
-                        'area': 'Cannot determine'
-                    })
-            
-            # Convert totals to mm
-            total_length_mm = self._convert_to_mm(total_length, 'points') if total_length > 0 else 0
-            total_area_mm = self._convert_to_mm(total_area, 'points') * self._convert_to_mm(1, 'points') if total_area > 0 else 0
-            
-            return {
-                'fileName': filename,
-                'paperArea': paper_area,
-                'letterArea': f"{total_area_mm:.2f} mm²" if total_area_mm > 0 else 'No filled areas',
-                'pathLength': f"{total_length_mm:.2f} mm" if total_length_mm > 0 else 'No paths found',
-                'shapes': shapes if shapes else [{'name': 'No shapes detected', 'length': 'N/A', 'area': 'N/A'}],
-                'units': 'mm'
-            }
-            
+            if not self._is_path(source):
+                return self._analyze_postscript(source, filename, options)
+            with open(source, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return self._analyze_postscript(mapped, filename, options)
+            finally:
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # still referenced by a traceback; released with it
         except Exception as e:
             raise Exception(f"EPS analysis failed: {str(e)}")
     
-    def _calculate_path_length(self, path):
-        """Calculate total length of a path"""
-        if len(path) < 2:
-            return 0
+    def _analyze_postscript(self, buffer, filename, options):
+        """Run the moveto/lineto/curveto/closepath state machine over streamed tokens"""
+        view = postscript_section(buffer)
         
-        total_length = 0
-        for i in range(len(path) - 1):
-            x1, y1 = path[i]
-            x2, y2 = path[i + 1]
-            total_length += math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-        return total_length
-    
-    def _calculate_polygon_area(self, path):
-        """Calculate area of a polygon using shoelace formula"""
-        if len(path) < 3:
-            return 0
+        # Extract bounding box from the DSC header
+        bbox = find_bounding_box(view)
+        if bbox:
+            x1, y1, x2, y2 = bbox
+            width = abs(x2 - x1)
+            height = abs(y2 - y1)
+            # Convert EPS points to mm
+            paper = (self._convert_to_mm(width, 'points'), self._convert_to_mm(height, 'points'))
+        else:
+            paper = None
+        
+        tolerance = mode_tolerance(options)
+        budget = self.budget
+        names = []
+        kinds = []
+        measured = []  # (lengths, areas) per flushed batch, in points
+        totals = {'rings': 0}
+        path_count = 0
+        move_commands = 0
+        line_commands = 0
+        
+        # Finished paths are measured in batches so memory stays bounded
+        batch = CurveBatch()
+        pending = []  # (name, kind) per path in the batch
+        material = options.get('area') == 'material'
+        outlines = []  # (coords, ring_index, ring_changes) per flushed batch in material area mode
+        simplify = options.get('simplify')
+        if simplify is not None:
+            simplify /= self._convert_to_mm(1, 'points')
+        simplified = []  # what the simplification dropped per flushed batch
+        
+        timer = self.timer
+        
+        def flush():
+            if material:
+                # Only painted, not merely stroked, paths have material
+                filled = [kind != 'open' for _, kind in pending]
+                if simplify is not None:
+                    simplified.append(self._simplify(batch, simplify, close_subpaths=True, paths=filled))
+                with timer.stage('material'):
+                    coords, ring_index, owners, changes = batch.outlines(close_subpaths=True, paths=filled)
+                    outlines.append((coords, ring_index + totals['rings'], changes))
+                    totals['rings'] += len(owners)
+            with timer.stage('geometry'):
+                lengths, areas, _ = batch.measure(tolerance, close_subpaths=True)
+                # A path cut off by the budget is still in the batch but never finished
+                lengths, areas = lengths[:len(pending)], areas[:len(pending)]
+            timer.count('segments', len(batch))
+            # Paths that were only stroked have no area
+            areas[[kind == 'open' for _, kind in pending]] = 0
+            measured.append((lengths, areas))
+            names.extend(name for name, _ in pending)
+            kinds.extend(CLOSED if kind == 'closed' else OPEN for _, kind in pending)
+            pending.clear()
+        
+        window_ends = []  # stream offset after each window read, with a budget
+        path_windows = []  # window each path was finished in, with a budget
+        
+        def finish(name, kind):
+            pending.append((name, kind))
+            if budget is not None:
+                path_windows.append(len(window_ends))
+            if len(batch) >= FLUSH_SEGMENTS:
+                flush()
+                batch.reset()
+        
+        stack = []
+        start = point = None  # subpath start and current point
+        segment_count = 0
+        has_curve = False
+        
+        # Tokenizing and the path state machine are timed as 'parse'; flushed batches as their own stages.
+        # With a budget the stream is read in small windows and the budget is checked after each one.
+        if budget is None:
+            windows = ((None, tokens) for tokens in tokenize(view))
+        else:
+            windows = tokenize(view, EPS_BUDGET_WINDOW, offsets=True)
+        stopped = False
+        with timer.stage('parse'):
+            # Segments go straight into the batch; the path's kind is decided when it is painted or closed
+            for window_end, tokens in windows:
+                for token in tokens:
+                    if token.__class__ is float:
+                        stack.append(token)
+                        if len(stack) > 64:
+                            del stack[:-6]
+                        continue
+                    
+                    op = EPS_OPERATORS.get(token)
+                    if op is None:
+                        stack.clear()
+                        continue
+                    
+                    if op == 'moveto' or op == 'rmoveto':
+                        if len(stack) >= 2:
+                            move_commands += 1
+                            target = complex(stack[-2], stack[-1])
+                            if op == 'rmoveto':
+                                target += point or 0
+                            if start is not None:  # Finish previous path
+                                path_count += 1
+                                finish(f'Path {path_count}', 'open')
+                            batch.begin_path()
+                            start = point = target
+                            segment_count = 0
+                            has_curve = False
+                    
+                    elif op == 'lineto' or op == 'rlineto':
+                        if len(stack) >= 2 and point is not None:
+                            line_commands += 1
+                            target = complex(stack[-2], stack[-1])
+                            if op == 'rlineto':
+                                target += point
+                            batch.add_line(point, target)
+                            point = target
+                            segment_count += 1
+                    
+                    elif op == 'curveto' or op == 'rcurveto':
+                        if len(stack) >= 6 and point is not None:
+                            c1, c2, end = (complex(stack[i], stack[i + 1]) for i in (-6, -4, -2))
+                            if op == 'rcurveto':
+                                c1, c2, end = point + c1, point + c2, point + end
+                            batch.add_cubic(point, c1, c2, end)
+                            point = end
+                            segment_count += 1
+                            has_curve = True
+                    
+                    elif op == 'closepath':
+                        if start is not None and (segment_count >= 2 or has_curve):
+                            batch.add_line(point, start)  # Close the path
+                            path_count += 1
+                            finish(f'Closed Path {path_count}', 'closed')
+                            start = point = None
+                    
+                    elif op == 'stroke' or op == 'fill':
+                        if start is not None:
+                            path_count += 1
+                            filled = op == 'fill' and (segment_count >= 2 or has_curve)
+                            finish(f'Path {path_count}', 'filled' if filled else 'open')
+                            start = point = None
+                    
+                    stack.clear()
+                if budget is not None:
+                    window_ends.append(window_end)
+                    if budget.exceeded(timer.counts.get('segments', 0) + len(batch)):
+                        stopped = window_end < len(view)
+                        break
+        
+        # Handle any remaining path
+        if start is not None and not stopped:
+            path_count += 1
+            finish(f'Path {path_count}', 'open')
+        flush()
+        timer.count('paths', path_count)
         
-        area = 0
-        n = len(path)
-        for i in range(n):
-            j = (i + 1) % n
-            area += path[i][0] * path[j][1]
-            area -= path[j][0] * path[i][1]
-        return abs(area) / 2
+        lengths = np.concatenate([l for l, _ in measured])
+        areas = np.concatenate([a for _, a in measured])
+        total_length = sum(lengths.tolist())
+        total_area = sum(areas.tolist())
+        
+        # Convert to mm
+        scale = self._convert_to_mm(1, 'points')
+        result = AnalysisResult(
+            filename,
+            paper=paper,
+            letter_area=self._convert_to_mm(total_area, 'points') * scale if total_area > 0 else 0.0,
+            path_length=self._convert_to_mm(total_length, 'points') if total_length > 0 else 0.0,
+            lengths=lengths * scale,
+            areas=areas * scale * scale,
+            names=names,
+            kinds=kinds
+        )
+        if stopped:
+            # Each window read is a unit of the estimate, weighted by its number of lines: PostScript has
+            # about one operator per line, while the bytes per path grow with the digits of the coordinates
+            ends = np.asarray(window_ends)
+            sizes, total_size, basis = ends, len(view), 'bytes'
+            stream = np.frombuffer(view, dtype=np.uint8)
+            for line_break in (10, 13):  # LF or CR line endings
+                lines = np.count_nonzero(stream == line_break)
+                if lines > len(ends):
+                    breaks = np.flatnonzero(stream[:ends[-1]] == line_break)
+                    sizes, total_size, basis = np.searchsorted(breaks, ends), lines, 'lines'
+                    break
+            sizes = np.diff(sizes, prepend=0).astype(np.float64)
+            windows = np.asarray(path_windows, dtype=np.intp)
+            self._add_estimate(result, basis, np.bincount(windows, weights=result.lengths, minlength=len(sizes)),
+                               np.bincount(windows, weights=result.areas, minlength=len(sizes)), sizes, total_size)
+        if result.letter_area <= 0:
+            result.legacy['letterArea'] = 'No filled areas'
+        if result.path_length <= 0:
+            result.legacy['pathLength'] = 'No paths found'
+        if not names:
+            # If no paths found, report the drawing commands that were seen
+            if move_commands > 0 or line_commands > 0:
+                result.legacy['shapes'] = [{
+                    'name': f'PostScript Elements ({move_commands + line_commands})',
+                    'length': 'Cannot calculate without coordinates',
+                    'area': 'Cannot determine'
+                }]
+            else:
+                result.legacy['shapes'] = [{'name': 'No shapes detected', 'length': 'N/A', 'area': 'N/A'}]
+        summary = None
+        if material:
+            with timer.stage('material'):
+                summary = material_area(*self._join_outlines(outlines))
+            self._add_material_area(result, total_area, summary, 'points')
+        if simplify is not None:
+            self._add_simplification(result, options['simplify'], simplified, summary, 'points')
+        return result
+    
+    def _simplify(self, batch, tolerance, close_subpaths=False, paths=None):
+        """Simplify the straight segments of a batch's material outlines (see CurveBatch.simplify)
+
+        tolerance is in the batch's units, close_subpaths and paths select the
+        outlines as for CurveBatch.outlines. Returns [vertices, kept].
+        """
+        with self.timer.stage('simplify'):
+            return list(batch.simplify(tolerance, close_subpaths, paths))
+    
+    def _add_simplification(self, result, tolerance, parts, material, unit):
+        """Report the vertices the simplification dropped, from _simplify's parts, and the
+        error of the material area it caused, from the material_area summary in unit"""
+        vertices, kept = (sum(column) for column in zip(*parts or [[0, 0]]))
+        scale = self._convert_to_mm(1, unit)
+        result.simplification = {
+            'tolerance': tolerance,
+            'vertices': vertices,
+            'keptVertices': kept,
+            'reduction': 1 - kept / vertices if vertices else 0.0,
+            'letterAreaError': (material['areaError'] if material else 0.0) * scale * scale
+        }
+    
+    def _add_material_area(self, result, raw_area, material, unit):
+        """Report the union area as letterArea, with the raw per-shape sum and timing alongside
+
+        The overlap compares the raw sum with the union of the unsimplified outlines,
+        so simplified outlines do not show up as overlapping.
+        """
+        scale = self._convert_to_mm(1, unit) ** 2
+        union_mm = material['area'] * scale
+        result.letter_area = union_mm
+        result.legacy.pop('letterArea', None)
+        result.material = {
+            'rawArea': raw_area * scale,
+            'unionArea': union_mm,
+            'overlapArea': max(raw_area - material['area'] + material['areaChange'], 0.0) * scale,
+            'outlines': material['outlines'],
+            'components': material['components'],
+            'overlapping': material['overlapping'],
+            'nested': material['nested'],
+            'timeMs': round(material['seconds'] * 1000, 1)
+        }
+
+    def _join_outlines(self, outlines):
+        """Concatenate (coords, ring_index, ring_changes) parts into the arguments of material_area"""
+        if not outlines:
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+        return tuple(np.concatenate(column) for column in zip(*outlines))
+
+    def _measure_svg_stream(self, reader, tolerance, material, warnings, simplify=None, simplified=None):
+        """Measure the shapes of an SvgReader in batches as they are read
+
+        Returns (lengths, areas, outlines) in svgpathtools.svg2paths order: by element
+        type, then document order. outlines is (coords, ring_index, ring_changes) of
+        the closed outlines with area=material, else None. Shapes under a similarity transform
+        are measured untransformed and scaled; pieces of <use>d elements only once.
+        With simplify (a tolerance in document units), the material outlines of each
+        batch are simplified and the vertices that dropped are appended to simplified.
+        """
+        timer = self.timer
+        batch = CurveBatch()
+        factors, base_lengths, base_areas = [], [], []  # per shape in the batch
+        ranks = []
+        measured = []  # (lengths, areas) per flushed batch
+        outlines = []  # (coords, ring_index, ring_changes) per flushed batch in material area mode
+        totals = {'rings': 0}
+        failed = []  # (shape index in document order, error)
+        reused = {}  # key -> untransformed (length, area) of a <use>d piece
+        pieces = {}  # key -> parsed path of a <use>d piece
+
+        def flush():
+            if material:
+                if simplify is not None:
+                    simplified.append(self._simplify(batch, simplify))
+                with timer.stage('material'):
+                    coords, ring_index, owners, changes = batch.outlines()
+                    outlines.append((coords, ring_index + totals['rings'], changes))
+                    totals['rings'] += len(owners)
+            with timer.stage('geometry'):
+                lengths, areas, _ = batch.measure(tolerance)
+                factor = np.asarray(factors)
+                measured.append(((lengths + base_lengths) * factor, (areas + base_areas) * factor * factor))
+            timer.count('segments', len(batch))
+            batch.reset()
+            factors.clear()
+            base_lengths.clear()
+            base_areas.clear()
+
+        def add(target, index, path, transform=None):
+            target.begin_path()
+            try:
+                target.add_svg_path(path, transform)
+                return True
+            except Exception as e:
+                failed.append((index, str(e)))
+                return False
+
+        with timer.stage('parse'):
+            for index, (tag, d, transform, key) in enumerate(reader.shapes()):
+                ranks.append(SHAPE_RANK[tag])
+                if key is None:
+                    path = svgpathtools.parse_path(d)
+                else:
+                    path = pieces.get(key)
+                    if path is None:
+                        path = pieces[key] = svgpathtools.parse_path(d)
+                # Material outlines need real coordinates; lengths and areas only the scale of a similarity
+                scale = 1.0 if transform is IDENTITY else None if material else similarity_scale(transform)
+                base = (0.0, 0.0)
+                if scale is None:
+                    add(batch, index, path, transform)
+                    scale = 1.0
+                elif key is None:
+                    add(batch, index, path)
+                else:
+                    if key not in reused:
+                        piece = CurveBatch()
+                        if add(piece, index, path):
+                            lengths, areas, _ = piece.measure(tolerance)
+                            reused[key] = (float(lengths[0]), float(areas[0]))
+                        timer.count('segments', len(piece))
+                    base = reused.get(key, base)
+                    batch.begin_path()
+                factors.append(scale)
+                base_lengths.append(base[0])
+                base_areas.append(base[1])
+                if len(batch) >= FLUSH_SEGMENTS:
+                    flush()
+            if factors:
+                flush()
+        timer.count('paths', len(ranks))
+
+        # Reorder from document order to svg2paths order
+        order = np.argsort(np.asarray(ranks, dtype=np.intp), kind='stable')
+        position = np.empty(len(order), dtype=np.intp)
+        position[order] = np.arange(len(order))
+        for index, error in sorted(failed, key=lambda item: position[item[0]]):
+            warnings.append(f"Path {position[index] + 1} failed: {error}")
+        lengths = np.concatenate([l for l, _ in measured])[order] if measured else np.zeros(0)
+        areas = np.concatenate([a for _, a in measured])[order] if measured else np.zeros(0)
+        if not material:
+            return lengths, areas, None
+        return lengths, areas, self._join_outlines(outlines)
+
+    def _measure_sample(self, count, measure):
+        """Measure units in sampling order until all are measured or the budget runs out
+
+        measure(indices) measures the units at those indices and returns per-unit
+        arrays (lengths, areas, ...). Returns the measured indices in drawing
+        order, followed by each of those arrays in the same order.
+        """
+        taken, columns = [], []
+        for chunk in chunks(sample_order(count)):
+            taken.append(chunk)
+            columns.append(measure(chunk.tolist()))
+            if self.budget.exceeded(self.timer.counts.get('segments', 0)):
+                break
+        if not taken:
+            taken.append(np.zeros(0, dtype=np.intp))
+            columns.append(measure([]))
+        indices = np.concatenate(taken)
+        order = np.argsort(indices, kind='stable')
+        return (indices[order],) + tuple(np.concatenate(column)[order] for column in zip(*columns))
     
+    def _add_estimate(self, result, basis, lengths, areas, sizes, total_size, total=None):
+        """Extrapolate the totals of an analysis that its budget stopped early
+
+        lengths and areas are per measured unit in mm and mm², sizes the units'
+        sizes and total_size that of all units; total is the number of units
+        when known. The measured totals are kept in result.estimate.
+        """
+        path_length, length_error = extrapolate(lengths, sizes, total_size)
+        letter_area, area_error = extrapolate(areas, sizes, total_size)
+        result.estimate = {
+            'basis': basis,
+            'coverage': min(float(np.sum(sizes)) / total_size, 1.0),
+            'sampled': len(sizes),
+            'total': total,
+            'measuredLetterArea': result.letter_area,
+            'measuredPathLength': result.path_length,
+            'letterAreaError': area_error,
+            'pathLengthError': length_error
+        }
+        result.letter_area = letter_area
+        result.path_length = path_length
+
+    def _is_path(self, source):
+        return isinstance(source, (str, os.PathLike))
+
+    def _svg_root(self, data):
+        """The root element of an SVG document, parsing no further than its start tag"""
+        parser = ET.XMLPullParser(events=('start',))
+        for offset in range(0, len(data), SVG_ROOT_CHUNK):
+            parser.feed(data[offset:offset + SVG_ROOT_CHUNK])
+            for _, element in parser.read_events():
+                return element
+        raise ValueError("No root element found")
+
+    def _svg_shape_tags(self, data):
+        """(tag, offset) of every shape element in an SVG document, in svg2paths order, without parsing it"""
+        comments = [match.span() for match in _XML_COMMENT.finditer(data)] if b'<!--' in data else []
+        found = {tag: [] for tag in SVG_SHAPES}
+        for match in _SVG_SHAPE_START.finditer(data):
+            start = match.start()
+            if comments and any(first <= start < last for first, last in comments):
+                continue
+            found[match.group(1).decode('ascii')].append(start)
+        return [(tag, offset) for tag, offsets in found.items() for offset in offsets]
+
+    def _svg_element_data(self, data, tag, offset):
+        """Path data of the shape element whose start tag begins at offset"""
+        attributes = _SVG_START_TAG.match(data, offset).group(1).decode('utf-8')
+        attrs = {name: unescape(double if double is not None else single)
+                 for name, double, single in _SVG_ATTRIBUTE.findall(attributes)}
+        return SVG_SHAPES[tag](attrs)
+
+    def _pdf_point(self, point):
+        return complex(point.x, point.y)
+
+    def _add_pdf_polygon(self, batch, corners):
+        points = [self._pdf_point(p) for p in corners]
+        for start, end in zip(points, points[1:] + points[:1]):
+            batch.add_line(start, end)
+
+    def _read_dxf(self, source):
+        """Load a DXF document from a path or from an in-memory ASCII/binary DXF"""
+        if self._is_path(source):
+            return ezdxf.readfile(source)
+
+        data = bytes(source)
+        if data.startswith(BINARY_DXF_SENTINEL):
+            return ezdxf_document.Drawing.load(ezdxf_tagger.binary_tags_loader(data))
+
+        # Same encoding detection as ezdxf.readfile, but on the buffer
+        info = ezdxf_files.dxf_stream_info(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore'))
+        return ezdxf.read(io.TextIOWrapper(io.BytesIO(data), encoding=info.encoding, errors='surrogateescape'))
+
     def _parse_dimension(self, dim_str):
         """Parse dimension string and convert to mm"""
         if not dim_str:
@@ -495,4 +1006,92 @@ class VectorProcessor:
     
     def _convert_to_mm(self, value, from_unit):
         """Convert value from given unit to mm"""
-        return value * self.unit_conversions.get(from_unit, 1.0)
\ No newline at end of file
+        return value * self.unit_conversions.get(from_unit, 1.0)
+
+
+def _svg_sample():
+    return (b'<svg xmlns="http://www.w3.org/2000/svg" width="10mm" height="10mm" viewBox="0 0 10 10">'
+            b'<defs><circle id="dot" r="1"/></defs><use href="#dot" x="8" y="8"/>'
+            b'<path d="M1,1 L5,1 C7,1 7,4 5,4 A2,2 0 0 1 1,4 Z" transform="rotate(5)"/>'
+            b'<rect x="6" y="1" width="3" height="2"/></svg>')
+
+
+def _dxf_sample():
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0, 0.4), (5, 0, 0), (5, 5, 0), (0, 5, 0)], format='xyb', close=True)
+    block = doc.blocks.new('WARM_UP')
+    block.add_circle((0, 0), 1)
+    msp.add_blockref('WARM_UP', (8, 8), dxfattribs={'rotation': 30})
+    msp.add_line((0, 8), (4, 9))
+    stream = io.StringIO()
+    doc.write(stream)
+    return stream.getvalue().encode('utf-8')
+
+
+def _pdf_sample():
+    doc = fitz.open()
+    page = doc.new_page(width=100, height=100)
+    shape = page.new_shape()
+    shape.draw_bezier((10, 10), (40, 0), (60, 40), (90, 10))
+    shape.draw_line((90, 10), (50, 90))
+    shape.finish(fill=(0, 0, 0), closePath=True)
+    shape.draw_rect(fitz.Rect(60, 60, 90, 90))
+    shape.finish(color=(0, 0, 0))
+    shape.commit()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _eps_sample():
+    return (b'%!PS-Adobe-3.0 EPSF-3.0\n%%BoundingBox: 0 0 100 100\n%%EndComments\n'
+            b'newpath 10 10 moveto 90 10 lineto 90 50 60 90 10 50 curveto closepath fill\n'
+            b'newpath 20 20 moveto 30 0 rlineto stroke\nshowpage\n%%EOF\n')
+
+
+register_format('.svg', VectorProcessor._analyze_svg, ('svgpathtools',), _svg_sample)
+register_format('.dxf', VectorProcessor._analyze_dxf, ('ezdxf', 'shapely'), _dxf_sample)
+register_format('.pdf', VectorProcessor._analyze_pdf, ('fitz',), _pdf_sample)
+register_format('.eps', VectorProcessor._analyze_eps, (), _eps_sample)
+
+
+def warm_up(formats=None):
+    """Load the libraries of formats and analyze a tiny sample of each, so later requests start warm
+
+    formats is a list of format names ('svg', 'pdf', ...) or a comma-separated
+    string; None means VECTOR_WARM_FORMATS, which defaults to every format.
+    Each sample is analyzed plainly and with area=material, which covers the
+    lazy set-up inside the libraries as well as their imports. Returns a
+    report: milliseconds per format and per imported library, and in total.
+    """
+    if formats is None:
+        formats = os.environ.get('VECTOR_WARM_FORMATS', ','.join(p.name for p in format_plugins()))
+    if isinstance(formats, str):
+        formats = [name.strip().lower() for name in formats.split(',') if name.strip() and name.strip() != 'none']
+    started = time.perf_counter()
+    processor = VectorProcessor()
+    report = {'formats': {}}
+    for name in formats:
+        plugin = format_plugin('.' + name)
+        if plugin is None:
+            report['formats'][name] = {'error': 'Unsupported format'}
+            continue
+        format_started = time.perf_counter()
+        entry = {}
+        try:
+            plugin.load()
+            for library in MATERIAL_LIBRARIES:
+                load_library(library)
+            sample = plugin.sample()
+            for options in ({}, {'area': 'material'}):
+                result = processor.analyze(sample, f'warm-up{plugin.extension}', options)
+                if result.error is not None:
+                    entry['error'] = result.error
+        except Exception as e:
+            entry['error'] = str(e)
+        entry['ms'] = round((time.perf_counter() - format_started) * 1000, 1)
+        report['formats'][name] = entry
+    report['importMs'] = import_times()
+    report['totalMs'] = round((time.perf_counter() - started) * 1000, 1)
+    return report
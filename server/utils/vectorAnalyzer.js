@@ -31,6 +31,125 @@ const getPythonServiceUrl = () => {
 
 const PYTHON_SERVICE_URL = getPythonServiceUrl();
 
+// How many times a 503 (service at capacity) is retried, and the longest Retry-After honoured
+const MAX_CAPACITY_RETRIES = 2;
+const MAX_RETRY_AFTER_MS = 10000;
+
+// Files up to this size are analyzed synchronously through /analyze, like the service's fast lane
+const JOB_MIN_BYTES = parseInt(process.env.VECTOR_JOB_MIN_BYTES, 10) || 512 * 1024;
+
+// Larger files, and files the service timed out on in its heavy lane, run as jobs and are polled,
+// so slow files are not cut off by an HTTP timeout
+const JOB_TIMEOUT_MS = parseInt(process.env.VECTOR_JOB_TIMEOUT_MS, 10) || 5 * 60 * 1000;
+const JOB_POLL_MIN_MS = 250;
+const JOB_POLL_MAX_MS = 2000;
+
+// Deadline sent with synchronous analyses, under the 30 s HTTP timeout, so a file that is too slow
+// comes back as the service's 504 timeout result instead of a dropped connection
+const ANALYZE_DEADLINE_MS = 25000;
+// Longest deadline the service accepts
+const MAX_DEADLINE_MS = 10 * 60 * 1000;
+
+// Any response from the service shows it is up; checkPythonService answers from the last one
+// while it is this recent instead of probing before every analysis
+const READY_CACHE_MS = 10000;
+let lastResponseAt = 0;
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * Note that the service answered, from a response or an axios error carrying one
+ */
+function rememberResponse(response) {
+  if (response) {
+    lastResponseAt = Date.now();
+  }
+}
+
+/**
+ * POST to the Python service, waiting out 503 responses as instructed by Retry-After
+ */
+async function postWithCapacityRetry(url, buildForm, timeout) {
+  for (let attempt = 0; ; attempt++) {
+    const form = buildForm();
+    try {
+      const response = await axios.post(url, form, {
+        headers: {
+          ...form.getHeaders(),
+        },
+        timeout,
+      });
+      rememberResponse(response);
+      return response;
+    } catch (error) {
+      rememberResponse(error.response);
+      if (error.response?.status !== 503 || attempt >= MAX_CAPACITY_RETRIES) {
+        throw error;
+      }
+      const retryAfter = parseInt(error.response.headers['retry-after'], 10);
+      const delay = Math.min((Number.isNaN(retryAfter) ? 1 : retryAfter) * 1000, MAX_RETRY_AFTER_MS);
+      console.warn(`Python service at capacity, retrying in ${delay}ms`);
+      await sleep(delay);
+    }
+  }
+}
+
+/**
+ * Queue a file as an analysis job and poll until it finishes
+ * @returns {Object} The job's analysis result
+ */
+async function runAnalysisJob(filePath) {
+  const response = await postWithCapacityRetry(`${PYTHON_SERVICE_URL}/jobs`, () => {
+    const form = new FormData();
+    form.append('file', fs.createReadStream(filePath));
+    form.append('deadlineMs', String(Math.min(JOB_TIMEOUT_MS, MAX_DEADLINE_MS)));
+    return form;
+  }, 30000);
+  
+  let job = response.data;
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  let interval = JOB_POLL_MIN_MS;
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() + interval > deadline) {
+      throw new Error(`Analysis job ${job.jobId} did not finish within ${JOB_TIMEOUT_MS / 1000}s`);
+    }
+    await sleep(interval);
+    interval = Math.min(interval * 2, JOB_POLL_MAX_MS);
+    const poll = await axios.get(`${PYTHON_SERVICE_URL}/jobs/${job.jobId}`, { timeout: 10000 });
+    rememberResponse(poll);
+    job = poll.data;
+  }
+  return job.result;
+}
+
+/**
+ * Analyze a file synchronously through /analyze
+ * @returns {Object} The analysis result
+ */
+async function analyzeSync(filePath) {
+  const response = await postWithCapacityRetry(`${PYTHON_SERVICE_URL}/analyze`, () => {
+    const form = new FormData();
+    form.append('file', fs.createReadStream(filePath));
+    form.append('deadlineMs', String(ANALYZE_DEADLINE_MS));
+    return form;
+  }, 30000); // 30 second timeout
+  return response.data;
+}
+
+/**
+ * runAnalysisJob, falling back to /analyze on an older service without the job API
+ */
+async function runAnalysisJobOrAnalyze(filePath) {
+  try {
+    return await runAnalysisJob(filePath);
+  } catch (error) {
+    if (error.response?.status !== 404) {
+      throw error;
+    }
+    return analyzeSync(filePath);
+  }
+}
+
 /**
  * Main function to analyze a vector file using Python microservice
  * @param {string} filePath - Path to the vector file
@@ -48,20 +167,25 @@ async function analyzeVectorFile(filePath, units = 'mm') {
       throw new Error('File not found');
     }
     
-    // Create form data
-    const form = new FormData();
-    form.append('file', fs.createReadStream(filePath));
-    
-    // Send to Python service
-    const response = await axios.post(`${PYTHON_SERVICE_URL}/analyze`, form, {
-      headers: {
-        ...form.getHeaders(),
-      },
-      timeout: 30000, // 30 second timeout
-    });
+    let result;
+    if (fs.statSync(filePath).size > JOB_MIN_BYTES) {
+      result = await runAnalysisJobOrAnalyze(filePath);
+    } else {
+      try {
+        result = await analyzeSync(filePath);
+      } catch (error) {
+        // Heavy-lane file that did not finish within the synchronous deadline: retry it as a job
+        const timeout = error.response?.status === 504 ? error.response.data?.timeout : null;
+        if (!timeout || timeout.lane !== 'heavy') {
+          throw error;
+        }
+        console.warn(`${fileName} timed out in the heavy lane, queueing it as a job`);
+        result = await runAnalysisJobOrAnalyze(filePath);
+      }
+    }
     
     console.log(`Python service analysis complete for: ${fileName}`);
-    return response.data;
+    return result;
     
   } catch (error) {
     console.error(`Error analyzing ${fileName}:`, error.message);
@@ -80,11 +204,26 @@ async function analyzeVectorFile(filePath, units = 'mm') {
 
 /**
  * Check if Python service is available
+ * 
+ * Answered without a request when the service responded within READY_CACHE_MS. Otherwise
+ * probes the cached /ready document; a 503 there means busy or still warming up, not down.
  */
 async function checkPythonService() {
+  if (Date.now() - lastResponseAt < READY_CACHE_MS) {
+    return true;
+  }
   try {
-    const response = await axios.get(`${PYTHON_SERVICE_URL}/health`, { timeout: 5000 });
-    return response.data.status === 'healthy';
+    const response = await axios.get(`${PYTHON_SERVICE_URL}/ready`, {
+      timeout: 5000,
+      validateStatus: status => status === 200 || status === 503 || status === 404,
+    });
+    if (response.status === 404) {
+      // Older service without /ready
+      const health = await axios.get(`${PYTHON_SERVICE_URL}/health`, { timeout: 5000 });
+      return health.data.status === 'healthy';
+    }
+    rememberResponse(response);
+    return true;
   } catch (error) {
     console.error('Python vector service is not available:', error.message);
     return false;
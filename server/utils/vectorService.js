@@ -22,7 +22,7 @@ async function processVectorFile(submissionId, filePath, fileName, units = 'mm')
   try {
     console.log(`Processing vector file for submission ${submissionId}: ${fileName}`);
     
-    // Check if Python service is available
+    // Check if Python service is available (no round trip while it answered recently)
     const serviceAvailable = await checkPythonService();
     if (!serviceAvailable) {
       throw new Error('Python vector analysis service is not available. Please ensure the service is running on port 5001.');